@@ -0,0 +1,113 @@
+"""Headless check of which character a player's name stands for at the cutoffs.
+
+Players who changed characters mid-campaign map to their first character up
+to and including the cutoff episode in scenes.SPEAKER_MAP, and to their
+second one after it. For each of them, on both sides of the cutoff:
+
+- map: map_character, with the name as given and capitalised
+- filter: a scene index's character filter picks the character's scenes
+  rather than falling back to the whole episode
+- appearances: the appearance index files the player's scenes under the
+  character
+
+    python benchmarks/bench_characters.py
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scenes import (  # noqa: E402
+    SPEAKER_MAP,
+    AppearanceIndex,
+    SceneIndex,
+    encode_appearances,
+    make_scene,
+    map_character,
+)
+
+
+def episode_scenes(player: str, character: str) -> list:
+    # the narrator, then the player as their character
+    return [
+        make_scene(0, "matt", "environment", 0, 60),
+        make_scene(1, player, character, 60, 90),
+        make_scene(2, "matt", "environment", 90, 120),
+    ]
+
+
+def run() -> list[tuple[str, bool, str]]:
+    checks = []
+    for player, mapped in SPEAKER_MAP.items():
+        if not isinstance(mapped, dict):
+            continue
+        cutoff = mapped["episode_cutoff"]
+        sides = [
+            (f"c2e{cutoff:03d}", cutoff, mapped["characters"][0]),
+            (f"c2e{cutoff + 1:03d}", cutoff + 1, mapped["characters"][1]),
+        ]
+
+        got = [
+            (map_character(num, player), map_character(num, player.title()))
+            for _, num, _ in sides
+        ]
+        checks.append((
+            f"{player} map",
+            got == [(character, character) for _, _, character in sides],
+            ", ".join(f"{num}: {mapped}" for (_, num, _), (mapped, _) in zip(sides, got)),
+        ))
+
+        picked = []
+        for episode_name, _, character in sides:
+            index = SceneIndex(
+                episode_name,
+                episode_scenes(player, character),
+                intro_end=0.0,
+                episode_break=(120.0, 120.0),
+            )
+            picked.append([s.character for s in index.partition(character=player).scenes])
+        checks.append((
+            f"{player} filter",
+            picked == [[character] for _, _, character in sides],
+            ", ".join(
+                f"{num}: {'/'.join(characters)}"
+                for (_, num, _), characters in zip(sides, picked)
+            ),
+        ))
+
+        appearances = AppearanceIndex(encode_appearances(
+            (episode_name, episode_scenes(player, character))
+            for episode_name, _, character in sides
+        ))
+        found = [
+            appearances.next(character, sides[0][0], -1.0)
+            for _, _, character in sides
+        ]
+        checks.append((
+            f"{player} appearances",
+            [a and a.episode_name for a in found] == [name for name, _, _ in sides],
+            ", ".join(
+                f"{character}: {a.episode_name if a else '-'}"
+                for (_, _, character), a in zip(sides, found)
+            ),
+        ))
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    checks = run()
+    for name, ok, detail in checks:
+        print(f"{name:<22} {'ok' if ok else 'FAILED':<7} {detail}")
+    sys.exit(0 if all(ok for _, ok, _ in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Headless check of the persistent data cache over the Cache API.
+
+Runs loader.py's PersistentCache against the fake browser with a fake Cache
+API that outlives each simulated visit, over the 3g profile by default, and
+with a data manifest built by tools/build_manifest.py. Checked:
+
+- first visit: a file's request goes out without waiting for the manifest
+- return visit: the file comes from the cache, without a request
+- updated data: a file whose hash changed in the manifest is fetched again
+- page and worker: two contexts sharing the cache keep each other's entries
+- eviction: the cache is held under its byte budget, index and entries alike
+
+    python benchmarks/bench_data_cache.py
+    python benchmarks/bench_data_cache.py --profile 4g
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+sys.path.insert(0, str(ROOT / "tools"))
+
+import fake_browser  # noqa: E402
+import fixtures  # noqa: E402
+from bench_network import advance, drain  # noqa: E402
+from build_manifest import build_manifest  # noqa: E402
+from episodes import EPISODE_NAMES  # noqa: E402
+from network_profiles import PROFILES  # noqa: E402
+
+
+APP_VERSION = "bench"
+
+
+def write_manifest(data_dir: Path):
+    (data_dir / "manifest.json").write_text(json.dumps(build_manifest(data_dir)))
+
+
+def visit(data_dir: Path, profile, storage):
+    """A fresh page over the same Cache API, returning the fakes, the data
+    module, and when each request went out, as (virtual ms, file name)."""
+    fakes = fake_browser.install(
+        data_dir, EPISODE_NAMES[0], profile=profile, caches=storage
+    )
+    sent = []
+    pyfetch = fakes.network.pyfetch
+
+    async def recorded(url, **kwargs):
+        sent.append((fakes.clock.now, url.rsplit("/", 1)[-1]))
+        return await pyfetch(url, **kwargs)
+
+    sys.modules["pyodide.http"].pyfetch = recorded
+    for name in [*sys.modules]:
+        path = getattr(sys.modules[name], "__file__", None) or ""
+        if Path(path).parent == ROOT:
+            del sys.modules[name]
+    import data
+
+    return fakes, data, sent
+
+
+async def timed(clock, awaitable):
+    """The result, and the virtual ms it took."""
+    start = clock.now
+    task = asyncio.ensure_future(awaitable)
+    await drain()
+    while not task.done():
+        due = clock.next_due()
+        if due is None:
+            raise RuntimeError("stalled with nothing left to wait for")
+        await advance(clock, due)
+    return task.result(), clock.now - start
+
+
+async def run(args) -> list[tuple[str, bool, str]]:
+    data_dir = fixtures.write_fixtures(
+        Path(tempfile.mkdtemp(prefix="critdream-fixtures-"))
+    )
+    write_manifest(data_dir)
+    profile = PROFILES[args.profile]
+    storage = fake_browser.FakeCacheStorage()
+    checks = []
+
+    # first visit
+    fakes, data, sent = visit(data_dir, profile, storage)
+    cache = data.open_data_cache(APP_VERSION)
+    catalog, ms = await timed(fakes.clock, cache.fetch_bytes(data.catalog_url))
+    sent_at = {name: at for at, name in sent}
+    checks.append((
+        "first visit",
+        sent_at.get("catalog.json") == 0 and cache.misses == 1,
+        f"{ms:.0f} ms, catalog requested at {sent_at.get('catalog.json')} ms",
+    ))
+
+    # return visit
+    fakes, data, sent = visit(data_dir, profile, storage)
+    cache = data.open_data_cache(APP_VERSION)
+    cached, ms = await timed(fakes.clock, cache.fetch_bytes(data.catalog_url))
+    requested = [name for _, name in sent]
+    checks.append((
+        "return visit",
+        cached == catalog and cache.hits == 1 and "catalog.json" not in requested,
+        f"{ms:.0f} ms, requests: {', '.join(requested)}",
+    ))
+
+    # updated data
+    catalog_path = data_dir / "catalog.json"
+    catalog_path.write_bytes(catalog_path.read_bytes() + b"\n")
+    write_manifest(data_dir)
+    fakes, data, _ = visit(data_dir, profile, storage)
+    cache = data.open_data_cache(APP_VERSION)
+    updated, ms = await timed(fakes.clock, cache.fetch_bytes(data.catalog_url))
+    checks.append((
+        "updated data",
+        updated == catalog_path.read_bytes() and cache.misses == 1,
+        f"{ms:.0f} ms, {cache.hits} hits, {cache.misses} misses",
+    ))
+
+    # page and worker
+    fakes, data, _ = visit(data_dir, profile, storage)
+    page = data.open_data_cache(APP_VERSION)
+    worker = data.open_data_cache(APP_VERSION)
+    urls = [
+        data.data_url_template.format(episode_name=episode_name)
+        for episode_name in EPISODE_NAMES[:2]
+    ]
+    await timed(fakes.clock, asyncio.gather(
+        page.fetch_bytes(urls[0]), worker.fetch_bytes(urls[1])
+    ))
+    shared = await storage.caches["critdream-data"].match(page._index_url)
+    index = json.loads(await shared.text())
+    checks.append((
+        "page and worker",
+        all(url in index for url in urls),
+        f"{len(index)} files in the shared index",
+    ))
+
+    # eviction
+    urls = [
+        data.data_url_template.format(episode_name=episode_name)
+        for episode_name in EPISODE_NAMES[:4]
+    ]
+    sizes = [(data_dir / url.rsplit("/", 1)[-1]).stat().st_size for url in urls]
+    max_bytes = sizes[-1] + sizes[-2]
+    small = data.PersistentCache(
+        "critdream-evict", max_bytes, page.manifest, APP_VERSION
+    )
+    for url in urls:
+        await timed(fakes.clock, small.fetch_bytes(url))
+    stored = storage.caches["critdream-evict"]
+    index = json.loads(await (await stored.match(small._index_url)).text())
+    total = sum(size for _, size, _ in index.values())
+    entries = {url for url in stored.entries if url != small._index_url}
+    checks.append((
+        "eviction",
+        total <= max_bytes and entries == set(index) == set(urls[-2:]),
+        f"{total} of {max_bytes} bytes, {len(entries)} files kept",
+    ))
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # the checks count requests, so only profiles that don't fail any
+    parser.add_argument(
+        "--profile",
+        choices=[name for name, profile in PROFILES.items() if not profile.error_rate],
+        default="3g",
+    )
+    args = parser.parse_args()
+
+    # keep the app's dev console logging out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        checks = asyncio.run(run(args))
+    for name, ok, detail in checks:
+        print(f"{name:<16} {'ok' if ok else 'FAILED':<7} {detail}")
+    sys.exit(0 if all(ok for _, ok, _ in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Headless check of the service worker's image cache (sw.js) under Node.
+
+Runs sw.js in a Node vm with a fake Cache API, fetch and page client, with
+a byte budget a few episodes' worth of images wide, and drives it with the
+messages images.ImageStore sends. Checked:
+
+- downloads: offline episodes are downloaded whole while they fit
+- budget: a download that would put the offline episodes over their share
+  of the budget stops, is reported full, and leaves them under it
+- watching: images cached while watching another episode don't evict
+  offline ones, and the cache stays under the budget
+- remove: removing an offline copy makes room for another download
+
+    python benchmarks/bench_image_store.py
+    python benchmarks/bench_image_store.py --images 40 --image-kb 16
+
+Exits non-zero if any check fails, or if Node isn't installed.
+"""
+
+import argparse
+import json
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+IMAGE_ROOT = "https://huggingface.co/datasets/critdream/resolve/main/"
+
+# the worker, its messages, and the state it keeps, as seen from the page
+HARNESS = r"""
+const fs = require("fs");
+const vm = require("vm");
+const [swPath, imageRoot, maxBytes, images, imageBytes] = process.argv.slice(1);
+
+const stores = new Map();
+const caches = {
+    async open(name) {
+        if (!stores.has(name)) {
+            const entries = new Map();
+            stores.set(name, {
+                entries,
+                async match(url) {
+                    const body = entries.get(url);
+                    return body === undefined ? undefined : new Response(body);
+                },
+                async put(url, response) {
+                    entries.set(url, await response.arrayBuffer());
+                },
+                async delete(url) {
+                    return entries.delete(url);
+                },
+            });
+        }
+        return stores.get(name);
+    },
+};
+let fetched = 0;
+async function fetch(url) {
+    fetched += 1;
+    return new Response(new Uint8Array(Number(imageBytes)));
+}
+const listeners = {};
+const self = {
+    addEventListener: (type, listener) => { listeners[type] = listener; },
+    skipWaiting() {},
+    clients: {claim: async () => {}},
+    navigator: {},
+};
+vm.runInNewContext(
+    fs.readFileSync(swPath, "utf8"),
+    {self, caches, fetch, Response, URL, console},
+);
+
+const received = [];
+// copied, as postMessage does, since the worker goes on changing its state
+const client = {postMessage: (message) => received.push(structuredClone(message))};
+async function send(message) {
+    const pending = [];
+    listeners.message({data: message, source: client, waitUntil: (p) => pending.push(p)});
+    await Promise.all(pending);
+}
+async function watch(url) {
+    const pending = [];
+    const event = {
+        request: {method: "GET", url},
+        respondWith: (p) => pending.push(p),
+        waitUntil: (p) => pending.push(p),
+    };
+    listeners.fetch(event);
+    // the response first, then the cache write it queued
+    await pending[0];
+    await Promise.all(pending.slice(1));
+}
+const urls = (episode) => Array.from(
+    {length: Number(images)}, (_, n) => `${imageRoot}${episode}/scene_${n}_image_00.png`
+);
+async function snapshot(step) {
+    const cache = await caches.open("critdream-images");
+    const state = JSON.parse(new TextDecoder().decode(
+        cache.entries.get("https://critdream-images.invalid/state.json")
+    ));
+    const bytes = {};
+    for (const url of cache.entries.keys()) {
+        if (url in state.entries) {
+            const [size, , episode] = state.entries[url];
+            bytes[episode] = (bytes[episode] ?? 0) + size;
+        }
+    }
+    const progress = received.filter((m) => m.type === "progress").at(-1);
+    const offline = received.filter((m) => m.type === "offline").at(-1);
+    return {step, bytes, progress, offline: offline?.episodes ?? [], fetched};
+}
+
+(async () => {
+    const steps = [];
+    await send({type: "manifest", manifest: {imageRoot, maxBytes: Number(maxBytes), episode: "c1e001"}});
+    for (const episode of ["c2e001", "c2e002"]) {
+        await send({type: "download", episode, urls: urls(episode), size: null});
+        steps.push(await snapshot(`download ${episode}`));
+    }
+    await send({type: "download", episode: "c2e003", urls: urls("c2e003"), size: null});
+    steps.push(await snapshot("download c2e003"));
+    for (const url of urls("c1e001").slice(0, Number(images) / 2)) {
+        await watch(url);
+    }
+    steps.push(await snapshot("watch c1e001"));
+    await send({type: "remove", episode: "c2e003"});
+    await send({type: "remove", episode: "c2e001"});
+    await send({type: "download", episode: "c2e004", urls: urls("c2e004"), size: null});
+    steps.push(await snapshot("download c2e004"));
+    console.log(JSON.stringify(steps));
+})().catch((error) => { console.error(error); process.exit(1); });
+"""
+
+
+def run(args) -> list[tuple[str, bool, str]]:
+    image_bytes = args.image_kb * 1024
+    whole = args.images * image_bytes
+    # with the default share, offline downloads have room for two episodes
+    # and part of a third
+    max_bytes = int(whole * 3.6)
+    share = re.search(r"OFFLINE_SHARE = ([\d.]+);", (ROOT / "sw.js").read_text())
+    offline_max = max_bytes * float(share.group(1))
+    result = subprocess.run(
+        [
+            "node", "-e", HARNESS, str(ROOT / "sw.js"), IMAGE_ROOT,
+            str(max_bytes), str(args.images), str(image_bytes),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"sw.js harness failed:\n{result.stderr}")
+    steps = {step["step"]: step for step in json.loads(result.stdout)}
+
+    def offline_bytes(step):
+        return sum(
+            size for episode, size in step["bytes"].items()
+            if episode in step["offline"]
+        )
+
+    checks = []
+    second = steps["download c2e002"]
+    checks.append((
+        "downloads",
+        second["bytes"].get("c2e001") == second["bytes"].get("c2e002") == whole
+        and not second["progress"]["failed"],
+        f"{sorted(second['offline'])} saved, {offline_bytes(second)} bytes",
+    ))
+
+    third = steps["download c2e003"]
+    progress = third["progress"]
+    checks.append((
+        "budget",
+        progress.get("full")
+        and progress["done"] + progress["failed"] == progress["total"]
+        and offline_bytes(third) <= offline_max,
+        f"{progress['done']} of {progress['total']} saved, "
+        f"{offline_bytes(third)} of {offline_max:.0f} bytes offline",
+    ))
+
+    watched = steps["watch c1e001"]
+    kept = all(
+        watched["bytes"].get(episode) == third["bytes"].get(episode)
+        for episode in third["offline"]
+    )
+    checks.append((
+        "watching",
+        kept and sum(watched["bytes"].values()) <= max_bytes,
+        f"{sum(watched['bytes'].values())} of {max_bytes} bytes cached, "
+        f"offline episodes {'kept' if kept else 'evicted'}",
+    ))
+
+    fourth = steps["download c2e004"]
+    progress = fourth["progress"]
+    checks.append((
+        "remove",
+        sorted(fourth["offline"]) == ["c2e002", "c2e004"]
+        and not progress.get("full") and not progress["failed"]
+        and offline_bytes(fourth) <= offline_max
+        and sum(fourth["bytes"].values()) <= max_bytes,
+        f"{sorted(fourth['offline'])} saved, "
+        f"{sum(fourth['bytes'].values())} of {max_bytes} bytes cached",
+    ))
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=24,
+                        help="images in each episode's download")
+    parser.add_argument("--image-kb", type=int, default=64)
+    args = parser.parse_args()
+    if shutil.which("node") is None:
+        parser.exit(1, "node is needed to run sw.js\n")
+
+    checks = run(args)
+    for name, ok, detail in checks:
+        print(f"{name:<16} {'ok' if ok else 'FAILED':<7} {detail}")
+    sys.exit(0 if all(ok for _, ok, _ in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
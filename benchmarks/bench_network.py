@@ -0,0 +1,340 @@
+"""Headless end-to-end loading scenario under throttled network profiles.
+
+Runs main.py against the fake browser, like bench_playback.py, with every
+request held up, capped and failed on the virtual clock according to the
+profiles in network_profiles.py. The page url carries ``?data_root=`` for
+the stand-in host, as it would when pointed at standin_server.py, so the
+override is exercised too.
+
+The viewer opens the app and presses play as soon as the loading screen
+closes, watches for ``--minutes`` with a seek halfway through, then moves
+on to the next episode and watches for ``--minutes`` more. Recorded per
+profile:
+
+- time until the loading screen closed and the first image was up, and
+  from the switch until an image of the next episode was up
+- staleness: the share of playback during which the image on screen isn't
+  the one the app last picked for the playback position, because it is
+  still downloading, and the longest such stretches
+- requests, bytes transferred, failed requests and redirects
+- the image quality tier the app settled on for the link
+
+With the fixtures, ``--images`` picks what the image dataset offers: the
+full-size pngs only, resized variants, or variants packed per scene.
+
+A last session checks that image quality recovers: it starts on the
+``flaky`` profile until the app has stepped down, then moves to a fast link
+with a long round trip, where latency and redirects dominate small
+downloads, and times the step back up to the best tier. The run fails if
+that doesn't happen within ``RECOVERY_TIMEOUT_MS``.
+
+    python benchmarks/bench_network.py
+    python benchmarks/bench_network.py --profiles 3g flaky --json network.json
+    python benchmarks/bench_network.py --images packs
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import fake_browser  # noqa: E402
+import fixtures  # noqa: E402
+from bench_playback import percentile  # noqa: E402
+from episodes import EPISODE_NAMES  # noqa: E402
+from network_profiles import PROFILES, NetworkProfile  # noqa: E402
+
+
+# the stand-in server's default address, see standin_server.py
+STANDIN_ROOT = "http://127.0.0.1:8000/datasets/cosmicBboy"
+# how often the image on screen is checked against the playback position
+SAMPLE_MS = 250
+# give up on a session whose loading screen hasn't closed by then
+STARTUP_TIMEOUT_MS = 120_000
+# the link the recovery session moves to: plenty of bandwidth, far away
+FAST_FAR = NetworkProfile(
+    "fast-far", latency_ms=150, bandwidth_kbps=50_000, redirect=True
+)
+# how long the recovery session waits for each step
+RECOVERY_TIMEOUT_MS = 10 * 60_000
+
+
+async def drain():
+    # run everything that is ready; tasks waiting on the network wait on
+    # the virtual clock
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+async def advance(clock, until: float):
+    while (callback := clock.pop_due(until)) is not None:
+        callback()
+        await drain()
+    clock.now = max(clock.now, until)
+    await drain()
+
+
+async def cancel_tasks():
+    # a session's downloads would otherwise run on into the next one. Each
+    # cancelled image fetch starts the next queued one, so repeat until done
+    current = asyncio.current_task()
+    while tasks := [task for task in asyncio.all_tasks() if task is not current]:
+        for task in tasks:
+            task.cancel()
+        await drain()
+
+
+def image_url(src: str) -> str:
+    # the fake object urls carry the url the image was downloaded from
+    return src.removeprefix("blob:")
+
+
+class ImageWatcher:
+    """The image the app last picked, next to the one on screen."""
+
+    def __init__(self, swapper):
+        self.swapper = swapper
+        self.wanted = None
+        show = swapper.show
+
+        async def watched_show(src: str) -> bool:
+            self.wanted = image_url(src)
+            return await show(src)
+
+        swapper.show = watched_show
+
+    @property
+    def shown(self) -> str:
+        return image_url(self.swapper.front.src)
+
+    @property
+    def stale(self) -> bool:
+        return self.wanted is not None and self.shown != self.wanted
+
+
+def import_app():
+    # a fresh copy of the app for every session
+    for name in [*sys.modules]:
+        module = sys.modules[name]
+        path = getattr(module, "__file__", None) or ""
+        if Path(path).parent == ROOT:
+            del sys.modules[name]
+    import main
+
+    return main
+
+
+async def open_app(data_dir: Path, profile, episodes, seed: int):
+    """Open the app and wait for the loading screen to close, returning the
+    fakes, the app and a watcher on its images, or None if it never does."""
+    fakes = fake_browser.install(
+        data_dir,
+        episodes[0],
+        profile=profile,
+        seed=seed,
+        query=f"&data_root={STANDIN_ROOT}",
+    )
+    fakes.document.getElementById("episode").value = episodes[0]
+    clock, player = fakes.clock, fakes.player
+    # the iframe api script loads alongside python, and is usually first
+    fakes.window.youTubeIframeAPIReady = True
+    loading = fakes.document.getElementById("loading")
+    loading.open = True
+    app = import_app()
+    images = ImageWatcher(app.image_swapper)
+    await drain()
+
+    while loading.open:
+        if "onReady" in player.listeners and player.state == -1:
+            player.state = 5
+            player.emit("onReady")
+        if clock.now >= STARTUP_TIMEOUT_MS:
+            return None
+        await advance(clock, clock.now + SAMPLE_MS)
+    player.duration = app.timeline.end_time
+    return fakes, app, images
+
+
+async def run_session(data_dir: Path, profile, episodes, watch_ms: float, seed: int):
+    opened = await open_app(data_dir, profile, episodes, seed)
+    if opened is None:
+        return {"profile": profile.name, "startup_failed": True}
+    fakes, app, images = opened
+    clock, player, network = fakes.clock, fakes.player, fakes.network
+    loading_closed = clock.now
+    player.play()
+
+    played = clock.now
+    actions = [
+        (played + watch_ms / 2, lambda: player.seekTo(player.getCurrentTime() + 1200)),
+        (played + watch_ms, lambda: asyncio.ensure_future(app.advance_episode())),
+    ]
+    switched = played + watch_ms
+    end = played + 2 * watch_ms
+
+    samples = stale = 0
+    stale_since = None
+    stretches: list[float] = []
+    switch_to_image = None
+    while clock.now < end:
+        await advance(clock, clock.now + SAMPLE_MS)
+        while actions and actions[0][0] <= clock.now:
+            actions.pop(0)[1]()
+            await drain()
+        player.duration = app.timeline.end_time
+
+        if switch_to_image is None and clock.now > switched and (
+            f"/{episodes[1]}/" in images.shown
+        ):
+            switch_to_image = clock.now - switched
+        if player.state != 1:
+            continue
+        samples += 1
+        if not images.stale:
+            if stale_since is not None:
+                stretches.append(clock.now - stale_since)
+                stale_since = None
+            continue
+        stale += 1
+        if stale_since is None:
+            stale_since = clock.now - SAMPLE_MS
+    if stale_since is not None:
+        stretches.append(clock.now - stale_since)
+
+    marks = app.metrics.marks
+    return {
+        "profile": profile.name,
+        "startup_failed": False,
+        "loading_closed_ms": loading_closed,
+        "first_image_ms": marks.get("first_image"),
+        "switch_to_image_ms": switch_to_image,
+        "stale_share": stale / samples if samples else 0.0,
+        "stale_p95_s": percentile(stretches, 95) / 1000,
+        "stale_max_s": max(stretches, default=0.0) / 1000,
+        "requests": len(network.requests),
+        "megabytes": network.bytes_transferred / 1e6,
+        "errors": network.errors,
+        "redirects": network.redirects,
+        "image_quality": app.bandwidth.tier.name,
+        "app_metrics": app.metrics.snapshot(),
+    }
+
+
+async def run_recovery(data_dir: Path, episodes, seed: int) -> dict:
+    """Seconds from the link degrading to the step down, and from it
+    improving to the step back up to the best tier, None if either never
+    came."""
+    opened = await open_app(data_dir, PROFILES["flaky"], episodes, seed)
+    result = {"stepped_down_s": None, "recovered_s": None}
+    if opened is None:
+        return result
+    fakes, app, _ = opened
+    clock, player, link = fakes.clock, fakes.player, fakes.network.link
+    best = app.bandwidth.tiers[0].name
+    player.play()
+
+    async def wait_for(done) -> float | None:
+        since = clock.now
+        while not done():
+            if clock.now - since >= RECOVERY_TIMEOUT_MS:
+                return None
+            await advance(clock, clock.now + SAMPLE_MS)
+            player.duration = app.timeline.end_time
+        return (clock.now - since) / 1000
+
+    result["stepped_down_s"] = await wait_for(lambda: app.bandwidth.tier.name != best)
+    if result["stepped_down_s"] is not None:
+        link.profile = FAST_FAR
+        result["recovered_s"] = await wait_for(lambda: app.bandwidth.tier.name == best)
+    result["kbps"] = app.bandwidth.kbps
+    return result
+
+
+async def run(args) -> tuple[list[dict], dict]:
+    data_dir = args.data_dir
+    if data_dir is None:
+        data_dir = fixtures.write_fixtures(
+            Path(tempfile.mkdtemp(prefix="critdream-fixtures-"))
+        )
+        if args.images != "png":
+            fixtures.write_variant_manifest(data_dir, packs=args.images == "packs")
+    episodes = EPISODE_NAMES[:2]
+    sessions = []
+    for name in args.profiles:
+        sessions.append(await run_session(
+            data_dir, PROFILES[name], episodes, args.minutes * 60_000, args.seed
+        ))
+        await cancel_tasks()
+    recovery = await run_recovery(data_dir, episodes, args.seed)
+    await cancel_tasks()
+    return sessions, recovery
+
+
+def print_report(sessions: list[dict], recovery: dict):
+    def seconds(ms):
+        return f"{ms / 1000:.2f}" if ms is not None else "-"
+
+    print(
+        f"{'profile':<10} {'ready s':>8} {'image s':>8} {'switch s':>9} "
+        f"{'stale %':>8} {'p95 s':>6} {'max s':>6} {'reqs':>5} {'MB':>6} "
+        f"{'errors':>6} {'redir':>6} {'quality':>8}"
+    )
+    for session in sessions:
+        if session["startup_failed"]:
+            print(f"{session['profile']:<10} startup failed")
+            continue
+        print(
+            f"{session['profile']:<10} {seconds(session['loading_closed_ms']):>8} "
+            f"{seconds(session['first_image_ms']):>8} "
+            f"{seconds(session['switch_to_image_ms']):>9} "
+            f"{session['stale_share'] * 100:>8.1f} {session['stale_p95_s']:>6.1f} "
+            f"{session['stale_max_s']:>6.1f} {session['requests']:>5} "
+            f"{session['megabytes']:>6.1f} {session['errors']:>6} "
+            f"{session['redirects']:>6} {session['image_quality']:>8}"
+        )
+
+    def took(s):
+        return f"after {s:.1f} s" if s is not None else "never"
+
+    print(
+        f"\nquality recovery: stepped down on flaky {took(recovery['stepped_down_s'])}, "
+        f"back to the best tier on {FAST_FAR.name} {took(recovery['recovered_s'])}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=None,
+                        help="directory of real scene CSVs, defaults to fixtures")
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES),
+                        default=list(PROFILES))
+    parser.add_argument("--minutes", type=float, default=4,
+                        help="minutes watched before and after the switch")
+    parser.add_argument("--images", choices=["png", "variants", "packs"], default="png",
+                        help="images the fixtures offer, ignored with --data-dir")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    # keep the app's dev console logging out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        sessions, recovery = asyncio.run(run(args))
+    print_report(sessions, recovery)
+    if args.json:
+        args.json.write_text(
+            json.dumps({"sessions": sessions, "recovery": recovery}, indent=2)
+        )
+    if recovery["recovered_s"] is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
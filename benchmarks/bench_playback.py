@@ -0,0 +1,340 @@
+"""Headless benchmark of the scene-selection hot path.
+
+Runs main.py under plain CPython against fake browser modules and a virtual
+YouTube player clock, replaying playback traces over every episode:
+
+- linear: play straight through
+- seeks: play with a random seek every 15-60 seconds
+- double: play at 2x speed
+- pause: play with a pause of 5-60 seconds every 1-4 minutes
+- binge: play the last 6 minutes in binge mode, then on into the next episode
+
+and reports per-tick latency percentiles, allocations, network traffic and
+load/parse times. ``timeline_decode`` is what an episode load costs the main
+thread when the scene worker does the loading, ``preview`` is streaming and
+compiling just the scenes around a deep link halfway into an episode, and
+``appearance_lookup`` is a next-appearance lookup in the cross-episode index.
+
+    python benchmarks/bench_playback.py --minutes 30 --json results.json
+    python benchmarks/bench_playback.py --compare results.json
+
+With ``--compare`` the run exits non-zero if tick or load latency regressed
+by more than ``--tolerance`` against a saved run.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import fake_browser  # noqa: E402
+import fixtures  # noqa: E402
+from episodes import EPISODE_NAMES  # noqa: E402
+from scenes import Timeline  # noqa: E402
+
+
+TRACES = ["linear", "seeks", "double", "pause", "binge"]
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q / 100 * len(values)), len(values) - 1)]
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "count": len(samples),
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p95_us": percentile(samples, 95) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+        "max_us": max(samples, default=0.0) * 1e6,
+    }
+
+
+def build_actions(trace: str, player, horizon_ms: float, rng: random.Random):
+    """(wall time in ms, action) pairs for a trace, in order."""
+    actions = []
+    if trace == "double":
+        actions.append((0.0, lambda: player.setPlaybackRate(2.0)))
+    if trace == "binge":
+        actions.append((0.0, lambda: player.seekTo(max(player.duration - 360, 0))))
+        if horizon_ms > 360_000:
+            actions.append((360_000, player.end))
+    actions.append((0.0, player.play))
+
+    t = 0.0
+    while trace == "seeks":
+        t += rng.uniform(15_000, 60_000)
+        if t >= horizon_ms:
+            break
+        target = rng.uniform(0, player.duration)
+        actions.append((t, lambda target=target: player.seekTo(target)))
+
+    while trace == "pause":
+        t += rng.uniform(60_000, 240_000)
+        if t >= horizon_ms:
+            break
+        actions.append((t, player.pause))
+        t += rng.uniform(5_000, 60_000)
+        actions.append((t, player.play))
+
+    actions.append((horizon_ms, player.pause))
+    # stable, so actions at the same time keep the order they were added in
+    actions.sort(key=lambda action: action[0])
+    return actions
+
+
+async def drain():
+    # let fetch and decode tasks scheduled by the app run to completion
+    current = asyncio.current_task()
+    for _ in range(100):
+        pending = [t for t in asyncio.all_tasks() if t is not current and not t.done()]
+        if not pending:
+            return
+        await asyncio.sleep(0)
+
+
+async def play_trace(fakes, app, episode_name, trace, horizon_ms, seed, trace_memory):
+    clock, player, network = fakes.clock, fakes.player, fakes.network
+
+    fakes.document.getElementById("episode").value = episode_name
+    fakes.document.getElementById("binge").checked = trace == "binge"
+    await app.switch_episode(episode_name)
+    await drain()
+    player.rate = 1.0
+    player.duration = app.timeline.end_time
+
+    actions = build_actions(trace, player, horizon_ms, random.Random(seed))
+    start_ms = clock.now
+    requests_before = len(network.requests)
+    bytes_before = network.bytes_transferred
+
+    ticks: list[float] = []
+    state_changes: list[float] = []
+    if trace_memory:
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+
+    for at, action in actions:
+        at += start_ms
+        while (callback := clock.pop_due(at)) is not None:
+            started = time.perf_counter()
+            callback()
+            ticks.append(time.perf_counter() - started)
+            await drain()
+        clock.now = max(clock.now, at)
+        started = time.perf_counter()
+        action()
+        state_changes.append(time.perf_counter() - started)
+        await drain()
+
+    result = {
+        "episode": episode_name,
+        "trace": trace,
+        "ticks": ticks,
+        "state_changes": state_changes,
+        "video_minutes": player.getCurrentTime() / 60,
+        "requests": len(network.requests) - requests_before,
+        "bytes": network.bytes_transferred - bytes_before,
+    }
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["retained_bytes"] = current - baseline
+        result["peak_bytes"] = peak - baseline
+    return result
+
+
+async def run(args) -> dict:
+    data_dir = args.data_dir or fixtures.write_fixtures(
+        Path(tempfile.mkdtemp(prefix="critdream-fixtures-"))
+    )
+    episodes = EPISODE_NAMES[:args.episodes] if args.episodes else EPISODE_NAMES
+    fakes = fake_browser.install(data_dir, episodes[0])
+    fakes.document.getElementById("episode").value = episodes[0]
+
+    started = time.perf_counter()
+    import main as app
+    await drain()
+    fakes.window.onYouTubeIframeAPIReady()
+    fakes.player.emit("onReady")
+    startup = time.perf_counter() - started
+    # main() loads the appearance index once the player is ready
+    await drain()
+
+    load_times, compile_times, decode_times, preview_times = [], [], [], []
+    load_bytes = preview_bytes = 0
+    for episode_name in episodes:
+        gc.collect()
+        episode = app.catalog[episode_name]
+        bytes_before = fakes.network.bytes_transferred
+        started = time.perf_counter()
+        preview = await app.load_scene_preview(episode, app.timeline.end_time / 2)
+        preview.timeline
+        preview_times.append(time.perf_counter() - started)
+        preview_bytes += fakes.network.bytes_transferred - bytes_before
+
+        bytes_before = fakes.network.bytes_transferred
+        started = time.perf_counter()
+        index = await app.load_scene_index(
+            app.data_cache, episode_name, episode.intro_end, episode.episode_break
+        )
+        load_times.append(time.perf_counter() - started)
+        load_bytes += fakes.network.bytes_transferred - bytes_before
+        started = time.perf_counter()
+        encoded = index.timeline.to_bytes()
+        compile_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        Timeline.from_bytes(encoded)
+        decode_times.append(time.perf_counter() - started)
+
+    lookup_times = []
+    for episode_name in episodes:
+        for name in app.appearances.names:
+            started = time.perf_counter()
+            app.appearances.next(name, episode_name, app.catalog[episode_name].intro_end)
+            lookup_times.append(time.perf_counter() - started)
+
+    results = []
+    for trace in args.traces:
+        for i, episode_name in enumerate(episodes):
+            results.append(await play_trace(
+                fakes,
+                app,
+                episode_name,
+                trace,
+                args.minutes * 60_000,
+                seed=args.seed + i,
+                trace_memory=args.allocations,
+            ))
+
+    report = {
+        "startup_ms": startup * 1e3,
+        "load": summarize(load_times),
+        "load_kb": load_bytes / len(episodes) / 1e3,
+        "preview": summarize(preview_times),
+        "preview_kb": preview_bytes / len(episodes) / 1e3,
+        "timeline_compile": summarize(compile_times),
+        "timeline_decode": summarize(decode_times),
+        "appearance_lookup": summarize(lookup_times),
+        "traces": {},
+    }
+    for trace in args.traces:
+        runs = [r for r in results if r["trace"] == trace]
+        video_minutes = sum(r["video_minutes"] for r in runs) or 1.0
+        ticks = [t for r in runs for t in r["ticks"]]
+        summary = {
+            "tick": summarize(ticks),
+            "state_change": summarize([t for r in runs for t in r["state_changes"]]),
+            "ticks_per_video_minute": len(ticks) / video_minutes,
+            "requests": sum(r["requests"] for r in runs),
+            "megabytes": sum(r["bytes"] for r in runs) / 1e6,
+        }
+        if args.allocations:
+            summary["peak_kb"] = max(r["peak_bytes"] for r in runs) / 1e3
+            summary["retained_kb"] = max(r["retained_bytes"] for r in runs) / 1e3
+        report["traces"][trace] = summary
+    # the app's own instrumentation, as it would be exported from the browser
+    report["app_metrics"] = app.metrics.snapshot()
+    return report
+
+
+def print_report(report: dict):
+    print(f"startup: {report['startup_ms']:.1f} ms")
+    for name in ("load", "preview", "timeline_compile", "timeline_decode"):
+        stats = report[name]
+        print(
+            f"{name}: p50 {stats['p50_us'] / 1e3:.2f} ms, "
+            f"p95 {stats['p95_us'] / 1e3:.2f} ms, max {stats['max_us'] / 1e3:.2f} ms"
+            + (f", {report[name + '_kb']:.1f} KB" if name + "_kb" in report else "")
+        )
+    stats = report["appearance_lookup"]
+    print(
+        f"appearance_lookup: p50 {stats['p50_us']:.1f} us, "
+        f"p95 {stats['p95_us']:.1f} us, max {stats['max_us']:.1f} us"
+    )
+    print()
+    print(
+        f"{'trace':<8} {'ticks':>7} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8} "
+        f"{'max us':>8} {'tick/min':>8} {'seek p99':>9} {'reqs':>6} {'MB':>8}"
+        + (f" {'peak KB':>8} {'kept KB':>8}" if "peak_kb" in next(
+            iter(report["traces"].values()), {}
+        ) else "")
+    )
+    for trace, summary in report["traces"].items():
+        tick = summary["tick"]
+        line = (
+            f"{trace:<8} {tick['count']:>7} {tick['p50_us']:>8.1f} "
+            f"{tick['p95_us']:>8.1f} {tick['p99_us']:>8.1f} {tick['max_us']:>8.1f} "
+            f"{summary['ticks_per_video_minute']:>8.2f} "
+            f"{summary['state_change']['p99_us']:>9.1f} "
+            f"{summary['requests']:>6} {summary['megabytes']:>8.1f}"
+        )
+        if "peak_kb" in summary:
+            line += f" {summary['peak_kb']:>8.1f} {summary['retained_kb']:>8.1f}"
+        print(line)
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    checks = [("load p95", report["load"]["p95_us"], baseline["load"]["p95_us"])]
+    for trace, summary in report["traces"].items():
+        if trace in baseline["traces"]:
+            checks.append((
+                f"{trace} tick p95",
+                summary["tick"]["p95_us"],
+                baseline["traces"][trace]["tick"]["p95_us"],
+            ))
+    for name, value, reference in checks:
+        if reference and value > reference * (1 + tolerance):
+            regressions.append(f"{name}: {value:.1f} us vs {reference:.1f} us")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=None,
+                        help="directory of real scene CSVs, defaults to fixtures")
+    parser.add_argument("--episodes", type=int, default=0,
+                        help="only replay the first N episodes")
+    parser.add_argument("--minutes", type=float, default=60,
+                        help="wall-clock minutes of playback per trace")
+    parser.add_argument("--traces", nargs="+", choices=TRACES, default=TRACES)
+    parser.add_argument("--allocations", action="store_true",
+                        help="trace memory allocations (slower)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # keep the app's dev console logging out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
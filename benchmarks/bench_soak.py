@@ -0,0 +1,229 @@
+"""Headless soak test of a long viewing session.
+
+Runs main.py against the fake browser modules, like bench_playback.py, for
+several hours of virtual time with the metrics panel open. The viewer keeps
+playing and every few minutes does something else: seeks, pauses, clicks
+skip intro, picks another episode, jumps to a character's next or previous
+appearance, or lets an episode run out in binge mode.
+
+Every ``--sample-minutes`` it records traced Python memory after a full
+collection, the number of live FFI proxies, armed timers and pending tasks.
+The caches and the metrics' sample windows (the last 1000 ticks) fill up
+during ``--warmup-minutes``; after that all of these should stay flat.
+
+    python benchmarks/bench_soak.py
+    python benchmarks/bench_soak.py --hours 8 --json soak.json
+
+Exits non-zero if memory grew by more than ``--tolerance-kb`` after the
+warm-up, or if proxies, timers or tasks grew at all.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import random
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import fake_browser  # noqa: E402
+import fixtures  # noqa: E402
+from bench_playback import drain  # noqa: E402
+from episodes import EPISODE_NAMES  # noqa: E402
+
+
+# relative weights of what the viewer does between stretches of playback
+ACTIONS = {
+    "seek": 6,
+    "pause": 3,
+    "skip_intro": 1,
+    "switch": 2,
+    "appearance": 2,
+    "binge": 1,
+}
+
+
+def build_session(fakes, app, episodes, horizon_ms: float, rng: random.Random):
+    """(wall time in ms, action) pairs for the whole session, in order."""
+    player, document = fakes.player, fakes.document
+
+    def switch_episode():
+        document.getElementById("episode").value = rng.choice(episodes)
+        app.set_current_episode(None)
+
+    def jump_to_appearance():
+        names = document.getElementById("appearance-name")
+        names.value = rng.choice(app.appearances.names)
+        app.jump_to_appearance(forward=rng.random() < 0.7)
+
+    def binge(checked: bool):
+        document.getElementById("binge").checked = checked
+
+    actions = [(0.0, player.play)]
+    t = 0.0
+    while True:
+        t += rng.uniform(60_000, 300_000)
+        if t >= horizon_ms:
+            break
+        kind = rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        if kind == "seek":
+            actions.append((t, lambda: player.seekTo(rng.uniform(0, player.duration))))
+        elif kind == "pause":
+            actions.append((t, player.pause))
+            actions.append((t + rng.uniform(5_000, 60_000), player.play))
+        elif kind == "skip_intro":
+            actions.append((t, lambda: app.skip_intro(None)))
+        elif kind == "switch":
+            actions.append((t, switch_episode))
+            actions.append((t, player.play))
+        elif kind == "appearance":
+            actions.append((t, jump_to_appearance))
+            actions.append((t, player.play))
+        elif kind == "binge":
+            # run out the last minute of the episode, then on into the next
+            actions.append((t, lambda: binge(True)))
+            actions.append((t, lambda: player.seekTo(max(player.duration - 60, 0))))
+            actions.append((t + 60_000, player.end))
+            actions.append((t + 60_000, lambda: binge(False)))
+    # stable, so actions at the same time keep the order they were added in
+    actions.sort(key=lambda action: action[0])
+    return actions
+
+
+def sample(fakes, minutes: float) -> dict:
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    # the fake network's request log is the harness's, not the app's
+    fakes.network.requests.clear()
+    return {
+        "minutes": minutes,
+        "memory_kb": current / 1e3,
+        "proxies": fakes.proxies.live,
+        "timers": fakes.clock.pending,
+        "tasks": len(asyncio.all_tasks()),
+    }
+
+
+async def run(args) -> dict:
+    data_dir = args.data_dir or fixtures.write_fixtures(
+        Path(tempfile.mkdtemp(prefix="critdream-fixtures-"))
+    )
+    episodes = EPISODE_NAMES[:args.episodes] if args.episodes else EPISODE_NAMES
+    fakes = fake_browser.install(data_dir, episodes[0])
+    fakes.document.getElementById("episode").value = episodes[0]
+    clock, player = fakes.clock, fakes.player
+
+    import main as app
+    await drain()
+    fakes.window.onYouTubeIframeAPIReady()
+    player.emit("onReady")
+    await drain()
+    app.show_metrics_panel()
+
+    tracemalloc.start()
+    horizon_ms = args.hours * 3_600_000
+    actions = build_session(
+        fakes, app, episodes, horizon_ms, random.Random(args.seed)
+    )
+    sample_ms = args.sample_minutes * 60_000
+    actions += [
+        (at, None) for at in range(0, int(horizon_ms) + 1, int(sample_ms))
+    ]
+    actions.sort(key=lambda action: action[0])
+
+    samples = []
+    for at, action in actions:
+        while (callback := clock.pop_due(at)) is not None:
+            callback()
+            await drain()
+        clock.now = max(clock.now, at)
+        if action is None:
+            samples.append(sample(fakes, at / 60_000))
+            continue
+        player.duration = app.timeline.end_time
+        action()
+        await drain()
+    tracemalloc.stop()
+
+    steady = [s for s in samples if s["minutes"] >= args.warmup_minutes]
+    growth = {
+        name: steady[-1][name] - steady[0][name]
+        for name in ("memory_kb", "proxies", "timers", "tasks")
+    }
+    return {
+        "samples": samples,
+        "growth": growth,
+        "proxies_created": fakes.proxies.created,
+        "app_metrics": app.metrics.snapshot(),
+    }
+
+
+def print_report(report: dict):
+    print(f"{'minutes':>8} {'memory KB':>10} {'proxies':>8} {'timers':>7} {'tasks':>6}")
+    for s in report["samples"]:
+        print(
+            f"{s['minutes']:>8.0f} {s['memory_kb']:>10.1f} {s['proxies']:>8} "
+            f"{s['timers']:>7} {s['tasks']:>6}"
+        )
+    growth = report["growth"]
+    counters = report["app_metrics"]["counters"]
+    print()
+    print(
+        f"after warm-up: {growth['memory_kb']:+.1f} KB, "
+        f"{growth['proxies']:+d} proxies, {growth['timers']:+d} timers, "
+        f"{growth['tasks']:+d} tasks"
+    )
+    print(
+        f"{report['proxies_created']} proxies created in total, "
+        f"{counters.get('ticks', 0)} ticks, "
+        f"{counters.get('seeks_resolved', 0)} seeks, "
+        f"{counters.get('appearance_jumps', 0)} appearance jumps, "
+        f"{counters.get('binge_advances', 0)} binge advances"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=None,
+                        help="directory of real scene CSVs, defaults to fixtures")
+    parser.add_argument("--episodes", type=int, default=0,
+                        help="only watch the first N episodes")
+    parser.add_argument("--hours", type=float, default=6,
+                        help="wall-clock hours of the session")
+    parser.add_argument("--sample-minutes", type=float, default=15)
+    parser.add_argument("--warmup-minutes", type=float, default=180)
+    parser.add_argument("--tolerance-kb", type=float, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+    # growth is measured between samples taken after the warm-up, so there
+    # have to be at least two of them
+    if args.hours * 60 < args.warmup_minutes + args.sample_minutes:
+        parser.error(
+            "--hours must run at least --sample-minutes past --warmup-minutes"
+        )
+
+    # keep the app's dev console logging out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    growth = report["growth"]
+    leaked = growth["memory_kb"] > args.tolerance_kb or any(
+        growth[name] > 0 for name in ("proxies", "timers", "tasks")
+    )
+    sys.exit(1 if leaked else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Startup cost of reading scene data with pandas and with SceneTable.
+
+The app used to read the aligned scene CSVs and the video id map with
+pandas, and now reads them with scenes.SceneTable on the stdlib. Time to
+interactive in the browser can only be read off the ``interactive after``
+line main.py logs; this measures the part of it that runs the same way
+under CPython:
+
+- import: a fresh interpreter importing pandas, next to one importing the
+  app's scene module, median of ``--runs``
+- parse: turning every fixture episode's CSV and the video id map into
+  scenes, the way the app did before (pandas) and does now (SceneTable)
+
+In Pyodide both take longer, and pandas and NumPy are also downloaded
+before anything runs, so these are lower bounds on the difference. The
+pandas rows are skipped if pandas isn't installed.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 21 --json startup.json
+"""
+
+import argparse
+import io
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import fixtures  # noqa: E402
+from episodes import EPISODE_NAMES  # noqa: E402
+from scenes import SceneTable, make_scene, read_video_id_map  # noqa: E402
+
+
+IMPORT_TIMER = (
+    "import sys, time; sys.path.insert(0, {root!r}); t = time.perf_counter(); "
+    "import {module}; print(time.perf_counter() - t)"
+)
+
+
+def import_ms(module: str, runs: int) -> float | None:
+    """Median time for a fresh interpreter to import ``module``."""
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_TIMER.format(root=str(ROOT), module=module)],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            return None
+        times.append(float(result.stdout) * 1000)
+    return statistics.median(times)
+
+
+def parse_with_pandas(pd, texts: dict[str, str], video_ids: str):
+    # as main.py did before SceneTable
+    for episode_name, text in texts.items():
+        df = (
+            pd.read_csv(io.StringIO(text))
+            .rename(columns={"start": "start_time", "end": "end_time"})
+            .query(f"episode_name == '{episode_name}'")
+        )
+        list(
+            make_scene(*row)
+            for row in zip(
+                df["scene_id"],
+                df["speaker"],
+                df["character"],
+                df["start_time"],
+                df["end_time"],
+            )
+        )
+    pd.read_csv(io.StringIO(video_ids)).set_index("episode_name")["youtube_id"]
+
+
+def parse_with_scene_table(texts: dict[str, str], video_ids: str):
+    for episode_name, text in texts.items():
+        list(SceneTable.from_csv(text, episode_name).scenes())
+    read_video_id_map(video_ids)
+
+
+def parse_ms(parse, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        parse()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def run(args) -> dict:
+    data_dir = args.data_dir or fixtures.write_fixtures(
+        Path(tempfile.mkdtemp(prefix="critdream-fixtures-"))
+    )
+    texts = {
+        episode_name: (data_dir / f"aligned_scenes_{episode_name}.csv").read_text()
+        for episode_name in EPISODE_NAMES
+    }
+    video_ids = (data_dir / "video_id_map.csv").read_text()
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    return {
+        "episodes": len(texts),
+        "import_ms": {
+            "pandas": import_ms("pandas", args.runs),
+            "scenes": import_ms("scenes", args.runs),
+        },
+        "parse_ms": {
+            "pandas": (
+                parse_ms(lambda: parse_with_pandas(pd, texts, video_ids), args.runs)
+                if pd is not None else None
+            ),
+            "scenes": parse_ms(
+                lambda: parse_with_scene_table(texts, video_ids), args.runs
+            ),
+        },
+    }
+
+
+def print_report(report: dict):
+    def ms(value):
+        return f"{value:.1f}" if value is not None else "-"
+
+    print(f"{'':<8} {'pandas ms':>10} {'scenes ms':>10}")
+    for step in ("import", "parse"):
+        timings = report[f"{step}_ms"]
+        print(f"{step:<8} {ms(timings['pandas']):>10} {ms(timings['scenes']):>10}")
+    print(f"\nparse covers {report['episodes']} episodes and the video id map")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=None,
+                        help="directory of real scene CSVs, defaults to fixtures")
+    parser.add_argument("--runs", type=int, default=11)
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
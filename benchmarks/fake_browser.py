@@ -0,0 +1,689 @@
+"""Stand-ins for the browser modules main.py imports, for running under CPython.
+
+``install()`` registers fake ``js``, ``pyscript``, ``pyweb`` and ``pyodide``
+modules in ``sys.modules``. Timers run on a virtual clock that the caller
+advances explicitly, and ``pyfetch`` serves files from a local directory
+laid out like the Hugging Face datasets, optionally throttled to one of the
+network profiles in network_profiles.py.
+"""
+
+import asyncio
+import heapq
+import itertools
+import sys
+import types
+from pathlib import Path
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import fixtures
+from network_profiles import Link, NetworkProfile, redirects
+
+
+class FakeClock:
+    """Virtual wall clock in milliseconds, with setTimeout and setInterval queues."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._timers: list[tuple[float, int, object]] = []
+        # repeat delays of the armed intervals, by timer id
+        self._intervals: dict[int, float] = {}
+        self._cancelled: set[int] = set()
+        self._ids = itertools.count(1)
+
+    def set_timeout(self, callback, delay=0, *args):
+        timer_id = next(self._ids)
+        heapq.heappush(self._timers, (self.now + max(delay, 0), timer_id, callback))
+        return timer_id
+
+    def set_interval(self, callback, delay=0, *args):
+        # browsers clamp interval delays, which also keeps this from spinning
+        timer_id = self.set_timeout(callback, max(delay, 4))
+        self._intervals[timer_id] = max(delay, 4)
+        return timer_id
+
+    def clear_timeout(self, timer_id):
+        # ids of timers that already fired are ignored, as in the browser
+        if timer_id is not None and any(i == timer_id for _, i, _ in self._timers):
+            self._cancelled.add(timer_id)
+        self._intervals.pop(timer_id, None)
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for _, i, _ in self._timers if i not in self._cancelled)
+
+    def next_due(self) -> float | None:
+        while self._timers and self._timers[0][1] in self._cancelled:
+            self._cancelled.discard(heapq.heappop(self._timers)[1])
+        return self._timers[0][0] if self._timers else None
+
+    def pop_due(self, until: float):
+        """Pop the next timer due at or before ``until``, advancing the clock."""
+        due = self.next_due()
+        if due is None or due > until:
+            return None
+        _, timer_id, callback = heapq.heappop(self._timers)
+        self.now = max(self.now, due)
+        if timer_id in self._intervals:
+            heapq.heappush(
+                self._timers, (due + self._intervals[timer_id], timer_id, callback)
+            )
+        return callback
+
+
+class ClassList:
+    def __init__(self):
+        self._classes: set[str] = set()
+
+    def add(self, *names):
+        self._classes.update(names)
+
+    def remove(self, *names):
+        self._classes.difference_update(names)
+
+    def contains(self, name):
+        return name in self._classes
+
+    def toggle(self, name, force=None):
+        if force is None:
+            force = name not in self._classes
+        (self.add if force else self.remove)(name)
+        return force
+
+
+class FakeElement:
+    # set by install(), so that images with a remote src are downloaded
+    network = None
+
+    def __init__(self, tag="div", element_id=""):
+        self.tagName = tag.upper()
+        self.id = element_id
+        self.classList = ClassList()
+        self.style = types.SimpleNamespace()
+        self.dataset = types.SimpleNamespace()
+        self.children: list["FakeElement"] = []
+        self.attributes: dict[str, str] = {}
+        self.listeners: dict[str, list] = {}
+        self.innerHTML = ""
+        self.textContent = ""
+        self.value = ""
+        self.hidden = False
+        self.checked = False
+        self._src = ""
+        self._loading = None
+        self.clientWidth = 640
+        self.height = 0
+        self.naturalWidth = 1024
+        self.naturalHeight = 1024
+
+    def setAttribute(self, name, value):
+        self.attributes[name] = value
+
+    def getAttribute(self, name):
+        return self.attributes.get(name)
+
+    def addEventListener(self, event, callback, *args):
+        self.listeners.setdefault(event, []).append(callback)
+
+    def removeEventListener(self, event, callback, *args):
+        if callback in self.listeners.get(event, []):
+            self.listeners[event].remove(callback)
+
+    def appendChild(self, child):
+        self.children.append(child)
+        return child
+
+    append = appendChild
+
+    def showModal(self):
+        self.open = True
+
+    def close(self):
+        self.open = False
+
+    @property
+    def src(self):
+        return self._src
+
+    @src.setter
+    def src(self, value):
+        # a new src cancels the download of the previous one
+        if self._loading is not None:
+            self._loading.abort()
+            self._loading = None
+        self._src = value
+
+    async def decode(self):
+        src = self.src
+        if FakeElement.network is None or not src.startswith("http"):
+            return None
+        # a remote image is downloaded first, as the browser would
+        self._loading = FakeAbortController()
+        try:
+            response = await FakeElement.network.pyfetch(
+                src, signal=self._loading.signal
+            )
+            await response.blob()
+        except RuntimeError:
+            raise RuntimeError("EncodingError: src replaced while loading")
+        if not response.ok:
+            raise RuntimeError(f"EncodingError: could not load {src}")
+
+
+class FakeDocument:
+    def __init__(self):
+        self.elements: dict[str, FakeElement] = {}
+
+    def getElementById(self, element_id):
+        if element_id not in self.elements:
+            self.elements[element_id] = FakeElement(element_id=element_id)
+        return self.elements[element_id]
+
+    def querySelector(self, selector):
+        return self.getElementById(selector.rsplit("#", 1)[-1])
+
+    def createElement(self, tag):
+        return FakeElement(tag)
+
+
+class FakeURL:
+    def __init__(self, href):
+        parsed = urlparse(href)
+        self.href = href
+        self.origin = f"{parsed.scheme}://{parsed.netloc}"
+        hostname = parsed.hostname or ""
+        self.hostname = f"[{hostname}]" if ":" in hostname else hostname
+        self.pathname = parsed.path
+        self.searchParams = FakeSearchParams(parsed.query)
+
+    @staticmethod
+    def new(href, base=None):
+        return FakeURL(urljoin(base, href) if base else href)
+
+    @staticmethod
+    def createObjectURL(blob):
+        # carries the url the blob was downloaded from, for the benchmarks
+        return f"blob:{getattr(blob, 'url', id(blob))}"
+
+    @staticmethod
+    def revokeObjectURL(url):
+        pass
+
+
+class FakeSearchParams:
+    def __init__(self, query):
+        self._params = {k: v[0] for k, v in parse_qs(query).items()}
+
+    def get(self, name):
+        return self._params.get(name)
+
+    def set(self, name, value):
+        self._params[name] = value
+
+    def delete(self, name):
+        self._params.pop(name, None)
+
+    def toString(self):
+        return "&".join(f"{k}={v}" for k, v in self._params.items())
+
+
+class FakeAbortSignal:
+    def __init__(self):
+        self.aborted = False
+        self.listeners = []
+
+    def addEventListener(self, event, callback, *args):
+        if event == "abort":
+            self.listeners.append(callback)
+
+
+class FakeAbortController:
+    def __init__(self):
+        self.signal = FakeAbortSignal()
+
+    @staticmethod
+    def new():
+        return FakeAbortController()
+
+    def abort(self):
+        if self.signal.aborted:
+            return
+        self.signal.aborted = True
+        for callback in self.signal.listeners:
+            callback()
+
+
+async def arrived():
+    pass
+
+
+class FakeReader:
+    """A ReadableStream reader handing out a body in fixed-size chunks."""
+
+    CHUNK_BYTES = 16 * 1024
+
+    def __init__(self, data: bytes, body_arrived):
+        self._data = data
+        self._position = 0
+        self._body_arrived = body_arrived
+
+    async def read(self):
+        await self._body_arrived()
+        if self._position >= len(self._data):
+            return types.SimpleNamespace(done=True, value=None)
+        chunk = self._data[self._position:self._position + self.CHUNK_BYTES]
+        self._position += len(chunk)
+        return types.SimpleNamespace(
+            done=False, value=types.SimpleNamespace(to_bytes=lambda: chunk)
+        )
+
+    def cancel(self):
+        self._position = len(self._data)
+
+
+class FakeBlob:
+    """Bytes with a size, which for placeholders is more than the bytes."""
+
+    def __init__(self, data: bytes, size: int, url: str):
+        self._data = data
+        self.size = size
+        self.url = url
+
+    def slice(self, start=0, end=None, content_type=""):
+        end = self.size if end is None else min(end, self.size)
+        # a url of its own, so slices of a pack tell apart in the benchmarks
+        return FakeBlob(self._data[start:end], end - start, f"{self.url}#{start}")
+
+    async def arrayBuffer(self):
+        return types.SimpleNamespace(to_bytes=lambda: self._data)
+
+
+class FakeResponse:
+    """A response whose headers are in, and whose body arrives once
+    ``body_arrived`` returns."""
+
+    def __init__(
+        self,
+        url,
+        data: bytes | None,
+        status: int | None = None,
+        size: int | None = None,
+        body_arrived=arrived,
+    ):
+        self.url = url
+        self.ok = data is not None
+        self.status = status or (200 if self.ok else 404)
+        self._data = data or b""
+        # placeholder images are empty but weigh what real ones do
+        self._size = len(self._data) if size is None else size
+        self._body_arrived = body_arrived
+        self.js_response = self
+        self.body = types.SimpleNamespace(
+            getReader=lambda: FakeReader(self._data, body_arrived)
+        )
+
+    @staticmethod
+    def new(body=None, *args):
+        # new Response(body), as stored in the Cache API
+        data = body.encode() if isinstance(body, str) else bytes(body or b"")
+        return FakeResponse("", data)
+
+    async def string(self):
+        await self._body_arrived()
+        return self._data.decode()
+
+    text = string
+
+    async def arrayBuffer(self):
+        await self._body_arrived()
+        return types.SimpleNamespace(to_bytes=lambda: self._data)
+
+    async def bytes(self):
+        await self._body_arrived()
+        return self._data
+
+    async def blob(self):
+        await self._body_arrived()
+        return FakeBlob(self._data, self._size, self.url)
+
+
+class FakeCache:
+    """One named cache of the Cache API: stored response bodies by url."""
+
+    def __init__(self):
+        self.entries: dict[str, bytes] = {}
+
+    async def match(self, url):
+        data = self.entries.get(url)
+        return FakeResponse(url, data) if data is not None else None
+
+    async def put(self, url, response):
+        self.entries[url] = await response.bytes()
+
+    async def delete(self, url):
+        return self.entries.pop(url, None) is not None
+
+
+class FakeCacheStorage:
+    """The Cache API's ``caches``, kept across installs for return visits."""
+
+    def __init__(self):
+        self.caches: dict[str, FakeCache] = {}
+
+    async def open(self, name):
+        return self.caches.setdefault(name, FakeCache())
+
+
+class FakeNetwork:
+    """Serves fixture files by the last path segment of the requested url.
+
+    Images that aren't present locally are served as an empty placeholder, so
+    the image pipeline runs end to end without real scene images, and image
+    packs as a placeholder with a real index. Files under ``variants/`` are
+    looked for in a ``variants`` directory first. Range requests get a 206
+    with just the requested bytes.
+
+    With a ``profile``, response headers arrive after the profile's latency
+    and the body after its transfer time on the virtual ``clock``, a share
+    of responses fail with a 503, and in-flight requests can be aborted.
+    Without one they are immediate.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        image_bytes: int = 1_000_000,
+        clock: FakeClock | None = None,
+        profile: NetworkProfile | None = None,
+        seed: int = 0,
+    ):
+        self.data_dir = Path(data_dir)
+        self.image_bytes = image_bytes
+        self.clock = clock
+        self.link = Link(profile, seed) if profile is not None else None
+        self.requests: list[str] = []
+        self.bytes_transferred = 0
+        self.errors = 0
+        self.redirects = 0
+
+    async def pyfetch(self, url, **kwargs):
+        self.requests.append(url)
+        if self.link is not None and self.link.fails():
+            self.errors += 1
+            body_arrived = await self._arrival(url, 0, kwargs.get("signal"))
+            return FakeResponse(url, None, 503, body_arrived=body_arrived)
+
+        url_path = urlparse(url).path
+        name = url_path.rsplit("/", 1)[-1]
+        path = self.data_dir / name
+        if "/variants/" in url_path and (self.data_dir / "variants" / name).exists():
+            path = self.data_dir / "variants" / name
+        pack = fixtures.placeholder_pack(name)
+        if path.exists():
+            data = path.read_bytes()
+            size = None
+        elif pack is not None:
+            # the app reads the index, only the size of the rest matters
+            data, size = pack
+        elif path.suffix in (".png", ".webp", ".avif"):
+            # only the size of a placeholder image matters here
+            data, size = b"", fixtures.placeholder_bytes(name, self.image_bytes)
+        else:
+            body_arrived = await self._arrival(url, 0, kwargs.get("signal"))
+            return FakeResponse(url, None, body_arrived=body_arrived)
+
+        status = None
+        byte_range = kwargs.get("headers", {}).get("Range")
+        if byte_range:
+            first, last = byte_range.removeprefix("bytes=").split("-")
+            data = data[int(first):int(last) + 1 if last else None]
+            status = 206
+        size = len(data) if size is None else size
+        self.bytes_transferred += size
+        body_arrived = await self._arrival(url, size, kwargs.get("signal"))
+        return FakeResponse(url, data, status, size, body_arrived)
+
+    async def _arrival(self, url, nbytes: int, signal):
+        """Wait for the response headers, then return an async function that
+        waits for the end of the body."""
+        if self.link is None:
+            return arrived
+        if redirects(self.link.profile, url):
+            self.redirects += 1
+        # resolved by the virtual clock, so the transfer takes virtual time
+        loop = asyncio.get_running_loop()
+        headers, body = loop.create_future(), loop.create_future()
+
+        def arrive(future):
+            if not future.done():
+                future.set_result(None)
+
+        start, finish = self.link.transfer(self.clock.now, url, nbytes)
+        timers = [
+            self.clock.set_timeout(lambda: arrive(headers), start - self.clock.now),
+            self.clock.set_timeout(lambda: arrive(body), finish - self.clock.now),
+        ]
+        if signal is not None:
+            def abort():
+                for timer in timers:
+                    self.clock.clear_timeout(timer)
+                self.link.abandon(self.clock.now, start, finish)
+                arrive(headers)
+                arrive(body)
+
+            signal.addEventListener("abort", abort)
+
+        async def wait(future):
+            await future
+            if signal is not None and signal.aborted:
+                raise RuntimeError(f"AbortError: {url} aborted")
+
+        await wait(headers)
+        return lambda: wait(body)
+
+
+class FakeProxy:
+    """A callable standing in for a pyodide proxy, counted until destroyed."""
+
+    live = 0
+    created = 0
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.destroyed = False
+        FakeProxy.live += 1
+        FakeProxy.created += 1
+
+    def __call__(self, *args):
+        if self.destroyed:
+            raise RuntimeError(f"proxy for {self.fn!r} called after destroy()")
+        return self.fn(*args)
+
+    def destroy(self):
+        if self.destroyed:
+            raise RuntimeError(f"proxy for {self.fn!r} destroyed twice")
+        self.destroyed = True
+        FakeProxy.live -= 1
+
+
+class FakePlayer:
+    """YouTube player driven by the virtual clock."""
+
+    def __init__(self, clock: FakeClock, duration: float):
+        self.clock = clock
+        self.duration = duration
+        self.listeners: dict[str, list] = {}
+        self.state = -1
+        self.rate = 1.0
+        self._position = 0.0
+        self._anchor = 0.0
+        self.video_id = None
+
+    @staticmethod
+    def new(element_id, **kwargs):
+        return FakePlayer.instance
+
+    def addEventListener(self, event, callback):
+        self.listeners.setdefault(event, []).append(callback)
+
+    def emit(self, event, data=None):
+        for callback in self.listeners.get(event, []):
+            callback(types.SimpleNamespace(data=data, target=self))
+
+    def _settle(self):
+        self._position = self.getCurrentTime()
+        self._anchor = self.clock.now
+
+    def getCurrentTime(self):
+        if self.state != 1:
+            return self._position
+        elapsed = (self.clock.now - self._anchor) / 1000 * self.rate
+        return min(self._position + elapsed, self.duration)
+
+    def getPlaybackRate(self):
+        return self.rate
+
+    def getPlayerState(self):
+        return self.state
+
+    def set_state(self, state):
+        self._settle()
+        self.state = state
+        self.emit("onStateChange", state)
+
+    def play(self):
+        self.set_state(1)
+
+    def pause(self):
+        self.set_state(2)
+
+    def end(self):
+        self._settle()
+        self._position = self.duration
+        self.set_state(0)
+
+    def seekTo(self, seconds, allow_seek_ahead=True):
+        playing = self.state == 1
+        self._settle()
+        self._position = float(seconds)
+        if playing:
+            self.set_state(3)
+            self.set_state(1)
+
+    def setPlaybackRate(self, rate):
+        self._settle()
+        self.rate = rate
+        self.emit("onPlaybackRateChange", rate)
+
+    def cueVideoById(self, video_id, start_seconds=0.0):
+        self.video_id = video_id
+        self._position = float(start_seconds)
+        self.set_state(5)
+
+    def loadVideoById(self, video_id, start_seconds=0.0):
+        self.cueVideoById(video_id, start_seconds)
+        self.play()
+
+
+class FakePyDom:
+    def __init__(self, document: FakeDocument):
+        self.document = document
+
+    def __getitem__(self, selector):
+        return [self.document.querySelector(selector)]
+
+    def create(self, tag, html=""):
+        element = FakeElement(tag)
+        element.innerHTML = html
+        return element
+
+
+class FakeWindow(types.SimpleNamespace):
+    def addEventListener(self, event, callback, *args):
+        pass
+
+
+def install(
+    data_dir: Path,
+    episode_name: str,
+    duration: float = 4 * 3600,
+    profile: NetworkProfile | None = None,
+    seed: int = 0,
+    query: str = "",
+    caches: FakeCacheStorage | None = None,
+):
+    """Register the fake browser modules and return the fakes for driving them.
+
+    ``profile`` and ``seed`` throttle the network, and ``query`` is added to
+    the page url's parameters. With ``caches`` the page has the Cache API,
+    as in a secure context; without it, it doesn't.
+    """
+    clock = FakeClock()
+    network = FakeNetwork(data_dir, clock=clock, profile=profile, seed=seed)
+    FakeElement.network = network
+    document = FakeDocument()
+    FakePlayer.instance = FakePlayer(clock, duration)
+
+    window = FakeWindow(
+        location=types.SimpleNamespace(
+            href=f"https://critdream.ai/?episode={episode_name}{query}"
+        ),
+        history=types.SimpleNamespace(pushState=lambda *args: None),
+        YT=types.SimpleNamespace(Player=FakePlayer),
+        devicePixelRatio=2.0,
+    )
+    console = types.SimpleNamespace(log=lambda *args: None)
+
+    js = types.ModuleType("js")
+    js.console = console
+    js.window = window
+    js.document = document
+    js.URL = FakeURL
+    js.AbortController = FakeAbortController
+    js.Response = FakeResponse
+    if caches is not None:
+        js.caches = caches
+    js.Image = types.SimpleNamespace(new=lambda: FakeElement("img"))
+    js.performance = types.SimpleNamespace(now=lambda: clock.now)
+    js.setTimeout = clock.set_timeout
+    js.clearTimeout = clock.clear_timeout
+    js.setInterval = clock.set_interval
+    js.clearInterval = clock.clear_timeout
+
+    ffi = types.SimpleNamespace(
+        create_proxy=FakeProxy,
+        to_js=lambda obj, **kwargs: obj,
+    )
+    pyscript = types.ModuleType("pyscript")
+    pyscript.window = window
+    pyscript.document = document
+    pyscript.display = lambda *args, **kwargs: None
+    pyscript.ffi = ffi
+
+    pyweb = types.ModuleType("pyweb")
+    pyweb.pydom = FakePyDom(document)
+
+    pyodide = types.ModuleType("pyodide")
+    pyodide_http = types.ModuleType("pyodide.http")
+    pyodide_http.pyfetch = network.pyfetch
+    pyodide_ffi = types.ModuleType("pyodide.ffi")
+    pyodide_ffi.create_proxy = ffi.create_proxy
+    pyodide_ffi.to_js = ffi.to_js
+    pyodide.http = pyodide_http
+    pyodide.ffi = pyodide_ffi
+
+    sys.modules.update({
+        "js": js,
+        "pyscript": pyscript,
+        "pyweb": pyweb,
+        "pyodide": pyodide,
+        "pyodide.http": pyodide_http,
+        "pyodide.ffi": pyodide_ffi,
+    })
+    return types.SimpleNamespace(
+        clock=clock,
+        network=network,
+        document=document,
+        window=window,
+        player=FakePlayer.instance,
+        proxies=FakeProxy,
+    )
@@ -0,0 +1,156 @@
+"""Synthetic scene data shaped like the aligned scene CSVs.
+
+Generates ``video_id_map.csv`` and one ``aligned_scenes_{episode}.csv`` per
+catalog episode: environment scenes through the intro and the break, then a
+few thousand seconds of dialogue scenes with occasional gaps and overlaps.
+The catalog, with its csv offset index, and the appearance index are built
+from the same scenes. Optionally, a ``variants/manifest.json`` makes the
+app use resized image variants, or per-scene packs of them.
+Point the benchmarks at a directory of real CSVs instead with ``--data-dir``.
+"""
+
+import csv
+import json
+import random
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from episodes import (  # noqa: E402
+    BUILTIN_CATALOG,
+    CAMPAIGN_TITLES,
+    EPISODE_BREAKS,
+    EPISODE_NAMES,
+    EPISODE_STARTS,
+    Catalog,
+)
+from packs import encode_pack_index  # noqa: E402
+from scenes import SceneTable, csv_offsets, encode_appearances  # noqa: E402
+
+
+SPEAKERS = ["matt", "travis", "marisha", "laura", "taliesin", "ashley", "sam", "liam"]
+CHARACTERS = {
+    "matt": ["environment", "dungeon_master"],
+    "travis": ["fjord", "travis"],
+    "marisha": ["beau"],
+    "laura": ["jester", "laura"],
+    "taliesin": ["mollymauk", "caduceus"],
+    "ashley": ["yasha"],
+    "sam": ["nott", "sam"],
+    "liam": ["caleb"],
+}
+COLUMNS = ["episode_name", "scene_id", "speaker", "character", "start", "end"]
+
+# as main.NUM_IMAGE_VARIATIONS
+NUM_IMAGE_VARIATIONS = 12
+# as tools/build_image_variants.py builds them
+VARIANT_WIDTHS = [256, 512, 1024]
+# roughly what the webp variants weigh, so placeholders transfer as long
+VARIANT_BYTES_PER_PIXEL = 0.15
+
+VARIANT_NAME = re.compile(r"_image_\d+_(\d+)\.(?:webp|avif)$")
+PACK_NAME = re.compile(r"_images_(\d+)\.(?:webp|avif)\.pack$")
+
+
+def episode_rows(episode_name: str, rng: random.Random) -> list[dict]:
+    intro_end = EPISODE_STARTS[episode_name]
+    break_start, break_end = EPISODE_BREAKS[episode_name]
+    episode_end = break_end + rng.uniform(5000, 7000)
+
+    rows = []
+    t = 0.0
+    while t < episode_end:
+        in_intro = t < intro_end or break_start <= t <= break_end
+        speaker = "matt" if in_intro else rng.choice(SPEAKERS)
+        character = (
+            "environment" if in_intro or rng.random() < 0.05
+            else rng.choice(CHARACTERS[speaker])
+        )
+        duration = rng.uniform(3, 45)
+        rows.append({
+            "episode_name": episode_name,
+            "scene_id": len(rows),
+            "speaker": speaker,
+            "character": character,
+            "start": round(t, 3),
+            "end": round(t + duration, 3),
+        })
+        # mostly back to back, with the odd gap or overlap
+        t += duration + rng.choice([0, 0, 0, 0, 2.5, -1.5])
+    return rows
+
+
+def write_fixtures(output_dir: Path, seed: int = 0) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    with open(output_dir / "video_id_map.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["episode_name", "youtube_id"])
+        for episode_name in EPISODE_NAMES:
+            writer.writerow([episode_name, f"video-{episode_name}"])
+
+    episodes = []
+    catalog = []
+    for episode_name in EPISODE_NAMES:
+        path = output_dir / f"aligned_scenes_{episode_name}.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(episode_rows(episode_name, rng))
+        table = SceneTable.from_csv(path.read_text(), episode_name)
+        episodes.append((episode_name, list(table.scenes())))
+        catalog.append(BUILTIN_CATALOG[episode_name]._replace(
+            scene_offsets=tuple(csv_offsets(path.read_bytes()))
+        ))
+
+    (output_dir / "catalog.json").write_text(
+        Catalog(catalog, CAMPAIGN_TITLES).to_json()
+    )
+    (output_dir / "appearances.bin").write_bytes(encode_appearances(episodes))
+    return output_dir
+
+
+def write_variant_manifest(output_dir: Path, packs: bool) -> Path:
+    """Tell the app there are webp variants of every episode's images, as
+    if tools/build_image_variants.py (and build_image_packs.py) had run."""
+    variant_dir = output_dir / "variants"
+    variant_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "widths": VARIANT_WIDTHS,
+        "formats": ["webp"],
+        "episodes": EPISODE_NAMES,
+        "packs": packs,
+    }
+    (variant_dir / "manifest.json").write_text(json.dumps(manifest))
+    return output_dir
+
+
+def variant_bytes(width: int) -> int:
+    return round(width * width * VARIANT_BYTES_PER_PIXEL)
+
+
+def placeholder_bytes(name: str, image_bytes: int) -> int:
+    """What a placeholder for the image file ``name`` weighs: ``image_bytes``
+    for a full-size png, less for a resized variant."""
+    if name.startswith("probe."):
+        # the one pixel format probes
+        return 100
+    match = VARIANT_NAME.search(name)
+    return variant_bytes(int(match.group(1))) if match else image_bytes
+
+
+def placeholder_pack(name: str) -> tuple[bytes, int] | None:
+    """Header and index of the pack file ``name``, if it is one, and what
+    the whole pack weighs, for placeholder variants."""
+    match = PACK_NAME.search(name)
+    if match is None:
+        return None
+    size = variant_bytes(int(match.group(1)))
+    index = encode_pack_index((n, size) for n in range(NUM_IMAGE_VARIATIONS))
+    return index, len(index) + NUM_IMAGE_VARIATIONS * size
+
+
+if __name__ == "__main__":
+    print(write_fixtures(Path(sys.argv[1] if len(sys.argv) > 1 else "fixtures")))
@@ -0,0 +1,72 @@
+"""Network conditions shared by the stand-in server and the fake network.
+
+A profile is a round-trip latency, a bandwidth cap, an error rate and
+whether ``resolve/`` urls redirect first, as Hugging Face's do to its CDN.
+``Link`` turns a profile into transfer times: every request waits out the
+latency (twice when it is redirected), then its bytes queue behind the
+ones already on the link, so concurrent downloads share the bandwidth the
+way they do over a single connection to the host.
+"""
+
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class NetworkProfile:
+    name: str
+    latency_ms: float = 0.0
+    # 0 for no cap
+    bandwidth_kbps: float = 0.0
+    error_rate: float = 0.0
+    redirect: bool = False
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        NetworkProfile("local"),
+        NetworkProfile("broadband", latency_ms=20, bandwidth_kbps=50_000, redirect=True),
+        NetworkProfile("4g", latency_ms=60, bandwidth_kbps=10_000, redirect=True),
+        NetworkProfile("3g", latency_ms=150, bandwidth_kbps=1_600, redirect=True),
+        NetworkProfile(
+            "flaky", latency_ms=300, bandwidth_kbps=750, error_rate=0.05, redirect=True
+        ),
+    )
+}
+
+
+def redirects(profile: NetworkProfile, url: str) -> bool:
+    return profile.redirect and "/resolve/" in url
+
+
+class Link:
+    """Transfer times and injected failures for requests over one profile."""
+
+    def __init__(self, profile: NetworkProfile, seed: int = 0):
+        self.profile = profile
+        self.free_at = 0.0
+        self._rng = random.Random(seed)
+
+    def fails(self) -> bool:
+        return self._rng.random() < self.profile.error_rate
+
+    def round_trips(self, url: str) -> int:
+        return 2 if redirects(self.profile, url) else 1
+
+    def transfer(self, now_ms: float, url: str, nbytes: int) -> tuple[float, float]:
+        """When the body of a response of ``nbytes`` requested at ``now_ms``
+        starts and finishes arriving."""
+        profile = self.profile
+        start = now_ms + profile.latency_ms * self.round_trips(url)
+        # a response without a body, like a 404, doesn't hold up the others
+        if not profile.bandwidth_kbps or not nbytes:
+            return start, start
+        start = max(start, self.free_at)
+        self.free_at = start + nbytes * 8 / profile.bandwidth_kbps
+        return start, self.free_at
+
+    def abandon(self, now_ms: float, start: float, finish: float):
+        """Give back the link time an aborted transfer had left, roughly:
+        transfers already under way keep the times they were given."""
+        self.free_at -= max(finish - max(now_ms, start), 0.0)
@@ -0,0 +1,224 @@
+"""Local stand-in for the Hugging Face datasets, with throttled responses.
+
+Serves the app itself from the repository root, and under ``/datasets/
+cosmicBboy/`` the same url layout as ``data.set_url_root``: the scene data
+from a fixtures directory (see fixtures.py) and a placeholder png for
+every scene image, resized variant and variant pack, unless the directory
+has the real one; ``--images`` picks which of them the fixtures offer.
+Responses are held up, capped and failed according to a profile from
+network_profiles.py, and with the profile's ``redirect`` a ``resolve/`` url
+first redirects to a one-off ``/cdn/`` url, as Hugging Face's do. Range
+requests are honoured.
+
+    python benchmarks/standin_server.py --profile 3g
+
+then open http://127.0.0.1:8000/?data_root=/datasets/cosmicBboy
+"""
+
+import argparse
+import itertools
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import fixtures  # noqa: E402
+from network_profiles import PROFILES, Link, redirects  # noqa: E402
+from packs import encode_pack  # noqa: E402
+
+
+DATASETS = "/datasets/cosmicBboy/"
+CDN = "/cdn/"
+# bytes written per pacing step of a throttled response
+CHUNK_BYTES = 16 * 1024
+
+IMAGE_PATH = re.compile(r"([^/]+)_image_(\d+)(?:_\d+)?\.(png|webp|avif)$")
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    body = kind + data
+    return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+
+@lru_cache(maxsize=256)
+def placeholder_png(name: str, size: int, nbytes: int) -> bytes:
+    """A solid ``size`` pixel square, coloured by ``name`` and padded with an
+    ancillary chunk to ``nbytes``, so transfers weigh what real images do."""
+    rgb = zlib.crc32(name.encode()).to_bytes(4, "big")[:3]
+    rows = b"".join(b"\0" + rgb * size for _ in range(size))
+    png = b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        png_chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)),
+        png_chunk(b"IDAT", zlib.compress(rows, 9)),
+    ])
+    padding = max(nbytes - len(png) - 24, 0)
+    # lowercase first letter: decoders skip it
+    png += png_chunk(b"paDd", bytes(padding))
+    return png + png_chunk(b"IEND", b"")
+
+
+class StandinHandler(SimpleHTTPRequestHandler):
+    # set by serve()
+    data_dir: Path
+    link: Link
+    link_lock: threading.Lock
+    image_bytes: int
+    redirect_ids = itertools.count()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=str(ROOT), **kwargs)
+
+    def end_headers(self):
+        # the page may be served from elsewhere, e.g. the live site
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Headers", "Range")
+        self.send_header("Access-Control-Expose-Headers", "Content-Range, Content-Length")
+        super().end_headers()
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.end_headers()
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith(CDN):
+            # /cdn/{redirect id}/{dataset path}
+            path = DATASETS + path[len(CDN):].split("/", 1)[1]
+        elif not path.startswith(DATASETS):
+            return super().do_GET()
+        elif redirects(self.link.profile, path):
+            self.wait(self.link.profile.latency_ms)
+            self.send_response(302)
+            self.send_header(
+                "Location", f"{CDN}{next(self.redirect_ids)}/{path[len(DATASETS):]}"
+            )
+            self.end_headers()
+            return
+
+        with self.link_lock:
+            fails = self.link.fails()
+        data = None if fails else self.dataset_file(path)
+        if data is None:
+            self.wait(self.link.profile.latency_ms)
+            self.send_error(503 if fails else 404)
+            return
+
+        status = 200
+        byte_range = self.headers.get("Range")
+        if byte_range:
+            first, last = byte_range.removeprefix("bytes=").split("-")
+            first, last = int(first), int(last) if last else len(data) - 1
+            content_range = f"bytes {first}-{last}/{len(data)}"
+            data = data[first:last + 1]
+            status = 206
+        self.send_body(status, data, content_range if status == 206 else None)
+
+    def dataset_file(self, path: str) -> bytes | None:
+        name = path.rsplit("/", 1)[-1]
+        local = self.data_dir / name
+        if "/variants/" in path and (self.data_dir / "variants" / name).exists():
+            local = self.data_dir / "variants" / name
+        if local.exists():
+            return local.read_bytes()
+        if name.startswith("probe."):
+            # the app's format probe; browsers sniff the format regardless
+            return placeholder_png("probe", 1, 0)
+        pack = fixtures.PACK_NAME.search(name)
+        if pack is not None:
+            scene_name = name[:pack.start()]
+            size = fixtures.variant_bytes(int(pack.group(1)))
+            return encode_pack(
+                (n, placeholder_png(f"{scene_name}_{n}", 64, size))
+                for n in range(fixtures.NUM_IMAGE_VARIATIONS)
+            )
+        match = IMAGE_PATH.search(path)
+        if match is None:
+            return None
+        return placeholder_png(
+            match.group(1), 64, fixtures.placeholder_bytes(name, self.image_bytes)
+        )
+
+    def send_body(self, status: int, data: bytes, content_range: str | None):
+        now = time.monotonic() * 1000
+        with self.link_lock:
+            # redirected urls paid their extra round trip at the redirect
+            start, finish = self.link.transfer(now, "", len(data))
+        self.wait(start - now)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+        try:
+            # paced so the body finishes arriving at its slot's end
+            for offset in range(0, len(data), CHUNK_BYTES):
+                chunk = data[offset:offset + CHUNK_BYTES]
+                self.wfile.write(chunk)
+                due = start + (finish - start) * (offset + len(chunk)) / len(data)
+                self.wait(due - time.monotonic() * 1000)
+        except (BrokenPipeError, ConnectionResetError):
+            # aborted by the page
+            with self.link_lock:
+                self.link.abandon(time.monotonic() * 1000, start, finish)
+
+    @staticmethod
+    def wait(ms: float):
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+
+def serve(host: str, port: int, data_dir: Path, profile, image_bytes: int, seed: int):
+    StandinHandler.data_dir = data_dir
+    StandinHandler.link = Link(profile, seed)
+    StandinHandler.link_lock = threading.Lock()
+    StandinHandler.image_bytes = image_bytes
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    print(f"serving {data_dir} as {profile}")
+    print(f"open http://{host}:{port}/?data_root={DATASETS.rstrip('/')}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=None,
+                        help="directory of scene data and images, defaults to fixtures")
+    parser.add_argument("--profile", choices=list(PROFILES), default="local")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--image-kb", type=int, default=1000,
+                        help="size of the placeholder images")
+    parser.add_argument("--images", choices=["png", "variants", "packs"], default="png",
+                        help="images the fixtures offer, ignored with --data-dir")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir
+    if data_dir is None:
+        data_dir = fixtures.write_fixtures(
+            Path(tempfile.mkdtemp(prefix="critdream-fixtures-"))
+        )
+        if args.images != "png":
+            fixtures.write_variant_manifest(data_dir, packs=args.images == "packs")
+    serve(
+        args.host, args.port, data_dir, PROFILES[args.profile],
+        args.image_kb * 1000, args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Scene data locations and loaders, shared by the page and the scene worker."""
+
+import asyncio
+from bisect import bisect_right
+from contextlib import aclosing
+
+from js import console
+
+from episodes import BUILTIN_CATALOG, Catalog, Episode
+from loader import PersistentCache, load_manifest, open_range
+from scenes import (
+    AppearanceIndex,
+    SceneBundle,
+    SceneIndex,
+    SceneStream,
+    SceneTable,
+    read_video_id_map,
+)
+
+
+DEFAULT_URL_ROOT = "https://huggingface.co/datasets/cosmicBboy"
+
+
+def set_url_root(url_root: str):
+    """Point every data and image url at ``url_root``, a host with the same
+    layout as the Hugging Face datasets, e.g. benchmarks/standin_server.py.
+
+    Must be called before anything is loaded.
+    """
+    global hf_url_root, data_url_root, video_id_url, manifest_url, catalog_url
+    global data_url_template, bundle_url_template, appearances_url
+    global image_root, image_url_template, image_variant_root
+
+    hf_url_root = url_root.rstrip("/")
+    data_url_root = f"{hf_url_root}/critical-dream-aligned-scenes-mighty-nein-v2/raw/main"
+    video_id_url = f"{data_url_root}/video_id_map.csv"
+    manifest_url = f"{data_url_root}/manifest.json"
+    catalog_url = f"{data_url_root}/catalog.json"
+    data_url_template = f"{data_url_root}/aligned_scenes_{{episode_name}}.csv"
+    bundle_url_template = (
+        f"{hf_url_root}/critical-dream-aligned-scenes-mighty-nein-v2/resolve/main/"
+        "aligned_scenes_{episode_name}.bin"
+    )
+    appearances_url = (
+        f"{hf_url_root}/critical-dream-aligned-scenes-mighty-nein-v2/resolve/main/"
+        "appearances.bin"
+    )
+    image_root = f"{hf_url_root}/critical-dream-scene-images-mighty-nein-v2/resolve/main/"
+    image_url_template = image_root + "{episode_name}/{scene_name}_image_{image_num}.png"
+    image_variant_root = f"{image_root}variants"
+
+
+set_url_root(DEFAULT_URL_ROOT)
+
+# episodes found to have no scene bundle, so that without a manifest to
+# say which do, each one's bundle is only asked for once
+missing_bundles: set[str] = set()
+
+DATA_CACHE_BYTES = 32 * 1024 * 1024
+
+
+def open_data_cache(app_version: str) -> PersistentCache:
+    # scene data persists across visits, keyed by the content hashes
+    # published in the dataset manifest
+    return PersistentCache(
+        "critdream-data",
+        DATA_CACHE_BYTES,
+        manifest=asyncio.ensure_future(load_manifest(manifest_url)),
+        default_version=app_version,
+    )
+
+
+async def load_video_id_map(cache: PersistentCache) -> dict[str, str]:
+    return read_video_id_map(await cache.fetch_text(video_id_url))
+
+
+async def load_catalog(cache: PersistentCache) -> Catalog:
+    try:
+        return Catalog.from_json(await cache.fetch_text(catalog_url))
+    except (OSError, ValueError, KeyError) as exc:
+        console.log(f"no episode catalog, using the built-in one: {exc}")
+        return BUILTIN_CATALOG
+
+
+async def load_appearances(cache: PersistentCache) -> AppearanceIndex | None:
+    try:
+        return AppearanceIndex(await cache.fetch_bytes(appearances_url))
+    except (OSError, ValueError) as exc:
+        console.log(f"no appearance index: {exc}")
+        return None
+
+
+async def load_scene_index(
+    cache: PersistentCache,
+    episode_name: str,
+    intro_end: float,
+    episode_break: tuple[float, float],
+) -> SceneIndex:
+    """Scenes for an episode; the intro and break times are only needed for
+    episodes without a bundle, since bundles carry their own."""
+    # prefer the prebuilt bundle, falling back to the csv for episodes that
+    # don't have one yet. The manifest lists the bundles there are, so
+    # episodes without one don't cost a request that is bound to fail
+    bundle_url = bundle_url_template.format(episode_name=episode_name)
+    listed = await cache.listed(bundle_url)
+    if listed or (listed is None and episode_name not in missing_bundles):
+        try:
+            bundle = SceneBundle(await cache.fetch_bytes(bundle_url))
+        except (OSError, ValueError) as exc:
+            missing_bundles.add(episode_name)
+            console.log(f"no scene bundle for {episode_name}, loading csv: {exc}")
+        else:
+            return SceneIndex(
+                episode_name,
+                bundle.scenes(),
+                intro_end=bundle.intro_end,
+                episode_break=bundle.episode_break,
+            )
+
+    data_url = data_url_template.format(episode_name=episode_name)
+    table = SceneTable.from_csv(await cache.fetch_text(data_url), episode_name)
+    return SceneIndex(
+        episode_name,
+        table.scenes(),
+        intro_end=intro_end,
+        episode_break=episode_break,
+    )
+
+
+async def load_scene_preview(episode: Episode, t: float) -> SceneIndex | None:
+    """The scenes around ``t``, streamed from a range of the episode's csv.
+
+    Reading stops with the first chunk that reaches past ``t``, so there is
+    something to show long before the full episode has loaded. None if the
+    catalog has no offset index for the episode, or the read fails.
+    """
+    offsets = episode.scene_offsets
+    if not offsets:
+        return None
+    url = data_url_template.format(episode_name=episode.name)
+    # from the checkpoint before the one t falls in, so the scenes leading
+    # up to t are there too, up to the checkpoint after it
+    k = max(bisect_right([start_time for start_time, _ in offsets], t) - 1, 0)
+    first, last = max(k - 1, 0), k + 2
+    start = offsets[first][1] if first else 0
+    end = offsets[last][1] if last < len(offsets) else None
+
+    parser = SceneStream(episode.name)
+    region = asyncio.ensure_future(open_range(url, start, end))
+    try:
+        if start:
+            # the header row, fetched alongside the rows themselves
+            header = await open_range(url, 0, offsets[0][1])
+            try:
+                parser.feed(await header.read())
+            finally:
+                header.close()
+        stream = await region
+        async with aclosing(stream.chunks()) as chunks:
+            async for chunk in chunks:
+                parser.feed(chunk)
+                table = parser.table
+                if len(table) and table.start_time[-1] > t:
+                    break
+            else:
+                parser.close()
+    except (OSError, ValueError, KeyError, IndexError) as exc:
+        console.log(f"no scene preview for {episode.name}: {exc}")
+        return None
+    finally:
+        # the region may have opened even if the header failed, and either
+        # way the rest of its body isn't wanted
+        if not region.done():
+            region.cancel()
+        elif not region.cancelled() and region.exception() is None:
+            region.result().close()
+
+    if not len(parser.table):
+        return None
+    return SceneIndex(
+        episode.name,
+        parser.table.scenes(),
+        intro_end=episode.intro_end,
+        episode_break=episode.episode_break,
+    )
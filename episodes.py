@@ -0,0 +1,182 @@
+"""Episode metadata: intro ends and mid-episode breaks, in seconds.
+
+The app reads the episode catalog published with the scene data (see
+tools/build_catalog.py). The constants here are the built-in catalog it
+falls back to, and the metadata that tool starts from.
+"""
+
+import json
+from typing import NamedTuple
+
+EPISODE_STARTS = {
+    "c2e001": 854,
+    "c2e002": 504,
+    "c2e003": 420,
+    "c2e004": 526,
+    "c2e005": 538,
+    "c2e006": 474,
+    "c2e007": 528,
+    "c2e008": 602,
+    "c2e009": 665,
+    "c2e010": 638,
+    "c2e011": 624,
+    "c2e012": 479,
+    "c2e013": 375,
+    "c2e014": 616,
+    "c2e015": 641,
+    "c2e016": 569,
+    "c2e017": 712,
+    "c2e018": 621,
+    "c2e019": 594,
+    "c2e020": 521,
+    "c2e021": 591,
+    "c2e022": 500,
+    "c2e023": 497,
+    "c2e024": 599,
+    "c2e025": 542,
+}
+
+EPISODE_BREAKS = {
+    "c2e001": (5529, 6547),
+    "c2e002": (7583, 8470),
+    "c2e003": (7992, 8921),
+    "c2e004": (7203, 7885),
+    "c2e005": (10636, 11524),
+    "c2e006": (8406, 9226),
+    "c2e007": (8745, 9481),
+    "c2e008": (5583, 6517),
+    "c2e009": (7083, 7966),
+    "c2e010": (6414, 7297),
+    "c2e011": (6723, 7646),
+    "c2e012": (5529, 6311),
+    "c2e013": (7680, 8504),
+    "c2e014": (5783, 6546),
+    "c2e015": (7157, 8210),
+    "c2e016": (7594, 8343),
+    "c2e017": (7095, 7869),
+    "c2e018": (6665, 7640),
+    "c2e019": (7168, 8358),
+    "c2e020": (8125, 8126),
+    "c2e021": (8560, 8561),
+    "c2e022": (8615, 8616),
+    "c2e023": (6988, 6989),
+    "c2e024": (7988, 7989),
+    "c2e025": (5139, 5140),
+}
+
+EPISODE_NAMES = [*EPISODE_STARTS]
+
+
+CAMPAIGN_TITLES = {2: "The Mighty Nein"}
+
+
+class Episode(NamedTuple):
+    name: str
+    campaign: int
+    label: str
+    intro_end: float
+    episode_break: tuple[float, float]
+    # (start time, byte offset) checkpoints into the episode's scene csv,
+    # for reading just the scenes around a point in the episode
+    scene_offsets: tuple[tuple[float, int], ...] = ()
+
+
+def episode_label(episode_name: str) -> str:
+    campaign, num = episode_name[1:].split("e")
+    # this is a hack to fix the episode number for episode 100, since that
+    # was mistakenly labeled when the original caption data was created
+    if int(num) > 100:
+        num = str(int(num) - 1).zfill(3)
+    return f"Campaign {campaign} Episode {num}"
+
+
+class Catalog:
+    """Every episode the app can play, in order, grouped by campaign."""
+
+    def __init__(self, episodes: list[Episode], campaign_titles: dict[int, str]):
+        self.episodes = {episode.name: episode for episode in episodes}
+        self.names = [*self.episodes]
+        self.campaign_titles = campaign_titles
+        self._positions = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, episode_name: str) -> bool:
+        return episode_name in self.episodes
+
+    def __getitem__(self, episode_name: str) -> Episode:
+        return self.episodes[episode_name]
+
+    def campaigns(self) -> dict[int, list[Episode]]:
+        groups: dict[int, list[Episode]] = {}
+        for episode in self.episodes.values():
+            groups.setdefault(episode.campaign, []).append(episode)
+        return groups
+
+    def campaign_title(self, campaign: int) -> str:
+        title = self.campaign_titles.get(campaign)
+        return f"Campaign {campaign}: {title}" if title else f"Campaign {campaign}"
+
+    def next_episode(self, episode_name: str) -> str | None:
+        i = self._positions[episode_name] + 1
+        return self.names[i] if i < len(self.names) else None
+
+    def adjacent(self, episode_name: str) -> list[str]:
+        """The episode with the ones either side of it."""
+        if episode_name not in self._positions:
+            return []
+        i = self._positions[episode_name]
+        return self.names[max(i - 1, 0):i + 2]
+
+    @classmethod
+    def from_json(cls, text: str) -> "Catalog":
+        data = json.loads(text)
+        episodes = [
+            Episode(
+                entry["name"],
+                entry["campaign"],
+                entry["label"],
+                entry["intro_end"],
+                tuple(entry["break"]),
+                tuple(tuple(offset) for offset in entry.get("offsets", ())),
+            )
+            for entry in data["episodes"]
+        ]
+        titles = {int(k): v for k, v in data.get("campaigns", {}).items()}
+        return cls(episodes, titles)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "campaigns": self.campaign_titles,
+                "episodes": [
+                    {
+                        "name": episode.name,
+                        "campaign": episode.campaign,
+                        "label": episode.label,
+                        "intro_end": episode.intro_end,
+                        "break": list(episode.episode_break),
+                        "offsets": [list(offset) for offset in episode.scene_offsets],
+                    }
+                    for episode in self.episodes.values()
+                ],
+            },
+            # fetched at startup, and the offsets make it long
+            separators=(",", ":"),
+        )
+
+
+BUILTIN_CATALOG = Catalog(
+    [
+        Episode(
+            name,
+            int(name[1:].split("e")[0]),
+            episode_label(name),
+            EPISODE_STARTS[name],
+            EPISODE_BREAKS[name],
+        )
+        for name in EPISODE_NAMES
+    ],
+    CAMPAIGN_TITLES,
+)
@@ -0,0 +1,746 @@
+"""Scene image fetching, caching and prefetching."""
+
+import asyncio
+import heapq
+import itertools
+import json
+import random
+from collections import OrderedDict, deque
+from typing import Callable, Iterable, NamedTuple
+
+import js
+from js import console
+from pyscript import ffi
+from pyodide.http import pyfetch
+
+from loader import fetch_text
+from metrics import Metrics
+from packs import PACK_HEADER, PackIndex, pack_index_size
+
+
+# fetch priorities, lower is more urgent. Lookahead items are offset by their
+# distance from the current playback position.
+URGENT = 0
+LOOKAHEAD = 1
+# warm-up for an episode that isn't playing yet
+BACKGROUND = 100
+
+
+class CachedImage(NamedTuple):
+    src: str  # object url of the downloaded blob
+    # decoded js Image, kept alive so the decode isn't dropped. None for the
+    # rest of a pack, which is only decoded when shown
+    image: object | None
+    nbytes: int
+
+
+class ImagePack(NamedTuple):
+    """A scene's variants in one file, see packs.py."""
+
+    url: str
+    content_type: str
+    # the url each image in the pack is cached under, by image number
+    image_url: Callable[[str], str]
+
+
+class ImageCache:
+    """Decoded images keyed by url, evicted least recently used first."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CachedImage] = OrderedDict()
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, url: str) -> CachedImage | None:
+        entry = self._entries.get(url)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(url)
+        return entry
+
+    def touch(self, url: str):
+        """Mark an entry as recently used, without counting a lookup."""
+        self._entries.move_to_end(url)
+
+    def put(self, url: str, entry: CachedImage):
+        if url in self._entries:
+            self._evict(url)
+        self._entries[url] = entry
+        self.nbytes += entry.nbytes
+        # always keep the newest entry, even if it alone exceeds the budget
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, url: str):
+        entry = self._entries.pop(url)
+        self.nbytes -= entry.nbytes
+        js.URL.revokeObjectURL(entry.src)
+
+
+class FetchQueue:
+    """Priority-ordered image downloads with a concurrency limit.
+
+    ``on_download`` is told the size of every completed download and when
+    its body started and finished arriving, in ms, e.g. to estimate
+    throughput. The wait for the response headers is left out, as it is
+    mostly latency and redirects rather than bandwidth.
+
+    An image requested with the pack it belongs to is fetched as part of the
+    whole pack, and every image in it is cached, so requests for the rest of
+    the scene's images are already satisfied.
+    """
+
+    def __init__(
+        self,
+        cache: ImageCache,
+        max_concurrent: int,
+        metrics: Metrics | None = None,
+        on_download: Callable[[int, float, float], None] | None = None,
+    ):
+        self.cache = cache
+        self.max_concurrent = max_concurrent
+        self.metrics = metrics or Metrics()
+        self.on_download = on_download
+        self._heap: list[tuple[int, int, str]] = []
+        self._counter = itertools.count()
+        self._queued: dict[str, int] = {}
+        self._in_flight: dict[str, tuple[int, object]] = {}
+        # packs to fetch, and the image in each that was asked for
+        self._packs: dict[str, tuple[ImagePack, str]] = {}
+
+    def request(self, url: str, priority: int = URGENT, pack: ImagePack | None = None):
+        if url in self.cache:
+            # still wanted, so keep it away from eviction
+            self.cache.touch(url)
+            return
+        fetch_url = pack.url if pack is not None else url
+        if fetch_url in self._in_flight:
+            return
+        if fetch_url in self._queued and self._queued[fetch_url] <= priority:
+            return
+        if pack is not None:
+            self._packs[fetch_url] = (pack, url)
+        # superseded heap entries are skipped lazily when popped
+        self._queued[fetch_url] = priority
+        heapq.heappush(self._heap, (priority, next(self._counter), fetch_url))
+        self._pump()
+
+    def cancel(
+        self,
+        min_priority: int = LOOKAHEAD,
+        keep: Iterable[str] = (),
+        max_priority: int = BACKGROUND - 1,
+    ):
+        """Drop queued and abort in-flight work from ``min_priority`` down to
+        ``max_priority``, other than the urls in ``keep``, which are still
+        wanted. Background warm-ups are left alone unless asked for."""
+        keep = set(keep)
+
+        def dropped(url: str, priority: int) -> bool:
+            return min_priority <= priority <= max_priority and url not in keep
+
+        self._queued = {
+            url: priority
+            for url, priority in self._queued.items()
+            if not dropped(url, priority)
+        }
+        self._heap = [item for item in self._heap if not dropped(item[2], item[0])]
+        heapq.heapify(self._heap)
+        self._packs = {
+            url: pack for url, pack in self._packs.items() if url in self._queued
+        }
+        for url, (priority, controller) in list(self._in_flight.items()):
+            if dropped(url, priority):
+                # forgotten right away, rather than once the task has seen
+                # the abort, so the url can be requested again straight away
+                del self._in_flight[url]
+                controller.abort()
+        self._pump()
+
+    def _pump(self):
+        while self._heap and len(self._in_flight) < self.max_concurrent:
+            priority, _, url = heapq.heappop(self._heap)
+            if self._queued.get(url) != priority:
+                continue
+            del self._queued[url]
+            controller = js.AbortController.new()
+            self._in_flight[url] = (priority, controller)
+            asyncio.ensure_future(self._fetch(url, controller))
+
+    async def _fetch(self, url: str, controller):
+        start = self.metrics.clock()
+        pack, wanted = self._packs.pop(url, (None, url))
+        try:
+            response = await pyfetch(url, signal=controller.signal)
+            body_start = self.metrics.clock()
+            blob = await response.js_response.blob()
+            if self.on_download is not None:
+                self.on_download(blob.size, body_start, self.metrics.clock())
+            if pack is not None:
+                await self._unpack(pack, blob, wanted)
+            else:
+                self.cache.put(url, await self._decode(blob))
+            self.metrics.observe(
+                "image_request_to_decode", self.metrics.clock() - start
+            )
+            self.metrics.count("image_fetches")
+        except Exception as exc:
+            self.metrics.count(
+                "image_fetches_aborted" if controller.signal.aborted
+                else "image_fetch_errors"
+            )
+            console.log(f"[prefetch] dropped {url}: {exc}")
+        finally:
+            # unless it was aborted, and requested again since
+            if self._in_flight.get(url, (None, None))[1] is controller:
+                del self._in_flight[url]
+            self._pump()
+
+    @staticmethod
+    async def _decode(blob) -> CachedImage:
+        src = js.URL.createObjectURL(blob)
+        image = js.Image.new()
+        image.src = src
+        try:
+            await image.decode()
+        except Exception:
+            js.URL.revokeObjectURL(src)
+            raise
+        return CachedImage(src, image, image.naturalWidth * image.naturalHeight * 4)
+
+    async def _unpack(self, pack: ImagePack, blob, wanted: str):
+        # the images are slices of the downloaded blob, so unpacking copies
+        # nothing but the index
+        header = await blob.slice(0, PACK_HEADER.size).arrayBuffer()
+        index_size = pack_index_size(header.to_bytes())
+        index = PackIndex((await blob.slice(0, index_size).arrayBuffer()).to_bytes())
+        for image_num, (start, end) in index.images.items():
+            url = pack.image_url(image_num)
+            if url in self.cache:
+                continue
+            image = blob.slice(start, end, pack.content_type)
+            if url == wanted:
+                # decoded now, like any other prefetched image
+                self.cache.put(url, await self._decode(image))
+            else:
+                src = js.URL.createObjectURL(image)
+                self.cache.put(url, CachedImage(src, None, image.size))
+        self.metrics.count("image_packs")
+
+
+class VariantPlanner:
+    """Draws image variants ahead of time so they can be prefetched.
+
+    Plans are kept per episode, so warming up the next episode doesn't
+    disturb the one that is playing. With ``reuse_cached`` set, variants
+    that ``is_cached`` reports as already downloaded are drawn first.
+    """
+
+    def __init__(
+        self,
+        num_variations: int,
+        num_tries: int,
+        is_cached: Callable[[str, str, str], bool] | None = None,
+    ):
+        self.num_variations = num_variations
+        self.num_tries = num_tries
+        self.is_cached = is_cached
+        self.reuse_cached = False
+        self.last_image_num = -1
+        self._planned: dict[tuple[str, str], str] = {}
+        self._restricted: dict[str, int] = {}
+
+    def restrict(self, episode_names: Iterable[str], num_variations: int):
+        """Only draw the first ``num_variations`` images for these episodes,
+        e.g. the ones downloaded for offline viewing. Replaces any earlier
+        restriction."""
+        self._restricted = {name: num_variations for name in episode_names}
+        self._planned = {
+            key: image_num
+            for key, image_num in self._planned.items()
+            if int(image_num) < self._restricted.get(key[0], self.num_variations)
+        }
+
+    def _draw(self, episode_name: str, scene_name: str) -> str:
+        num_variations = self._restricted.get(episode_name, self.num_variations)
+        if self.reuse_cached and self.is_cached is not None:
+            cached = [
+                image_num
+                for image_num in (str(n).zfill(2) for n in range(num_variations))
+                if image_num != self.last_image_num
+                and self.is_cached(episode_name, scene_name, image_num)
+            ]
+            if cached:
+                return random.choice(cached)
+        for _ in range(self.num_tries):
+            image_num = str(random.randint(0, num_variations - 1)).zfill(2)
+            if image_num != self.last_image_num:
+                break
+        return image_num
+
+    def peek(self, episode_name: str, scene_name: str) -> str:
+        key = (episode_name, scene_name)
+        if key not in self._planned:
+            self._planned[key] = self._draw(episode_name, scene_name)
+        return self._planned[key]
+
+    def take(self, episode_name: str, scene_name: str) -> str:
+        image_num = self._planned.pop((episode_name, scene_name), None)
+        if image_num is None or image_num == self.last_image_num:
+            image_num = self._draw(episode_name, scene_name)
+        self.last_image_num = image_num
+        return image_num
+
+    def clear(self, episode_name: str, keep: Iterable[str] = ()):
+        """Drop the plans for an episode, other than for the scenes in
+        ``keep``."""
+        keep = set(keep)
+        self._planned = {
+            key: image_num
+            for key, image_num in self._planned.items()
+            if key[0] != episode_name or key[1] in keep
+        }
+
+
+class ImageSwapper:
+    """Double-buffered image display with decode-gated crossfades.
+
+    The next image is loaded and decoded in the hidden layer, and the layers
+    only crossfade once that's done, so the visible image never blanks
+    while waiting on the network. A swap that finishes decoding after a
+    newer one was requested is dropped.
+    """
+
+    def __init__(self, front, back):
+        self.front = front
+        self.back = back
+        self._generation = 0
+
+    @property
+    def layers(self) -> tuple:
+        return self.front, self.back
+
+    async def show(self, src: str) -> bool:
+        self._generation += 1
+        generation = self._generation
+        layer = self.back
+        layer.src = src
+        try:
+            await layer.decode()
+        except Exception:
+            # decode() rejects when the src is replaced by a newer swap, or
+            # the image fails to load
+            return False
+        if generation != self._generation:
+            return False
+        layer.classList.add("show")
+        self.front.classList.remove("show")
+        self.front, self.back = layer, self.front
+        return True
+
+
+class ImageSizes:
+    """Picks the smallest prebuilt image size that fills the image container.
+
+    Sizes and formats come from the manifest written by
+    tools/build_image_variants.py. Until it has loaded, or for episodes it
+    doesn't cover, the full-size png is used. If tools/build_image_packs.py
+    has packed the variants, ``pack`` points at a scene's pack.
+
+    Episodes downloaded for offline viewing are ``pin``-ned to the size and
+    format they were downloaded at, whatever size is picked for the rest,
+    so that they play from the images that were saved.
+    """
+
+    def __init__(self, original_template: str, variant_root: str):
+        self.original_template = original_template
+        self.variant_root = variant_root
+        self.widths: list[int] = []
+        self.episodes: set[str] = set()
+        self.format: str | None = None
+        self.packs = False
+        self.width: int | None = None
+        self.max_width: int | None = None
+        # (width, format) by episode name, None for the full-size png
+        self.pinned: dict[str, tuple[int, str] | None] = {}
+        self._target_width = 0.0
+
+    async def load(self):
+        try:
+            manifest_url = f"{self.variant_root}/manifest.json"
+            manifest = json.loads(await fetch_text(manifest_url))
+        except Exception as exc:
+            console.log(f"[images] no image variants, using png: {exc}")
+            return
+        for fmt in manifest["formats"]:
+            if await self._decodes(f"{self.variant_root}/probe.{fmt}"):
+                self.format = fmt
+                break
+        self.widths = sorted(manifest["widths"])
+        self.episodes = set(manifest["episodes"])
+        self.packs = manifest.get("packs", False)
+        self._pick()
+
+    @staticmethod
+    async def _decodes(url: str) -> bool:
+        probe = js.Image.new()
+        probe.src = url
+        try:
+            await probe.decode()
+        except Exception:
+            return False
+        return True
+
+    def resize(self, container_width: float, device_pixel_ratio: float):
+        self._target_width = container_width * (device_pixel_ratio or 1.0)
+        self._pick()
+
+    def cap(self, max_width: int | None):
+        """Never pick a size wider than ``max_width``, to save bandwidth."""
+        self.max_width = max_width
+        self._pick()
+
+    def _pick(self):
+        if not self.widths:
+            return
+        widths = [
+            width for width in self.widths
+            if self.max_width is None or width <= self.max_width
+        ] or self.widths[:1]
+        fits = [width for width in widths if width >= self._target_width]
+        self.width = fits[0] if fits else widths[-1]
+
+    def pin(self, sizes: dict[str, tuple[int, str] | None]):
+        self.pinned = sizes
+
+    def size(self, episode_name: str) -> tuple[int, str] | None:
+        """The (width, format) of an episode's images, None for the png."""
+        if episode_name in self.pinned:
+            return self.pinned[episode_name]
+        if (
+            self.width is None
+            or self.format is None
+            or episode_name not in self.episodes
+        ):
+            return None
+        return self.width, self.format
+
+    def _variant_template(
+        self, episode_name: str, scene_name: str, size: tuple[int, str]
+    ) -> str:
+        # the image number is left to fill in
+        width, fmt = size
+        return (
+            f"{self.variant_root}/{episode_name}/"
+            f"{scene_name}_image_{{}}_{width}.{fmt}"
+        )
+
+    def url(self, episode_name: str, scene_name: str, image_num: str) -> str:
+        size = self.size(episode_name)
+        if size is None:
+            return self.original_template.format(
+                episode_name=episode_name, scene_name=scene_name, image_num=image_num
+            )
+        template = self._variant_template(episode_name, scene_name, size)
+        return template.format(image_num)
+
+    def pack(self, episode_name: str, scene_name: str) -> ImagePack | None:
+        size = self.size(episode_name)
+        if not self.packs or size is None:
+            return None
+        width, fmt = size
+        return ImagePack(
+            f"{self.variant_root}/{episode_name}/"
+            f"{scene_name}_images_{width}.{fmt}.pack",
+            f"image/{fmt}",
+            # fixed to this size, even if a resize picks another before the
+            # pack arrives
+            self._variant_template(episode_name, scene_name, size).format,
+        )
+
+
+class Prefetcher:
+    """Warms the images the upcoming timeline events are going to show."""
+
+    def __init__(
+        self,
+        queue: FetchQueue,
+        variants: VariantPlanner,
+        image_url: Callable[[str, str, str], str],
+        lookahead: int,
+        image_pack: Callable[[str, str], ImagePack | None] | None = None,
+    ):
+        self.queue = queue
+        self.variants = variants
+        self.image_url = image_url
+        self.lookahead = lookahead
+        self.image_pack = image_pack
+
+    def refresh(self, episode_name: str, cursor):
+        for url, priority, pack in self._wanted(episode_name, cursor):
+            self.queue.request(url, priority, pack)
+
+    def warm(self, episode_name: str, events: list):
+        """Fetch images for an episode ahead of it starting to play."""
+        for event in events:
+            self.queue.request(*self._image(episode_name, event, BACKGROUND))
+
+    def _events(self, cursor) -> list:
+        # the next rotation of the current scene is needed soonest
+        return [cursor.event, *cursor.upcoming(self.lookahead)]
+
+    def _wanted(self, episode_name: str, cursor) -> list[tuple]:
+        return [
+            self._image(
+                episode_name, event, URGENT if distance == 0 else LOOKAHEAD + distance
+            )
+            for distance, event in enumerate(self._events(cursor))
+        ]
+
+    def _image(self, episode_name: str, event, priority: int) -> tuple:
+        image_num = self.variants.peek(episode_name, event.scene_name)
+        url = self.image_url(episode_name, event.scene_name, image_num)
+        pack = self.image_pack and self.image_pack(episode_name, event.scene_name)
+        return url, priority, pack
+
+    def reset(self, episode_name: str, cursor=None, abort_urgent: bool = False):
+        """Drop lookahead work after a seek in, or a switch away from, an episode.
+
+        With ``abort_urgent``, downloads for the scene that was current are
+        aborted too, since playback has moved away from it. Warm-ups for the
+        next episode carry on. Given the
+        ``cursor`` at the new position, the images it still wants are kept
+        downloading, and their plans kept, rather than aborted and fetched
+        again. Plans made for other episodes are kept.
+        """
+        keep = set()
+        if cursor is not None:
+            scene_names = {event.scene_name for event in self._events(cursor)}
+            self.variants.clear(episode_name, keep=scene_names)
+            keep = {
+                pack.url if pack is not None else url
+                for url, _, pack in self._wanted(episode_name, cursor)
+            }
+        else:
+            self.variants.clear(episode_name)
+        self.queue.cancel(URGENT if abort_urgent else LOOKAHEAD, keep)
+
+
+class QualityTier(NamedTuple):
+    name: str
+    rotation: float  # seconds each image stays up within a scene
+    max_width: int | None  # widest image size fetched, None for any
+    reuse_cached: bool  # rotate through variants that are already downloaded
+    packs: bool  # fetch all of a scene's variants at once, where packed
+    lookahead: int  # upcoming timeline events to prefetch images for
+    min_kbps: float  # image throughput the tier needs
+
+
+class BandwidthController:
+    """Steps image quality down and up with the measured image throughput.
+
+    ``tiers`` go from best to worst. Throughput is the bytes of the image
+    downloads of the last ``WINDOW_MS`` over the time the link was busy
+    with their bodies, so that neither latency nor idle time between
+    downloads, nor several downloads at once, hide how fast the link is.
+    The video stalling counts as a sign that bandwidth is short even when
+    the images themselves arrive fast enough. The tier
+    steps down as soon as either says so, and back up one tier at a time
+    once throughput has had room to spare for ``recovery_ms`` without a
+    stall, so that images don't take bandwidth the video stream needs.
+    ``on_change`` is called with each new tier.
+    """
+
+    # how far back downloads count towards the throughput
+    WINDOW_MS = 10_000
+    # throughput the next tier up needs, times this, before stepping up
+    HEADROOM = 1.5
+
+    def __init__(
+        self,
+        tiers: list[QualityTier],
+        clock: Callable[[], float],
+        recovery_ms: float,
+        on_change: Callable[[QualityTier], None],
+        metrics: Metrics | None = None,
+        initial_kbps: float | None = None,
+    ):
+        self.tiers = tiers
+        self.clock = clock
+        self.recovery_ms = recovery_ms
+        self.on_change = on_change
+        self.metrics = metrics or Metrics()
+        self.kbps = initial_kbps
+        # (body start, body end, bytes) of the downloads in the window
+        self._downloads: deque[tuple[float, float, int]] = deque()
+        self.level = 0
+        if initial_kbps is not None:
+            # a starting point only, so on_change isn't called for it
+            while self._short(self.level):
+                self.level += 1
+        self._calm_since = clock()
+
+    @property
+    def tier(self) -> QualityTier:
+        return self.tiers[self.level]
+
+    def observe_download(self, nbytes: int, started: float, finished: float):
+        if nbytes <= 0 or finished <= started:
+            return
+        self._downloads.append((started, finished, nbytes))
+        while self._downloads[0][1] < finished - self.WINDOW_MS:
+            self._downloads.popleft()
+        self.kbps = self._throughput()
+        if self._short(self.level):
+            self._step(1)
+        elif self.level and self.clock() - self._calm_since >= self.recovery_ms and (
+            self.kbps >= self.tiers[self.level - 1].min_kbps * self.HEADROOM
+        ):
+            self._step(-1)
+
+    def _throughput(self) -> float:
+        busy, nbytes = 0.0, 0
+        busy_until = float("-inf")
+        for started, finished, size in sorted(self._downloads):
+            # overlapping bodies shared the link, so count the time once
+            busy += max(finished - max(started, busy_until), 0)
+            busy_until = max(busy_until, finished)
+            nbytes += size
+        return nbytes * 8 / busy
+
+    def observe_stall(self):
+        self.metrics.count("video_stalls")
+        self._step(1)
+
+    def _short(self, level: int) -> bool:
+        return level < len(self.tiers) - 1 and self.kbps < self.tiers[level].min_kbps
+
+    def _step(self, by: int):
+        # any change, or a stall at the lowest tier, restarts the wait to
+        # step back up
+        self._calm_since = self.clock()
+        level = min(max(self.level + by, 0), len(self.tiers) - 1)
+        if level == self.level:
+            return
+        self.metrics.count("quality_step_downs" if by > 0 else "quality_step_ups")
+        self.level = level
+        self.on_change(self.tier)
+
+
+class ImageStore:
+    """The page's side of the service worker's image cache (sw.js).
+
+    Publishes the manifest the worker caches by: which urls are scene
+    images, the byte budget it evicts down to, and the episode that is
+    playing, whose images are never evicted. Episodes can be downloaded for
+    offline viewing; the worker reports each image back to ``on_progress``
+    as (episode name, done, failed, total, full), ``full`` once a download
+    has stopped because the offline episodes would go over the budget, and
+    the episodes it holds for offline viewing to ``on_offline``. ``sizes`` has the image size each of
+    those was downloaded at, as ``ImageSizes.size`` gave it.
+    """
+
+    def __init__(
+        self,
+        image_root: str,
+        max_bytes: int,
+        on_progress: Callable[[str, int, int, int, bool], None],
+        on_offline: Callable[[set[str]], None],
+    ):
+        self.image_root = image_root
+        self.max_bytes = max_bytes
+        self.on_progress = on_progress
+        self.on_offline = on_offline
+        self.offline: set[str] = set()
+        self.sizes: dict[str, tuple[int, str] | None] = {}
+        self.downloading: set[str] = set()
+        self.episode_name: str | None = None
+        self._worker = None
+        self._on_message = ffi.create_proxy(self._receive)
+
+    @property
+    def available(self) -> bool:
+        return self._worker is not None
+
+    async def start(self):
+        container = getattr(getattr(js, "navigator", None), "serviceWorker", None)
+        if container is None:
+            console.log("[images] no service worker, images are only cached in memory")
+            return
+        container.addEventListener("message", self._on_message)
+        # resolves once index.html's registration has an active worker
+        registration = await container.ready
+        self._worker = registration.active
+        self._publish()
+
+    def set_episode(self, episode_name: str):
+        self.episode_name = episode_name
+        self._publish()
+
+    def download(
+        self, episode_name: str, urls: list[str], size: tuple[int, str] | None
+    ):
+        self.downloading.add(episode_name)
+        self._send(
+            type="download",
+            episode=episode_name,
+            urls=urls,
+            size=list(size) if size is not None else None,
+        )
+
+    def remove(self, episode_name: str):
+        """Make a downloaded episode's images evictable again, making room
+        for other downloads."""
+        self._send(type="remove", episode=episode_name)
+
+    def _publish(self):
+        self._send(
+            type="manifest",
+            manifest={
+                "imageRoot": self.image_root,
+                "maxBytes": self.max_bytes,
+                "episode": self.episode_name,
+            },
+        )
+
+    def _send(self, **message):
+        if self._worker is None:
+            return
+        self._worker.postMessage(
+            ffi.to_js(message, dict_converter=js.Object.fromEntries)
+        )
+
+    def _receive(self, event):
+        message = event.data
+        kind = getattr(message, "type", None)
+        if kind == "progress":
+            if message.done + message.failed == message.total:
+                self.downloading.discard(message.episode)
+            self.on_progress(
+                message.episode,
+                message.done,
+                message.failed,
+                message.total,
+                bool(getattr(message, "full", False)),
+            )
+        elif kind == "offline":
+            self.offline = set(message.episodes.to_py())
+            # episodes downloaded before sizes were kept aren't pinned
+            sizes = getattr(message, "sizes", None)
+            sizes = sizes.to_py() if sizes is not None else {}
+            self.sizes = {
+                episode_name: tuple(size) if size is not None else None
+                for episode_name, size in sizes.items()
+                if episode_name in self.offline
+            }
+            self.on_offline(self.offline)
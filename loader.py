@@ -0,0 +1,368 @@
+"""Asynchronous data loading."""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+
+import js
+from js import console
+from pyodide.http import pyfetch
+from pyscript import ffi
+
+from episodes import Episode
+from scenes import Timeline
+
+
+async def _fetch(url: str):
+    response = await pyfetch(url)
+    if not response.ok:
+        raise OSError(f"failed to fetch {url}: HTTP {response.status}")
+    return response
+
+
+async def fetch_text(url: str) -> str:
+    return await (await _fetch(url)).string()
+
+
+async def fetch_bytes(url: str) -> bytes:
+    return await (await _fetch(url)).bytes()
+
+
+class ByteStream:
+    """A response body read chunk by chunk as it arrives.
+
+    ``skip`` leading bytes are dropped and reading stops after ``limit``
+    bytes, for servers that answer a range request with the whole file.
+    """
+
+    def __init__(self, response, skip: int = 0, limit: int | None = None):
+        self._reader = response.js_response.body.getReader()
+        self._skip = skip
+        self._remaining = limit
+        self.nbytes = 0
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        while self._remaining is None or self._remaining > 0:
+            result = await self._reader.read()
+            if result.done:
+                break
+            chunk = result.value.to_bytes()
+            if self._skip:
+                dropped = min(self._skip, len(chunk))
+                chunk = chunk[dropped:]
+                self._skip -= dropped
+            if self._remaining is not None:
+                chunk = chunk[:self._remaining]
+                self._remaining -= len(chunk)
+            if chunk:
+                self.nbytes += len(chunk)
+                yield chunk
+
+    async def read(self) -> bytes:
+        return b"".join([chunk async for chunk in self.chunks()])
+
+    def close(self):
+        # stop the download if the rest of the body isn't wanted
+        self._reader.cancel()
+
+
+async def open_range(url: str, start: int = 0, end: int | None = None) -> ByteStream:
+    """Request bytes ``start`` up to ``end`` of a file, as a stream."""
+    last = "" if end is None else end - 1
+    response = await pyfetch(url, headers={"Range": f"bytes={start}-{last}"})
+    if not response.ok:
+        raise OSError(f"failed to fetch {url}: HTTP {response.status}")
+    if response.status == 206:
+        return ByteStream(response)
+    # the server ignored the range and is sending the whole file
+    return ByteStream(response, skip=start, limit=None if end is None else end - start)
+
+
+class RequestCache:
+    """Async loads by key, where concurrent requests for a key share one load.
+
+    Failed loads are not kept, so the next request for that key retries.
+    """
+
+    def __init__(self, load: Callable[[str], Awaitable]):
+        self.load = load
+        self._futures: dict[str, asyncio.Future] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._futures
+
+    def get(self, key: str) -> asyncio.Future:
+        future = self._futures.get(key)
+        if future is None or (
+            future.done() and (future.cancelled() or future.exception())
+        ):
+            future = asyncio.ensure_future(self.load(key))
+            self._futures[key] = future
+        return future
+
+
+class EpisodeCache(RequestCache):
+    """A RequestCache of loaded episodes, held under a memory budget.
+
+    Once loaded episodes add up to more than ``max_bytes``, the least
+    recently requested ones are dropped, except for those ``pinned`` returns
+    (the episode that is playing and its neighbours).
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], Awaitable],
+        max_bytes: int,
+        pinned: Callable[[], Iterable[str]],
+    ):
+        super().__init__(load)
+        self.max_bytes = max_bytes
+        self.pinned = pinned
+        self.evictions = 0
+
+    def get(self, key: str) -> asyncio.Future:
+        future = super().get(key)
+        # re-insert to keep the dict in least to most recently used order
+        self._futures[key] = self._futures.pop(key)
+        if not future.done():
+            future.add_done_callback(lambda _: self._evict())
+        return future
+
+    def resident(self) -> dict[str, int]:
+        """Size in bytes of each loaded episode."""
+        return {
+            key: future.result().nbytes
+            for key, future in self._futures.items()
+            if future.done() and not future.cancelled() and future.exception() is None
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self.resident().values())
+
+    def _evict(self):
+        resident = self.resident()
+        total = sum(resident.values())
+        pinned = set(self.pinned())
+        for key, size in resident.items():
+            if total <= self.max_bytes:
+                break
+            if key in pinned:
+                continue
+            del self._futures[key]
+            total -= size
+            self.evictions += 1
+
+
+class PersistentCache:
+    """Fetched files kept across visits in the browser's Cache API.
+
+    Every entry is stored with the version it was fetched at: the file's
+    content hash from the data manifest when there is one, otherwise the app
+    version. A file is only downloaded again once its version changes.
+    Entry sizes and last-use times are kept in an index stored alongside the
+    entries, so the cache can be held under ``max_bytes`` by evicting least
+    recently used files. Everything lives in the Cache API, which unlike
+    localStorage is also available to workers.
+
+    The page and the scene worker each open the same cache, so the index is
+    read again and merged with this context's change before every write,
+    rather than written back from memory over the other context's entries.
+    """
+
+    # a key that is never fetched, only used to store the index in the cache
+    INDEX_URL = "https://{name}.invalid/index.json"
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int,
+        manifest: Awaitable[dict[str, str]],
+        default_version: str,
+    ):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.manifest = manifest
+        self.default_version = default_version
+        self._index_url = self.INDEX_URL.format(name=name)
+        self._index: dict[str, list] | None = None
+        # one index update at a time within this context
+        self._index_lock = asyncio.Lock()
+        self._cache = None
+        self.hits = 0
+        self.misses = 0
+
+    async def _read_index(self, cache) -> dict[str, list]:
+        try:
+            response = await cache.match(self._index_url)
+            return json.loads(await response.text()) if response else {}
+        except Exception:
+            return {}
+
+    async def _lookup(self, cache, url: str) -> list | None:
+        # lookups go by the index as of this context's last update, which
+        # at worst sends a request for a file the other context refreshed
+        if self._index is None:
+            self._index = await self._read_index(cache)
+        return self._index.get(url)
+
+    async def _update_index(self, cache, url: str, entry: list, evict: bool = False):
+        """Store ``entry`` for ``url`` in the index as it is now, evicting
+        down to ``max_bytes`` first if ``evict``."""
+        async with self._index_lock:
+            index = await self._read_index(cache)
+            index[url] = entry
+            if evict:
+                await self._evict(cache, index, keep=url)
+            await cache.put(self._index_url, js.Response.new(json.dumps(index)))
+            self._index = index
+
+    async def _open(self):
+        if self._cache is None:
+            self._cache = await js.caches.open(self.name)
+        return self._cache
+
+    async def version(self, url: str) -> str:
+        versions = await self.manifest
+        return versions.get(url.rsplit("/", 1)[-1], self.default_version)
+
+    async def listed(self, url: str) -> bool | None:
+        """Whether the data manifest lists the file, or None if there is no
+        manifest to tell."""
+        versions = await self.manifest
+        if not versions:
+            return None
+        return url.rsplit("/", 1)[-1] in versions
+
+    async def fetch_bytes(self, url: str) -> bytes:
+        if not hasattr(js, "caches"):
+            # the Cache API is only available in secure contexts
+            return await fetch_bytes(url)
+
+        cache = await self._open()
+        entry = await self._lookup(cache, url)
+        if entry is None:
+            # nothing cached to check against the manifest, so the request
+            # goes out alongside it, and the version is only needed to store
+            # the response
+            self.misses += 1
+            fetched = asyncio.ensure_future(fetch_bytes(url))
+            version = await self.version(url)
+            data = await fetched
+        else:
+            version = await self.version(url)
+            if entry[0] == version:
+                response = await cache.match(url)
+                if response is not None:
+                    self.hits += 1
+                    await self._update_index(cache, url, [*entry[:2], time.time()])
+                    return (await response.arrayBuffer()).to_bytes()
+            self.misses += 1
+            data = await fetch_bytes(url)
+        try:
+            await cache.put(url, js.Response.new(ffi.to_js(data)))
+        except Exception as exc:
+            # quota errors shouldn't stop the app from using the data
+            console.log(f"[cache] could not store {url}: {exc}")
+            return data
+
+        await self._update_index(
+            cache, url, [version, len(data), time.time()], evict=True
+        )
+        return data
+
+    async def fetch_text(self, url: str) -> str:
+        return (await self.fetch_bytes(url)).decode()
+
+    async def _evict(self, cache, index: dict[str, list], keep: str):
+        total = sum(size for _, size, _ in index.values())
+        by_last_use = sorted(index, key=lambda url: index[url][2])
+        for url in by_last_use:
+            if total <= self.max_bytes:
+                break
+            if url == keep:
+                continue
+            total -= index.pop(url)[1]
+            await cache.delete(url)
+
+
+class SceneWorker:
+    """Episode timelines loaded and compiled by worker.py, off the main thread.
+
+    Timelines arrive as one transferred ArrayBuffer per episode (see
+    ``Timeline.to_bytes``). ``ready`` stays False until the worker has
+    booted, and for good if it can't start, so callers can load on the main
+    thread in the meantime.
+    """
+
+    def __init__(self, app_version: str, url_root: str):
+        self.app_version = app_version
+        self.url_root = url_root
+        self.ready = False
+        # the worker's data cache counters, as of its last reply
+        self.hits = 0
+        self.misses = 0
+        self._worker = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._on_message = ffi.create_proxy(self._receive)
+
+    def start(self, src: str, config: str):
+        try:
+            from pyscript import PyWorker
+
+            self._worker = PyWorker(src, type="pyodide", config=config)
+        except Exception as exc:
+            console.log(f"[worker] unavailable, loading scenes on the main thread: {exc}")
+            return
+        self._worker.onmessage = self._on_message
+
+    def _send(self, **message):
+        self._worker.postMessage(
+            ffi.to_js(message, dict_converter=js.Object.fromEntries)
+        )
+
+    def _receive(self, event):
+        message = event.data
+        kind = getattr(message, "type", None)
+        if kind == "ready":
+            self._send(
+                type="configure", app_version=self.app_version, url_root=self.url_root
+            )
+            self.ready = True
+            return
+        if kind not in ("timeline", "error"):
+            return  # pyscript's own traffic on the same channel
+
+        future = self._pending.pop(message.episode_name, None)
+        if future is None or future.done():
+            return
+        if kind == "error":
+            future.set_exception(OSError(message.error))
+            return
+        self.hits, self.misses = message.hits, message.misses
+        future.set_result(Timeline.from_bytes(message.buffer.to_bytes()))
+
+    def load_timeline(self, episode: Episode) -> asyncio.Future:
+        future = self._pending.get(episode.name)
+        if future is None:
+            future = asyncio.get_event_loop().create_future()
+            self._pending[episode.name] = future
+            break_start, break_end = episode.episode_break
+            self._send(
+                type="load",
+                episode_name=episode.name,
+                intro_end=episode.intro_end,
+                break_start=break_start,
+                break_end=break_end,
+            )
+        return future
+
+
+async def load_manifest(url: str) -> dict[str, str]:
+    """Content hashes by file name, or an empty dict if unavailable."""
+    try:
+        return json.loads(await fetch_text(url))["files"]
+    except Exception as exc:
+        console.log(f"[cache] no data manifest, falling back to app version: {exc}")
+        return {}
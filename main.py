@@ -1,346 +1,313 @@
 """Pyscript app script."""
 
-import pandas as pd
+import asyncio
+import html
 import js
-import random
-from functools import lru_cache
-from pyweb import pydom
-from pyodide.http import open_url
+import weakref
 from pyscript import window, document, display, ffi
 from js import console
 
-
-hf_url_root = "https://huggingface.co/datasets/cosmicBboy"
-data_url_root = f"{hf_url_root}/critical-dream-aligned-scenes-mighty-nein-v2/raw/main"
-video_id_url = f"{data_url_root}/video_id_map.csv"
-data_url_template = f"{data_url_root}/aligned_scenes_{{episode_name}}.csv"
-image_url_template = (
-    f"{hf_url_root}/critical-dream-scene-images-mighty-nein-v2/resolve/main/"
-    "{episode_name}/{scene_name}_image_{image_num}.png"
+import data
+from data import (
+    load_appearances,
+    load_catalog,
+    load_scene_index,
+    load_scene_preview,
+    load_video_id_map,
+    open_data_cache,
+)
+from episodes import BUILTIN_CATALOG
+from images import (
+    BandwidthController,
+    FetchQueue,
+    ImageCache,
+    ImageSizes,
+    ImageStore,
+    ImageSwapper,
+    Prefetcher,
+    QualityTier,
+    VariantPlanner,
 )
+from loader import EpisodeCache, SceneWorker, fetch_text
+from metrics import Metrics
+from scenes import PlaybackCursor, Timeline
+from scheduler import Debouncer, Interval, PlaybackScheduler, Timeout
+
+
+# ?data_root= points the app at another host laid out like the Hugging Face
+# datasets, e.g. benchmarks/standin_server.py. Only this site or one on the
+# same machine, so a link can't feed the page data from anywhere else
+LOOPBACK_HOSTS = {"localhost", "127.0.0.1", "[::1]"}
+page_url = js.URL.new(window.location.href)
+url_root = page_url.searchParams.get("data_root")
+if url_root:
+    # absolute, so the scene worker and the service worker see the same urls
+    data_root = js.URL.new(url_root, window.location.href)
+    if data_root.origin == page_url.origin or data_root.hostname in LOOPBACK_HOSTS:
+        data.set_url_root(data_root.href)
+    else:
+        console.log(f"[pyscript] ignoring data_root on {data_root.origin}")
 
 APP_VERSION = "2024.06.19.2"
 
 NUM_IMAGE_VARIATIONS = 12
 NUM_IMAGE_SAMPLE_TRIES = 100
-SPEAKER_INTERVAL = 500
 UPDATE_INTERVAL = 15_000
+PREFETCH_LOOKAHEAD = 3
+MAX_IMAGE_FETCHES = 2
+IMAGE_CACHE_BYTES = 96 * 1024 * 1024
+# the service worker's image cache, across visits, within a share of the
+# browser's storage quota
+IMAGE_STORE_BYTES = 512 * 1024 * 1024
+# images per scene an offline download saves. A downloaded episode only
+# rotates through these, so it plays without fetching any others
+OFFLINE_IMAGE_VARIATIONS = 3
+# loaded episode timelines are around 30-40 KB each
+EPISODE_CACHE_BYTES = 256 * 1024
+METRICS_REFRESH_INTERVAL = 2_000
+
+# fetched the first time the about dialog is opened
+ABOUT_URL = "./assets/about.html"
+
+# binge mode warms up the next episode this many video seconds before the
+# end of the current one, within a budget of one episode's scene data and
+# this many images
+BINGE_WARMUP_LEAD = 5 * 60
+BINGE_WARMUP_IMAGES = 2
 
-ABOUT_CONTENTS = """
-<div>
-    <p>
-    👋 Welcome! I'm Niels Bantilan, and I built this project as a big fan of
-    Critical Role who happens to be a machine learning engineer. I build developer
-    tools for AI/ML engineers at <a href="https://www.union.ai" target="_blank">Union</a>,
-    but I also create independent projects like this one in my spare time.
-    <p/>
-    
-    <p>
-    If you're here, there's a chance that you're a fan of Critical Role
-    too.
-    <p/>
-    
-    <p>
-    The primary goal of Critical Dream is to give you just a little more amusement
-    and immersion as you watch the Critical Role cast spin their epic tales over the
-    table.
-    </p>
-
-    <p>
-    The Critical Dream image generation model does its best to render what's
-    happening in the episodes as they happen, but you'll notice weird
-    things like extra fingers, floating horns, nonsensical imagery, and
-    pointy-earred Caleb and Beau.
-    </p>
-
-    <p>
-    There's a lot to improve, but honestly I kind of like the fact that the model
-    sometimes produces epic looking scenes, but a lot of the time it's
-    cursed, djanky-looking portraits of the characters 🫠.
-    </p>
-
-    <p>
-    I've rendered the first few episodes of Campaign Two: The Might Nein, with
-    more coming soon.
-    </p>
-
-    <br>
-
-    <h2>The message of this medium</h2>
-
-    <p>
-    This project is possible because of the amazing and talented artists who
-    brought Critical Role's cast of characters to life. To create the Critical
-    Dream image generation model, I fined-tuned
-    <a href="https://huggingface.co/papers/2307.01952" target="_blank">Stable Diffusion XL</a>
-    on this art. I do not take this act lightly because
-    <strong><i>
-    the data is the foundation of the model, and I believe that those creating
-    the data have a right to the monetary gains resulting from the model.
-    </i></strong>
-
-    </p>
-    
-    <p>
-    According to this premise, here are the design decisions that guide this project:
-    </p>
-
-    <ul>
-        <li>
-        🚫 I have not monetized this website, nor do I have any plans on monetizing
-        it without some kind of revenue-sharing agreement in place with the
-        credited artists. It will remain free and unmonitized otherwise.
-        </li>
-
-        <li>
-        🏞️ For full transparency, the fine-tuning metadata for Critical Role-specific
-        characters are documented and credited below.
-        </li>
-
-        <li>
-        🤖 The model and training code will not be open sourced until the model
-        license and usage parameters of the model are agreed upon by myself and the
-        credited artists. It will remain closed source otherwise.
-        </li>
-
-        <li>
-        🎲 Images are displayed alongside the original YouTube videos managed by
-        the Critical Role team. I will not upload my own YouTube videos to
-        divert views from their channel.
-        </li>
-    </ul>
-
-    <br>
-
-    <h2>
-    To the artists
-    </h2>
-
-    <p>
-    Beyond the personal entertainment value of Critical Dream, I built this project
-    because I also want to spur a different kind of discourse at the intersection
-    of Art and AI by engaging with you and the creative community more broadly.
-    </p>
-
-    <p>
-    For a long time I've thought that many of today's AI companies take valuable data
-    published on the internet and use the "AI" label to re-package them behind a
-    walled garden where you pay for software services built on top of that data. The
-    creators of that data get nothing in return, and this is exactly where the
-    creative value chain is broken ⛓️.
-    </p>
-
-    <p>
-    At the same time, other organizations publish their models as open source
-    or open weights. While this is great for AI research, this also breaks the
-    creative value chain because it commoditizes the work pain-stakingly produced
-    by artists. The question I ask myself as I develop this project is:
-    </p>
-
-    <blockquote>
-    Is there a better way to organize creative and technical ecosystems on the
-    internet so that we can all create cool things while appropriately crediting
-    and compensating all of the stakeholders in the ecosystem, from creators to
-    engineers?
-    </blockquote>
-
-    <br>
-
-    <h2>
-    Get involved
-    </h2>
-
-    <p>
-    If you want to discuss topics like this and drive the future of this project,
-    please join me in the
-    <a href="https://discord.gg/AEUvh7QpGP" target="_blank">
-        discord channel <i class="fa-brands fa-discord"></i>
-    </a>.
-    </p>
-
-    <br>
-
-    <h2>
-    Credits
-    </h2>
-
-    <p>
-    The data used to fine-tune the model was sourced from the following artists
-    below. The training metadata for the image generation model is documented
-    <a href="https://github.com/critdream/critdream-app/blob/main/credits.yaml" target="_blank">here</a>.
-    </p>
-
-    <ul id="credits" class="columns">
-        <li><a href="https://www.deviantart.com/eljore/gallery" target="_blank">Joré Escalera</a></li>
-        <li><a href="https://pabloagurcia.artstation.com/" target="_blank">Pablo Agurcia</a></li>
-        <li><a href="https://www.etsy.com/shop/AstralTigerArt" target="_blank">Kerri Aitken</a></li>
-        <li><a href="https://www.hannahfriederichs.com/" target="_blank">Hannah Friederichs</a></li>
-        <li><a href="https://ko-fi.com/ornerine" target="_blank">Ari Orner</a></li>
-        <li><a href="https://ko-fi.com/morgalahan" target="_blank">Stacey Reilander</a></li>
-        <li><a href="https://x.com/42paintbrushes" target="_blank">Charis Draws</a></li>
-        <li><a href="https://hailiiz.carrd.co/" target="_blank">Hailiiz</a></li>
-        <li><a href="https://aaronsimon.artstation.com/" target="_blank">Aaron Simon</a></li>
-        <li><a href="https://0eitan0.tumblr.com" target="_blank">Eitan</a></li>
-        <li><a href="https://cameronmccafferty.tumblr.com" target="_blank">Cameron McCafferty</a></li>
-        <li><a href="https://redbiasca3d.artstation.com/" target="_blank">Red Biasca</a></li>
-        <li><a href="https://www.instagram.com/littleulvar/" target="_blank">Ulvar</a></li>
-        <li><a href="https://scoutvart.myportfolio.com/" target="_blank">Scout Villegas</a></li>
-        <li><a href="https://vamtaro.artstation.com/" target="_blank">Laura Ambrosiano</a></li>
-        <li><a href="https://porzio-art.carrd.co/" target="_blank">Porzio</a></li>
-        <li><a href="https://www.reddit.com/user/MGillArt/" target="_blank">MartinGillArt</a></li>
-        <li><a href="https://linktr.ee/travisearls" target="_blank">Travis Earls</a></li>
-        <li><a href="https://jaydrlove.tumblr.com/" target="_blank">jaydrlove</a></li>
-        <li><a href="https://www.deviantart.com/ktshy/gallery" target="_blank">Katie Shanahan</a></li>
-        <li><a href="https://jace_d.artstation.com/" target="_blank">Jace Daily</a></li>
-        <li><a href="https://linktr.ee/heartofpack" target="_blank">HeartofPack</a></li>
-        <li><a href="https://www.patreon.com/offbeatworlds" target="_blank">Stephanie Brown</a></li>
-        <li><a href="https://www.artstation.com/nelmdraws" target="_blank">Chris Nelson</a></li>
-        <li><a href="https://x.com/elimnebe" target="_blank">Elimnebe</a></li>
-        <li><a href="https://layaart.tumblr.com/" target="_blank">Laya Rose</a></li>
-        <li><a href="https://ninzja.artstation.com/" target="_blank">Vi Viro</a></li>
-        <li><a href="https://www.linkedin.com/in/matt-molen-8797406a/" target="_blank">Matt Molen</a></li>
-        <li><a href="https://www.linkedin.com/in/rachel-roubicek-32008116a/" target="_blank">Rachel Roubicek</a></li>
-        <li><a href="https://www.instagram.com/chieizuma" target="_blank">Chie Izuma</a></li>
-        <li><a href="https://www.tumblr.com/battletailors" target="_blank">Ayzek V Kass</a></li>
-        <li><a href="https://theminttu.tumblr.com/" target="_blank">Minttu Hynninen</a></li>
-        <li><a href="https://www.reddit.com/user/Milakangelo/" target="_blank">Milakangelo</a></li>
-        <li><a href="https://www.artstation.com/sinadraws" target="_blank">Sina Rupp</a></li>
-        <li><a href="https://www.toribennett.com/" target="_blank">Tori Bennett</a></li>
-        <li><a href="https://x.com/MintScribble" target="_blank">Natalia Thomson</a></li>
-        <li><a href="https://casukaga.tumblr.com/" target="_blank">casu</a></li>
-        <li><a href="https://www.pinterest.com/pin/nott-the-brave--629167010428717201/" target="_blank">Mr. Weiss</a></li>
-        <li><a href="https://linktr.ee/mikandii" target="_blank">Ameera Shiekh</a></li>
-        <li><a href="https://kubaryi.artstation.com/" target="_blank">Kynareth9</a></li>
-        <li><a href="https://larndraws.tumblr.com" target="_blank">Lauren Rowland</a></li>
-        <li><a href="https://ko-fi.com/fires" target="_blank">Carolina Abrantes</a></li>
-        <li><a href="https://t.co/NKmh0v83DN" target="_blank">Anna Janiszewska (Rammaru)</a></li>
-        <li><a href="https://ko-fi.com/disarmonia" target="_blank">Veronica Anrathi (Disarmonia)</a></li>
-        <li><a href="https://x.com/atutcha" target="_blank">Atutcha</a></li>
-        <li><a href="https://x.com/krianath" target="_blank">krianath</a></li>
-        <li><a href="https://www.artstation.com/letimvila" target="_blank">Leti M. Vila</a></li>
-        <li><a href="https://petyritonel.tumblr.com/" target="_blank">petyritonel</a></li>
-        <li><a href="https://larndraws.tumblr.com/" target="_blank">Lauren Rowlands</a></li>
-        <li><a href="https://yettinim.tumblr.com/" target="_blank">Yettinim</a></li>
-        <li><a href="https://x.com/ElesirArt" target="_blank">elesir</a></li>
-        <li><a href="https://www.patreon.com/rosygloomart" target="_blank">Rosy Gloom</a></li>
-        <li><a href="https://www.reddit.com/user/jamilabeth/" target="_blank">jamilabeth</a></li>
-        <li><a href="https://aminoapps.com/c/art/page/user/fires-00/33hM_fGz5rzD6vKQl2x1j3jngpd7BB" target="_blank">fires-00</a></li>
-        <li><a href="https://www.pinterest.com/rayoagares/" target="_blank">Александр Кувшинов</a></li>
-        <li><a href="https://www.patreon.com/deerlordhunter" target="_blank">Hunter Bonyun</a></li>
-        <li><a href="https://boosty.to/viciousmongrel" target="_blank">Vicious Mongrel</a></li>
-        <li><a href="https://ko-fi.com/elibear" target="_blank">Elliott</a></li>
-        <li><a href="https://saturdaysky.tumblr.com/" target="_blank">saturdaysky</a></li>
-        <li><a href="https://passingthegravesoftheunknown.tumblr.com/" target="_blank">Cristina Anaya (CristinaAnaya96)</a></li>
-    </ul>
-
-</div>
-"""
-
-EPISODE_STARTS = {
-    "c2e001": 854,
-    "c2e002": 504,
-    "c2e003": 420,
-    "c2e004": 526,
-    "c2e005": 538,
-    "c2e006": 474,
-    "c2e007": 528,
-    "c2e008": 602,
-    "c2e009": 665,
-    "c2e010": 638,
-    "c2e011": 624,
-    "c2e012": 479,
-    "c2e013": 375,
-    "c2e014": 616,
-    "c2e015": 641,
-    "c2e016": 569,
-    "c2e017": 712,
-    "c2e018": 621,
-    "c2e019": 594,
-    "c2e020": 521,
-    "c2e021": 591,
-    "c2e022": 500,
-    "c2e023": 497,
-    "c2e024": 599,
-    "c2e025": 542,
-}
-
-EPISODE_BREAKS = {
-    "c2e001": (5529, 6547),
-    "c2e002": (7583, 8470),
-    "c2e003": (7992, 8921),
-    "c2e004": (7203, 7885),
-    "c2e005": (10636, 11524),
-    "c2e006": (8406, 9226),
-    "c2e007": (8745, 9481),
-    "c2e008": (5583, 6517),
-    "c2e009": (7083, 7966),
-    "c2e010": (6414, 7297),
-    "c2e011": (6723, 7646),
-    "c2e012": (5529, 6311),
-    "c2e013": (7680, 8504),
-    "c2e014": (5783, 6546),
-    "c2e015": (7157, 8210),
-    "c2e016": (7594, 8343),
-    "c2e017": (7095, 7869),
-    "c2e018": (6665, 7640),
-    "c2e019": (7168, 8358),
-    "c2e020": (8125, 8126),
-    "c2e021": (8560, 8561),
-    "c2e022": (8615, 8616),
-    "c2e023": (6988, 6989),
-    "c2e024": (7988, 7989),
-    "c2e025": (5139, 5140),
-}
-
-EPISODE_NAMES = [*EPISODE_STARTS]
 
 SCENE_DURATION = 10
 
-SPEAKER_MAP = {
-    "travis": "fjord",
-    "marisha": "beau",
-    "laura": "jester",
-    "taliesin": {"characters": ["mollymauk", "caduceus"], "episode_cutoff": 26},
-    "ashley": "yasha",
-    "sam": {"characters": ["nott", "veth"], "episode_cutoff": 97},
-    "liam": "caleb",
-}
-
+# image quality, best first, as the measured image throughput allows. Lower
+# tiers rotate images less often, rotate through variants that are already
+# downloaded and fetch smaller sizes, so images don't compete with the video.
+# Only the top tier fetches whole scene packs, which save requests but
+# weigh all of a scene's variations
+QUALITY_TIERS = [
+    QualityTier("high", SCENE_DURATION, None, False, True, PREFETCH_LOOKAHEAD, 2_000),
+    QualityTier("medium", 2 * SCENE_DURATION, 512, True, False, 2, 1_000),
+    QualityTier("low", 4 * SCENE_DURATION, 256, True, False, 1, 0),
+]
+# how long throughput has to stay comfortably above the next tier up, with
+# no video stalls, before stepping up to it
+QUALITY_RECOVERY_MS = 60_000
+# buffering longer than this counts as the video stalling, rather than the
+# player catching up after a seek
+REBUFFER_MS = 1_500
+
+# wake slightly after a boundary so the strict rotation comparison in
+# update_speaker has already been crossed
+BOUNDARY_SLACK = 0.05
+
+# how long player state changes have to be quiet before a seek is resolved,
+# so that scrubbing resolves only the final position
+SEEK_SETTLE_MS = 250
+
+# playing again within this many seconds of where playback stopped is
+# resuming from a pause or buffering, rather than a seek
+RESUME_SLACK = 1.0
+
+# how long skip intro waits before seeking a second time
+SKIP_INTRO_RETRY_MS = 100
+
+# next and previous appearance skip past an appearance that started less
+# than this many seconds ago, so repeated clicks keep moving
+APPEARANCE_SLACK = 3
 
-speaker_update_interval_id = None
-image_update_interval_id = None
 
 speaker = None
 character = None
 scene_id = None
+cursor = None
 last_scene_time = 0
-last_image_num = -1
+image_due_at = None
+# when the player started buffering, while it is
+buffering_since = None
+# where and when playback last started, as (video seconds, clock ms,
+# playback rate), while it is playing
+playing_from = None
+# where playback stopped, while it is paused or buffering
+stopped_at = None
+warmed_episode = None
+# replaced by the published catalog once main() has loaded it
+catalog = BUILTIN_CATALOG
+# where each character appears across the catalog, loaded after startup
+appearances = None
+
+# session metrics, viewable in #data-output with the ?metrics=1 url parameter
+metrics = Metrics(clock=js.performance.now)
+metrics.mark("pyodide_ready")
+
+image_cache = ImageCache(IMAGE_CACHE_BYTES)
+image_swapper = ImageSwapper(
+    document.getElementById("image-layer-0"),
+    document.getElementById("image-layer-1"),
+)
+image_sizes = ImageSizes(data.image_url_template, data.image_variant_root)
+variants = VariantPlanner(
+    NUM_IMAGE_VARIATIONS,
+    NUM_IMAGE_SAMPLE_TRIES,
+    is_cached=lambda *image: image_sizes.url(*image) in image_cache,
+)
 
 
-@lru_cache
-def load_video_id_map() -> pd.DataFrame:
-    return pd.read_csv(open_url(video_id_url)).set_index("episode_name")["youtube_id"]
+def apply_quality_tier(tier: QualityTier):
+    console.log(f"[pyscript] image quality: {tier.name}")
+    image_sizes.cap(tier.max_width)
+    variants.reuse_cached = tier.reuse_cached
+    prefetcher.lookahead = tier.lookahead
 
 
-@lru_cache
-def load_data(episode_name: str) -> pd.DataFrame:
+# the browser's estimate of the downlink in Mbps, where it has one
+connection = getattr(getattr(js, "navigator", None), "connection", None)
+downlink = getattr(connection, "downlink", None)
+bandwidth = BandwidthController(
+    QUALITY_TIERS,
+    metrics.clock,
+    QUALITY_RECOVERY_MS,
+    apply_quality_tier,
+    metrics,
+    initial_kbps=downlink * 1000 if downlink else None,
+)
 
-    def scene_name(df):
-        return "scene_" + df.scene_id.astype(str).str.pad(3, fillchar="0")
 
-    def midpoint(df):
-        mid = (df["end_time"] - df["start_time"]) / 2
-        return df["start_time"] + mid
+def image_pack(episode_name: str, scene_name: str):
+    # not until a download has shown the bandwidth is there for them
+    if bandwidth.kbps is None or not bandwidth.tier.packs:
+        return None
+    # episodes saved for offline viewing play from the images that were
+    # downloaded, rather than from packs
+    if episode_name in image_store.offline:
+        return None
+    return image_sizes.pack(episode_name, scene_name)
+
+
+prefetcher = Prefetcher(
+    FetchQueue(
+        image_cache, MAX_IMAGE_FETCHES, metrics, on_download=bandwidth.observe_download
+    ),
+    variants,
+    image_sizes.url,
+    PREFETCH_LOOKAHEAD,
+    image_pack,
+)
+apply_quality_tier(bandwidth.tier)
 
-    data_url = data_url_template.format(episode_name=episode_name)
-    return (
-        pd.read_csv(open_url(data_url))
-        .rename(columns={"start": "start_time", "end": "end_time"})
-        .assign(
-            scene_name=scene_name,
-            mid_point=midpoint,
+
+data_cache = open_data_cache(APP_VERSION)
+# the published catalog, which main() swaps in for the built-in one. It
+# loads alongside the starting episode rather than ahead of it
+published_catalog = asyncio.ensure_future(load_catalog(data_cache))
+
+# episode loads and timeline compiles move off the main thread once the
+# worker has booted
+scene_worker = SceneWorker(APP_VERSION, data.hf_url_root)
+
+
+def hit_rate(*caches) -> float:
+    hits = sum(cache.hits for cache in caches)
+    lookups = hits + sum(cache.misses for cache in caches)
+    return hits / lookups if lookups else 0.0
+
+
+metrics.gauge("image_cache_hit_rate", lambda: hit_rate(image_cache))
+metrics.gauge("image_cache_mb", lambda: image_cache.nbytes / 1e6)
+metrics.gauge("data_cache_hit_rate", lambda: hit_rate(data_cache, scene_worker))
+metrics.gauge("scene_worker_ready", lambda: scene_worker.ready)
+metrics.gauge("image_quality", lambda: bandwidth.tier.name)
+metrics.gauge("image_rotation_s", lambda: bandwidth.tier.rotation)
+metrics.gauge("image_width", lambda: image_sizes.width)
+metrics.gauge(
+    "image_throughput_kbps",
+    lambda: round(bandwidth.kbps) if bandwidth.kbps is not None else None,
+)
+
+
+async def _load_data(episode_name: str) -> Timeline:
+    episode = catalog[episode_name]
+    with metrics.timer("episode_load"):
+        if scene_worker.ready:
+            metrics.count("episode_loads_in_worker")
+            return await scene_worker.load_timeline(episode)
+        index = await load_scene_index(
+            data_cache, episode.name, episode.intro_end, episode.episode_break
         )
-    )
+        return index.timeline
+
+
+def pinned_episodes() -> list[str]:
+    # the selected episode, and its neighbours for binge mode and for
+    # stepping back
+    return catalog.adjacent(document.getElementById("episode").value)
+
+
+# concurrent requests for the same episode share a single download
+episode_data = EpisodeCache(_load_data, EPISODE_CACHE_BYTES, pinned_episodes)
+
+metrics.gauge("episode_cache_kb", lambda: episode_data.nbytes / 1e3)
+metrics.gauge("episode_cache_evictions", lambda: episode_data.evictions)
+metrics.gauge(
+    "episode_kb",
+    lambda: {name: size / 1e3 for name, size in episode_data.resident().items()},
+)
+
+
+def load_data(episode_name: str) -> asyncio.Future:
+    return episode_data.get(episode_name)
+
+
+async def load_preview(episode_name: str, start_time: float) -> Timeline | None:
+    # only the published catalog has the scene offsets a preview reads by
+    episodes = await published_catalog
+    if episode_name not in episodes:
+        return None
+    with metrics.timer("episode_preview"):
+        index = await load_scene_preview(episodes[episode_name], start_time)
+    return index.timeline if index is not None else None
+
+
+# timelines load_timeline returned as previews: they end with the preview's
+# last scene rather than the episode's
+previews = weakref.WeakSet()
+
+
+async def load_timeline(episode_name: str, start_time: float) -> Timeline:
+    """The episode's timeline, or a preview of it around ``start_time``.
+
+    Until the full timeline has loaded, the scenes around ``start_time`` are
+    streamed alongside it and whichever arrives first is returned; see
+    ``replace_preview`` for swapping in the full one.
+    """
+    full = load_data(episode_name)
+    if full.done():
+        return full.result()
+    preview = asyncio.ensure_future(load_preview(episode_name, start_time))
+    await asyncio.wait([full, preview], return_when=asyncio.FIRST_COMPLETED)
+    if not full.done() and preview.exception() is None and (
+        preview.result() is not None
+    ):
+        metrics.count("episode_previews")
+        previews.add(preview.result())
+        return preview.result()
+    preview.cancel()
+    return await full
+
+
+def replace_preview(episode_name: str, future: asyncio.Future):
+    """Swap the full timeline in for a preview of it, once it has loaded."""
+    global timeline, cursor
+
+    if future.cancelled() or future.exception() is not None:
+        return
+    full = future.result()
+    if timeline is full or timeline.episode_name != episode_name:
+        return
+    # carry on from the event playing now; the next tick catches up from it
+    cursor = PlaybackCursor(full, cursor.event.time)
+    timeline = full
+    metrics.count("episode_previews_replaced")
+    if scheduler.armed:
+        schedule_next_update(float(player.getCurrentTime() or 0.0))
 
 
 def log(message):
@@ -348,166 +315,137 @@ def log(message):
     console.log(message)  # log to JS console
 
 
-def get_url_episode() -> str:
+def get_url_param(name: str) -> str:
     current_url = js.URL.new(window.location.href)
     search_params = current_url.searchParams
-    url_episode = search_params.get("episode") or ""
-    return url_episode
-
+    return search_params.get(name) or ""
 
-def set_episode_dropdown():
-    select = pydom["select#episode"][0]
 
-    url_episode = get_url_episode()
-    console.log(f"url episode: {url_episode}, {type(url_episode)}")
-
-    for episode_name in EPISODE_NAMES:
-        num = episode_name.split("e")[1]
-
-        # this is a hack to fix the episode number for episode 100, since that
-        # was mistakenly labeled when the original caption data was created
-        if int(num) > 100:
-            num = str(int(num) - 1).zfill(3)
+def get_url_episode() -> str:
+    return get_url_param("episode")
+
+
+def get_url_start_time() -> float:
+    # deep link into the episode, in seconds: ?episode=c2e010&t=5400
+    try:
+        return max(float(get_url_param("t") or 0), 0.0)
+    except ValueError:
+        return 0.0
+
+
+def set_episode_dropdown(selected: str):
+    """Fill the dropdown from the catalog, with the ``selected`` episode, the
+    one whose timeline is loaded, picked."""
+    groups = []
+    for campaign, episodes in catalog.campaigns().items():
+        options = []
+        for episode in episodes:
+            attribute = " selected" if selected == episode.name else ""
+            options.append(
+                f'<option value="{html.escape(episode.name)}"{attribute}>'
+                f"{html.escape(episode.label)}</option>"
+            )
+        title = html.escape(catalog.campaign_title(campaign))
+        groups.append(f'<optgroup label="{title}">{"".join(options)}</optgroup>')
+    # one DOM update for the whole catalog
+    dropdown = document.getElementById("episode")
+    dropdown.innerHTML = "".join(groups)
+    dropdown.value = selected
 
-        content = f"Campaign 2 Episode {num}"
 
-        option = pydom.create("option", html=content)
-        option.value = episode_name
-        if url_episode == episode_name:
-            option.selected = "selected"
-        select.append(option)
+def set_current_episode(event):
+    episode_name = document.getElementById("episode").value
+    asyncio.ensure_future(switch_episode(episode_name))
 
 
-def set_current_episode(event):
-    global df, player, video_id_map
+async def switch_episode(
+    episode_name: str, autoplay: bool = False, start_time: float = 0.0
+):
+    global timeline, cursor, player, video_id_map, speaker, character, scene_id
 
-    episode_name = document.getElementById("episode").value
     video_id = video_id_map[episode_name]
     console.log(f"video id: {video_id}")
-    df = load_data(episode_name)
+
+    # keep the page interactive while the episode downloads
+    image_container = document.getElementById("image")
+    image_container.classList.add("loading")
+    try:
+        new_timeline = await load_timeline(episode_name, start_time)
+    finally:
+        image_container.classList.remove("loading")
+
+    if document.getElementById("episode").value != episode_name:
+        # another episode was picked while this one was loading
+        return
+
+    prefetcher.reset(timeline.episode_name)
+    timeline = new_timeline
+    cursor = PlaybackCursor(timeline, start_time)
+    image_store.set_episode(episode_name)
+    show_download_status(episode_name)
+    load_data(episode_name).add_done_callback(
+        lambda future: replace_preview(episode_name, future)
+    )
+    # the image shown below is for this event, so the state change that
+    # follows the cue doesn't swap in a second one
+    speaker, character, scene_id = (
+        cursor.event.speaker, cursor.event.character, cursor.event.scene_id
+    )
     # set video on the youtube player
-    player.cueVideoById(video_id)
+    if autoplay:
+        player.loadVideoById(video_id, start_time)
+    else:
+        player.cueVideoById(video_id, start_time)
     update_image()
 
 
-def find_closest_scene(
-    df: pd.DataFrame,
-    current_time: float,
-    environment: bool = False,
-) -> pd.Series:
-    if environment:
-        df = df.query("character == 'environment'")
-    distance = abs(df["mid_point"] - current_time)
-    closest_scene = df.loc[distance.idxmin()]
-    return closest_scene
-
-
-def map_character(episode_num: int, character: str):
-    _char = character.lower()
-    if _char in SPEAKER_MAP:
-        _char = SPEAKER_MAP[character]
-        if isinstance(_char, dict):
-            if _char["episode_cutoff"] < episode_num:
-                _char = _char["characters"][0]
-            else:
-                _char = _char["characters"][1]
-        return _char
-    return character
-
-
-def find_scene(
-    episode_name: str,
-    df: pd.DataFrame,
-    current_time: float,
-    speaker: str | None = None,
-    character: str | None = None,
-) -> pd.Series:
-    episode_num = int(episode_name.split("e")[1])
-    df = df.query(f"episode_name == '{episode_name}'")
-
-    if speaker:
-        df = df.query(f"speaker == '{speaker}'")
-
-    if character:
-        _char = map_character(episode_num, character)
-        df = df.query(f"character == '{_char}'")
-
-    current_time = min(current_time, df["end_time"].max())
-    current_time = max(current_time, df["start_time"].min())
-
-    break_start, break_end = EPISODE_BREAKS[episode_name]
-    if current_time <= EPISODE_STARTS[episode_name]:
-        return find_closest_scene(df, current_time, environment=True)
-    elif break_start <= current_time <= break_end:
-        # during the mid-episode break, show an environment image from the intro
-        return find_closest_scene(df, 0, environment=True)
-
-    result = df.loc[
-        (df["start_time"] <= current_time)
-        & (current_time <= df["end_time"])
-    ]
-
-    # if found, return result
-    if not result.empty:
-        assert result.shape[0] == 1
-        return result.iloc[0]
-
-    # otherwise find the closest scene to the timestamp
-    return find_closest_scene(df, current_time)
-
-
 @ffi.create_proxy
 def update_image():
-    global df, player, speaker, character, last_image_num
+    global cursor, player, image_due_at
 
-    current_time = float(player.getCurrentTime() or 0.0)
-    episode_name = document.getElementById("episode").value
+    # when the image was due, if this update is late for a boundary
+    due_at = image_due_at or metrics.clock()
+    image_due_at = None
 
-    scene_name = find_scene(
-        episode_name,
-        df,
-        current_time,
-        speaker=speaker,
-        character=character,
-    )["scene_name"]
-
-    for _ in range(NUM_IMAGE_SAMPLE_TRIES):
-        image_num = str(random.randint(0, NUM_IMAGE_VARIATIONS - 1)).zfill(2)
-        if image_num != last_image_num:
-            last_image_num = image_num
-            break
-
-    image_url = image_url_template.format(
-        episode_name=episode_name, scene_name=scene_name, image_num=image_num
-    )
+    current_time = float(player.getCurrentTime() or 0.0)
+    # the episode playing, which is not the one picked in the dropdown while
+    # a switch is loading
+    episode_name = cursor.timeline.episode_name
+
+    # the timeline event already carries the scene resolved with the current
+    # speaker and character filters
+    scene_name = cursor.event.scene_name
+    image_num = variants.take(episode_name, scene_name)
+    image_url = image_sizes.url(episode_name, scene_name, image_num)
     console.log(f"updating image, current time: {current_time}")
 
-    current_image = document.querySelector("img#current-image")
-    current_image.classList.remove("show")
+    # use the prefetched copy if there is one
+    cached = image_cache.get(image_url)
+    image_src = cached.src if cached else image_url
+    asyncio.ensure_future(show_image(image_src, due_at))
 
-    @ffi.create_proxy
-    def set_new_image():
-        current_image.setAttribute("src", image_url)
+    prefetcher.refresh(episode_name, cursor)
 
-    @ffi.create_proxy
-    def show_new_image():
-        current_image.classList.add("show")
 
-    js.setTimeout(set_new_image, 50)
-    js.setTimeout(show_new_image, 100)
+async def show_image(image_src: str, due_at: float):
+    if await image_swapper.show(image_src):
+        metrics.observe("boundary_to_visible", metrics.clock() - due_at)
+        metrics.mark("first_image")
+    else:
+        metrics.count("image_swaps_dropped")
 
 
-@ffi.create_proxy
-def update_speaker():
-    global df, player, speaker, character, scene_id, last_scene_time
+def update_speaker(seeked: bool = False):
+    global cursor, player, speaker, character, scene_id, last_scene_time
+    global image_due_at
 
     current_time = float(player.getCurrentTime() or 0.0)
-    episode_name = document.getElementById("episode").value
-    scene = find_scene(episode_name, df, current_time)
+    with metrics.timer("scene_lookup"):
+        scene = cursor.advance(current_time)
 
-    new_speaker = scene["speaker"]
-    new_character = scene["character"]
-    new_scene_id = scene["scene_id"]
+    new_speaker = scene.speaker
+    new_character = scene.character
+    new_scene_id = scene.scene_id
     console.log(
         f"current speaker: {speaker}, "
         f"character: {character}, "
@@ -516,11 +454,19 @@ def update_speaker():
 
     update_scene = False
     exceeds_scene_duration = False
-    if (current_time - last_scene_time) > SCENE_DURATION:
+    rotation = bandwidth.tier.rotation
+    if (current_time - last_scene_time) > rotation:
         exceeds_scene_duration = True
         update_scene = True
+        # how far past the rotation boundary this update runs; anything
+        # longer than a rotation is a seek rather than a late update
+        overdue = current_time - (last_scene_time + rotation)
+        if overdue <= rotation:
+            image_due_at = metrics.clock() - overdue * 1000
         last_scene_time = current_time
-    elif current_time == 0:
+    elif current_time == 0 or seeked:
+        # restart the rotation from here, and show the new scene if the
+        # seek moved to one
         update_scene = True
         last_scene_time = current_time
 
@@ -544,6 +490,8 @@ def update_speaker():
 def on_youtube_frame_api_ready():
     global player, video_id_map
 
+    # created at startup, with the dropdown just set to the start episode and
+    # the loading modal keeping it so
     episode_name = document.getElementById("episode").value
     video_id = video_id_map[episode_name]
 
@@ -554,14 +502,15 @@ def on_youtube_frame_api_ready():
         playerVars=ffi.to_js(
             {
                 "cc_load_policy": 1,  # load captions by default
+                "start": int(get_url_start_time()),
             }
         )
     )
     player.addEventListener("onReady", on_ready)
     player.addEventListener("onStateChange", on_state_change)
+    player.addEventListener("onPlaybackRateChange", on_playback_rate_change)
 
 
-@ffi.create_proxy
 def close_modal():
     # remove loading screen
     loading = document.getElementById('loading')
@@ -570,62 +519,188 @@ def close_modal():
     # unhide the app container
     app_container = document.getElementById('app-container')
     app_container.style.opacity = "1"
+    metrics.mark("loading_closed")
+
+
+def schedule_next_update(current_time: float):
+    # next scene boundary or image rotation, whichever comes first
+    wake_time = last_scene_time + bandwidth.tier.rotation
+    if cursor.next_time is not None:
+        wake_time = min(wake_time, cursor.next_time)
+    delay = max(wake_time - current_time, 0) + BOUNDARY_SLACK
+    scheduler.arm(delay, float(player.getPlaybackRate() or 1.0))
+
+
+def on_scheduled_update():
+    metrics.count("ticks")
+    with metrics.timer("tick"):
+        update_speaker()
+        current_time = float(player.getCurrentTime() or 0.0)
+        schedule_next_update(current_time)
+    # a preview's end isn't the episode's, so not before the full timeline
+    if (
+        binge_enabled()
+        and current_time >= timeline.end_time - BINGE_WARMUP_LEAD
+        and timeline not in previews
+    ):
+        warm_next_episode(images=True)
+
+
+scheduler = PlaybackScheduler(on_scheduled_update)
+
+# resolved by on_ready, once the player can take commands
+player_ready = asyncio.get_event_loop().create_future()
 
 
 @ffi.create_proxy
 def on_ready(event):
-    global image_update_interval_id, speaker_update_interval_id
-
     console.log("[pyscript] youtube iframe ready")
+    # time to interactive, measured from navigation start
+    console.log(f"[pyscript] interactive after {js.performance.now():.0f} ms")
+    metrics.mark("player_ready")
+    resize_iframe(event)
+    if not player_ready.done():
+        player_ready.set_result(None)
 
-    if speaker_update_interval_id is None: 
-        speaker_update_interval_id = js.setInterval(update_speaker, SPEAKER_INTERVAL)
-        console.log(f"set speaker interval id: {speaker_update_interval_id}")
 
-    resize_iframe(event)
-    js.setTimeout(close_modal, 1500)
+def mark_playing(current_time: float):
+    global playing_from, stopped_at
+
+    rate = float(player.getPlaybackRate() or 1.0)
+    playing_from = (current_time, metrics.clock(), rate)
+    stopped_at = None
+
+
+def mark_stopped():
+    global playing_from, stopped_at
+
+    # where playback had got to, rather than where the player says it is,
+    # which after a seek is already the new position
+    if playing_from is not None:
+        position, started, rate = playing_from
+        stopped_at = position + (metrics.clock() - started) / 1000 * rate
+        playing_from = None
+
+
+def resumed(current_time: float) -> bool:
+    return (
+        stopped_at is not None
+        and not seek_settler.armed
+        and abs(current_time - stopped_at) <= RESUME_SLACK
+    )
 
 
 @ffi.create_proxy
 def on_state_change(event):
-    global player, last_scene_time
-
+    global buffering_since, playing_from, stopped_at
+
+    state = int(event.data)
+    console.log(f"[pyscript] youtube player state change {state}")
+    scheduler.cancel()
+    if state == 3:
+        if buffering_since is None:
+            buffering_since = metrics.clock()
+    elif buffering_since is not None:
+        if metrics.clock() - buffering_since >= REBUFFER_MS:
+            # the video ran short of bandwidth, so images back off
+            bandwidth.observe_stall()
+        buffering_since = None
     current_time = float(player.getCurrentTime() or 0.0)
-    console.log(f"[pyscript] youtube player state change {event.data}")
-    if int(event.data) in (-1, 1, 5):
-        # update speaker and image when new episode is selected (-1, 5) or the
-        # user jumps to different part of the video (1)
+    if state == 1 and resumed(current_time):
+        # playing on from where it paused or buffered: the scene and the
+        # image downloads are still right, only the timer needs arming
+        metrics.count("resumes")
+        mark_playing(current_time)
         update_speaker()
-        last_scene_time = current_time
-    
+        schedule_next_update(current_time)
+    elif state in (-1, 1, 5):
+        # a new episode was selected (-1, 5) or the user jumped to a different
+        # part of the video (1). Scrubbing fires these in bursts, so only the
+        # position they settle on is resolved.
+        metrics.count("seek_events")
+        playing_from = stopped_at = None
+        seek_settler.trigger()
+    else:
+        mark_stopped()
+        if state == 0 and binge_enabled():
+            asyncio.ensure_future(advance_episode())
+
+
+def on_seek_settled():
+    global cursor, last_scene_time
+
+    if cursor is None:
+        # the player can report its state before the episode has loaded;
+        # main() resolves the position once it has
+        return
+
+    metrics.count("seeks_resolved")
+    current_time = float(player.getCurrentTime() or 0.0)
+    with metrics.timer("scene_lookup"):
+        cursor.seek(current_time)
+    # abort image downloads for the scenes playback moved away from, and
+    # keep the ones the new position still wants
+    prefetcher.reset(timeline.episode_name, cursor, abort_urgent=True)
+    update_speaker(seeked=True)
+    last_scene_time = current_time
+    prefetcher.refresh(timeline.episode_name, cursor)
+
+    # only keep a timer armed while the video is actually playing
+    if int(player.getPlayerState()) == 1:
+        mark_playing(current_time)
+        schedule_next_update(current_time)
+
+
+seek_settler = Debouncer(on_seek_settled, SEEK_SETTLE_MS)
+
+
+@ffi.create_proxy
+def on_playback_rate_change(event):
+    current_time = float(player.getCurrentTime() or 0.0)
+    if playing_from is not None:
+        mark_playing(current_time)
+    if scheduler.armed:
+        schedule_next_update(current_time)
+
 
 @ffi.create_proxy
 def resize_iframe(event):
     container = document.getElementById("image")
-    image = document.getElementById("current-image")
     iframe = document.getElementById("player")
     # set to current width
     iframe.height = container.clientWidth
     container.height = container.clientWidth
-    image.height = container.clientWidth
+    for image in image_swapper.layers:
+        image.height = container.clientWidth
+    # pick the image size to fetch for the new container width
+    image_sizes.resize(container.clientWidth, window.devicePixelRatio)
 
 
 def create_youtube_player():
-    window.onYouTubeIframeAPIReady = on_youtube_frame_api_ready
-
-    # insert iframe_api script
-    tag = document.createElement("script")
-    div = document.getElementById('youtube-player');
-    tag.src = "https://www.youtube.com/iframe_api"
-    div.appendChild(tag)
+    # the iframe api script starts loading from index.html, in parallel with
+    # python startup, so it may well be ready already
+    if getattr(window, "youTubeIframeAPIReady", False):
+        on_youtube_frame_api_ready()
+    else:
+        window.onYouTubeIframeAPIReady = on_youtube_frame_api_ready
 
     # make sure iframe is the same size as the image
     window.addEventListener("resize", resize_iframe)
 
 
+async def load_about():
+    about = document.getElementById("about-contents")
+    try:
+        about.innerHTML = await fetch_text(ABOUT_URL)
+    except OSError as exc:
+        console.log(f"could not load about page: {exc}")
+
+
 def show_about(event):
     about_model = document.getElementById("about")
     about_model.showModal()
+    if not document.getElementById("about-contents").innerHTML:
+        asyncio.ensure_future(load_about())
 
 
 def hide_about(event):
@@ -633,71 +708,334 @@ def hide_about(event):
     about_modal.close()
 
 
-def skip_intro(event):
-    global player
+def seek_past_intro():
+    episode_name = timeline.episode_name
+    start_seconds = catalog[episode_name].intro_end
+    console.log(f"seeking to {start_seconds}")
+    player.seekTo(start_seconds)
 
-    episode_name = document.getElementById("episode").value
-    start_seconds = EPISODE_STARTS[episode_name]
 
-    @ffi.create_proxy
-    def seek():
-        console.log(f"seeking to {start_seconds}")
-        player.seekTo(start_seconds)
+skip_intro_retry = Timeout(seek_past_intro)
 
-    seek()
-    # sometimes the seekTo function doesn't work due to user's prior playback state
-    js.setTimeout(seek, 100)
 
+def skip_intro(event):
+    seek_past_intro()
+    # sometimes the seekTo function doesn't work due to user's prior playback state
+    skip_intro_retry.start(SKIP_INTRO_RETRY_MS)
 
 
 def skip_break(event):
     global player
 
-    episode_name = document.getElementById("episode").value
-    start_seconds = EPISODE_BREAKS[episode_name][1]
+    episode_name = timeline.episode_name
+    start_seconds = catalog[episode_name].episode_break[1]
     player.seekTo(start_seconds)
 
 
+async def load_appearance_index():
+    global appearances
+
+    appearances = await load_appearances(data_cache)
+    if appearances is None:
+        return
+    names = document.getElementById("appearance-name")
+    names.innerHTML = "".join(
+        f'<option value="{html.escape(name)}">'
+        f'{html.escape(name.replace("_", " ").title())}</option>'
+        for name in appearances.names
+    )
+    document.getElementById("appearances").hidden = False
+
+
+def find_appearance(forward: bool):
+    name = document.getElementById("appearance-name").value
+    episode_name = timeline.episode_name
+    if episode_name not in appearances.episode_names:
+        console.log(f"no appearances indexed for {episode_name}")
+        return None
+    current_time = float(player.getCurrentTime() or 0.0)
+    with metrics.timer("appearance_lookup"):
+        if forward:
+            return appearances.next(
+                name, episode_name, current_time + APPEARANCE_SLACK
+            )
+        return appearances.previous(
+            name, episode_name, current_time - APPEARANCE_SLACK
+        )
+
+
+def jump_to_appearance(forward: bool):
+    appearance = find_appearance(forward)
+    if appearance is None:
+        return
+    console.log(f"jumping to {appearance}")
+    metrics.count("appearance_jumps")
+    if appearance.episode_name == timeline.episode_name:
+        player.seekTo(appearance.start_time)
+        return
+    document.getElementById("episode").value = appearance.episode_name
+    set_episode_query_param(appearance.episode_name)
+    asyncio.ensure_future(switch_episode(
+        appearance.episode_name, autoplay=True, start_time=appearance.start_time
+    ))
+
+
+def next_appearance(event):
+    jump_to_appearance(forward=True)
+
+
+def previous_appearance(event):
+    jump_to_appearance(forward=False)
+
+
+def show_download_status(episode_name: str):
+    if episode_name in image_store.downloading:
+        return  # the progress updates have it
+    saved = episode_name in image_store.offline
+    document.getElementById("download-episode").innerHTML = (
+        "Saved offline" if saved else "Download"
+    )
+    document.getElementById("remove-offline").hidden = not saved
+
+
+def show_download_progress(
+    episode_name: str, done: int, failed: int, total: int, full: bool
+):
+    if episode_name != document.getElementById("episode").value:
+        return
+    button = document.getElementById("download-episode")
+    if done + failed < total:
+        button.innerHTML = f"Saving {(done + failed) * 100 // total}%"
+    elif full:
+        # the other offline episodes leave no room for the rest
+        button.innerHTML = f"Storage full, {failed} missing"
+    elif failed:
+        button.innerHTML = f"Saved, {failed} missing"
+    else:
+        button.innerHTML = "Saved offline"
+    document.getElementById("remove-offline").hidden = done + failed < total
+
+
+def on_offline_episodes(episode_names: set[str]):
+    variants.restrict(episode_names, OFFLINE_IMAGE_VARIATIONS)
+    image_sizes.pin(image_store.sizes)
+    show_download_status(document.getElementById("episode").value)
+
+
+image_store = ImageStore(
+    data.image_root, IMAGE_STORE_BYTES, show_download_progress, on_offline_episodes
+)
+
+
+async def start_image_store():
+    await image_store.start()
+    if image_store.available:
+        document.getElementById("download-episode").hidden = False
+
+
+async def download_episode_images(episode_name: str):
+    episode_timeline = await load_data(episode_name)
+    urls = [
+        image_sizes.url(episode_name, scene_name, str(image_num).zfill(2))
+        for scene_name in episode_timeline.image_scenes()
+        for image_num in range(OFFLINE_IMAGE_VARIATIONS)
+    ]
+    storage = getattr(js.navigator, "storage", None)
+    if storage is not None and hasattr(storage, "persist"):
+        # ask the browser not to clear the download under storage pressure
+        await storage.persist()
+    log(f"downloading {len(urls)} images of {episode_name} for offline viewing")
+    metrics.count("offline_downloads")
+    # the episode keeps to this size from now on, see ImageSizes.pin
+    image_store.download(episode_name, urls, image_sizes.size(episode_name))
+
+
+def download_episode(event):
+    episode_name = document.getElementById("episode").value
+    asyncio.ensure_future(download_episode_images(episode_name))
+
+
+def remove_offline_copy(event):
+    episode_name = document.getElementById("episode").value
+    log(f"removing the offline copy of {episode_name}")
+    image_store.remove(episode_name)
+
+
+def render_metrics():
+    output = document.getElementById("data-output-inner")
+    output.innerHTML = metrics.to_html()
+
+
+metrics_refresh = Interval(render_metrics)
+
+
+def export_metrics(event):
+    blob = js.Blob.new([metrics.to_json()], ffi.to_js({"type": "application/json"}))
+    link = document.createElement("a")
+    link.href = js.URL.createObjectURL(blob)
+    link.download = f"critdream-metrics-{int(js.Date.now())}.json"
+    link.click()
+    js.URL.revokeObjectURL(link.href)
+
+
+def show_metrics_panel():
+    document.getElementById("data-output").hidden = False
+    render_metrics()
+    metrics_refresh.start(METRICS_REFRESH_INTERVAL)
+
+
 @ffi.create_proxy
 def update_episode_query_param(event):
+    set_episode_query_param(event.target.value)
+
+
+def set_episode_query_param(episode_name: str):
     current_url = js.URL.new(window.location.href)
     search_params = current_url.searchParams
-    search_params.set("episode", event.target.value)
+    search_params.set("episode", episode_name)
+    # a deep link's start time was for the previous episode
+    search_params.delete("t")
     new_url = f"{current_url.origin}{current_url.pathname}?{search_params.toString()}"
     window.history.pushState(None, "", new_url)
 
 
-def main():
+def binge_enabled() -> bool:
+    return bool(document.getElementById("binge").checked)
+
+
+def save_data() -> bool:
+    # the user asked the browser to keep data usage down
+    connection = getattr(getattr(js, "navigator", None), "connection", None)
+    return bool(getattr(connection, "saveData", False))
+
+
+def warm_next_episode(images: bool):
+    """Load the next episode's scenes and, with ``images``, its first images.
+
+    Runs on every tick near the end of an episode. Repeat calls are cheap,
+    and they keep the warmed images from being evicted before they're
+    shown.
+    """
+    global warmed_episode
+
+    next_name = catalog.next_episode(timeline.episode_name)
+    if next_name is None:
+        return
+    if next_name != warmed_episode:
+        warmed_episode = next_name
+        metrics.count("binge_warmups")
+    future = load_data(next_name)
+    if images and not save_data():
+        future.add_done_callback(lambda f: warm_first_images(next_name, f))
+
+
+def warm_first_images(episode_name: str, future: asyncio.Future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    next_timeline = future.result()
+    # the intro image shows as soon as the video is loaded, and the first
+    # scene's image when the intro is skipped
+    first_scene = next_timeline.position(catalog[episode_name].intro_end)
+    events = [next_timeline[0], next_timeline[first_scene]]
+    prefetcher.warm(episode_name, events[:BINGE_WARMUP_IMAGES])
+
+
+@ffi.create_proxy
+def on_binge_idle(deadline):
+    if binge_enabled():
+        warm_next_episode(images=False)
+
+
+@ffi.create_proxy
+def on_binge_toggle(event):
+    # scene data is small, so fetch it as soon as the browser is idle
+    if binge_enabled() and hasattr(window, "requestIdleCallback"):
+        window.requestIdleCallback(on_binge_idle)
+
+
+async def advance_episode():
+    next_name = catalog.next_episode(timeline.episode_name)
+    if next_name is None:
+        return
+    metrics.count("binge_advances")
+    document.getElementById("episode").value = next_name
+    set_episode_query_param(next_name)
+    await switch_episode(next_name, autoplay=True)
+
+
+async def main():
     console.log("Starting up app...")
-    global df, video_id_map
+    global timeline, cursor, video_id_map, catalog
 
     version = document.getElementById("app-version")
     version.innerHTML = APP_VERSION
 
-    about = document.getElementById("about-contents")
-    about.innerHTML = ABOUT_CONTENTS
+    if get_url_param("metrics"):
+        show_metrics_panel()
+        # also available from the JS console as critdreamMetrics()
+        window.critdreamMetrics = ffi.create_proxy(metrics.to_json)
 
-    video_id_map = load_video_id_map()
-    log(f"video id map {video_id_map}")
+    # image variants are optional, so don't hold up startup for them
+    asyncio.ensure_future(image_sizes.load())
 
-    # load data
+    # load the video id map and the catalog alongside the starting episode.
+    # The built-in catalog has the episodes the app shipped with, so the
+    # published one only holds up an episode newer than those
+    video_ids = asyncio.ensure_future(load_video_id_map(data_cache))
     episode_name_on_start = get_url_episode()
     console.log(f"episode name on start: {episode_name_on_start}")
-    df = load_data(episode_name_on_start or EPISODE_NAMES[0])
-    log(f"data {df.head()}")
+    if episode_name_on_start and episode_name_on_start not in catalog:
+        catalog = await published_catalog
+    if episode_name_on_start not in catalog:
+        episode_name_on_start = catalog.names[0]
+    start_time = get_url_start_time()
+    episode = asyncio.ensure_future(load_timeline(episode_name_on_start, start_time))
 
     # update query parameter whenever episode is selected
     episode_select = document.getElementById("episode")
     episode_select.addEventListener("change", update_episode_query_param)
 
     # set dropdown values and set current episode onchange function
-    set_episode_dropdown()
+    catalog = await published_catalog
+    log(f"catalog: {len(catalog)} episodes")
+    if episode_name_on_start not in catalog:
+        # the published catalog has dropped the built-in start episode
+        episode.cancel()
+        episode_name_on_start = catalog.names[0]
+        episode = asyncio.ensure_future(
+            load_timeline(episode_name_on_start, start_time)
+        )
+    set_episode_dropdown(episode_name_on_start)
     episode_selector = document.getElementById("episode")
     episode_selector.onchange = set_current_episode
+    document.getElementById("binge").addEventListener("change", on_binge_toggle)
 
-    # create youtube player
+    # the player only needs the video id, so create it without waiting for
+    # the episode's scenes
+    video_id_map = await video_ids
+    log(f"video id map: {len(video_id_map)} episodes")
     create_youtube_player()
-    console.log(window)
+
+    timeline = await episode
+    metrics.mark("data_loaded")
+    log(f"data {timeline}")
+    cursor = PlaybackCursor(timeline, start_time)
+    image_store.set_episode(episode_name_on_start)
+    load_data(episode_name_on_start).add_done_callback(
+        lambda future: replace_preview(episode_name_on_start, future)
+    )
+
+    # show the app as soon as the player is usable, then resolve the
+    # starting position to put up the first image
+    await player_ready
+    close_modal()
+    seek_settler.trigger()
+
+    # the starting episode is already loaded, so boot the worker only now
+    # rather than compete with startup for the network and cpu
+    scene_worker.start("./worker.py", "./worker.toml")
+    asyncio.ensure_future(load_appearance_index())
+    asyncio.ensure_future(start_image_store())
 
 
-main()
+asyncio.ensure_future(main())
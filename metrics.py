@@ -0,0 +1,127 @@
+"""Lightweight counters, histograms and startup marks for profiling sessions."""
+
+import html
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable
+
+
+class Histogram:
+    """Running count, sum and extremes, plus a window of recent samples."""
+
+    __slots__ = ("count", "total", "min", "max", "samples")
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        values = sorted(self.samples)
+        return values[min(int(q / 100 * len(values)), len(values) - 1)]
+
+    def summary(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Metrics:
+    """Named counters, histograms, gauges and one-off marks.
+
+    ``clock`` returns milliseconds; marks are recorded against it, so in the
+    browser pass ``performance.now`` to get times since navigation start.
+    """
+
+    def __init__(self, clock: Callable[[], float] | None = None):
+        self.clock = clock or (lambda: time.perf_counter() * 1000)
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.marks: dict[str, float] = {}
+        self.gauges: dict[str, Callable[[], object]] = {}
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value: float):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].observe(value)
+
+    def mark(self, name: str):
+        """Record the first time ``name`` happened."""
+        if name not in self.marks:
+            self.marks[name] = self.clock()
+
+    def gauge(self, name: str, read: Callable[[], object]):
+        self.gauges[name] = read
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self) -> dict:
+        return {
+            "marks_ms": dict(self.marks),
+            "counters": dict(self.counters),
+            "gauges": {name: read() for name, read in self.gauges.items()},
+            "histograms_ms": {
+                name: histogram.summary()
+                for name, histogram in self.histograms.items()
+            },
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_html(self) -> str:
+        snapshot = self.snapshot()
+        rows = []
+
+        def row(name, value):
+            # names and values can come from the data, so neither is markup
+            rows.append(
+                f"<tr><td>{html.escape(str(name))}</td>"
+                f"<td>{html.escape(str(value))}</td></tr>"
+            )
+
+        for name, value in snapshot["marks_ms"].items():
+            row(name, f"{value:.0f} ms")
+        for name, value in [*snapshot["counters"].items(), *snapshot["gauges"].items()]:
+            if isinstance(value, float):
+                value = f"{value:.3f}"
+            row(name, value)
+        for name, summary in snapshot["histograms_ms"].items():
+            if not summary["count"]:
+                continue
+            row(
+                name,
+                f"n={summary['count']} p50={summary['p50']:.2f} "
+                f"p95={summary['p95']:.2f} max={summary['max']:.2f} ms",
+            )
+        return f"<table id=\"metrics\">{''.join(rows)}</table>"
@@ -0,0 +1,86 @@
+"""Per-scene image packs: every variant of a scene in a single file.
+
+Packs are written offline by tools/build_image_packs.py, one per scene,
+width and format, so a scene's images arrive in one request and rotating
+between them needs no further downloads.
+
+All fields are little-endian. A 12 byte header is followed by the uint16
+image numbers, padded to 4 bytes, then uint32 offsets of each image,
+relative to the end of the index, with one past the last image at the
+end. The images themselves follow, back to back, in the same order.
+"""
+
+import struct
+import sys
+from array import array
+from typing import Iterable
+
+
+PACK_MAGIC = b"CDIP"
+PACK_VERSION = 1
+# magic, version, number of images, size of header and index
+PACK_HEADER = struct.Struct("<4sHHI")
+
+
+def encode_pack_index(images: Iterable[tuple[int, int]]) -> bytes:
+    """Header and index for (image number, size in bytes) pairs."""
+    numbers = array("H")
+    offsets = array("I", [0])
+    for image_num, size in images:
+        numbers.append(image_num)
+        offsets.append(offsets[-1] + size)
+    if sys.byteorder != "little":
+        numbers.byteswap()
+        offsets.byteswap()
+    index = numbers.tobytes()
+    index += b"\0" * (-len(index) % 4) + offsets.tobytes()
+    header = PACK_HEADER.pack(
+        PACK_MAGIC, PACK_VERSION, len(numbers), PACK_HEADER.size + len(index)
+    )
+    return header + index
+
+
+def encode_pack(images: Iterable[tuple[int, bytes]]) -> bytes:
+    images = list(images)
+    index = encode_pack_index((image_num, len(data)) for image_num, data in images)
+    return b"".join([index, *(data for _, data in images)])
+
+
+def pack_index_size(header: bytes | memoryview) -> int:
+    """Bytes to read from the start of a pack to parse its index."""
+    magic, version, _, index_size = PACK_HEADER.unpack_from(header)
+    if magic != PACK_MAGIC:
+        raise ValueError("not an image pack")
+    if version != PACK_VERSION:
+        raise ValueError(f"unsupported image pack version {version}")
+    return index_size
+
+
+class PackIndex:
+    """Where each image is in a pack, as (start, end) byte offsets from the
+    start of the pack, keyed by zero-padded image number.
+
+    Only the header and index are needed, see ``pack_index_size``.
+    """
+
+    def __init__(self, buffer: bytes | memoryview):
+        view = memoryview(buffer)
+        index_size = pack_index_size(view)
+        n_images = PACK_HEADER.unpack_from(view)[2]
+        offset = PACK_HEADER.size
+        numbers = array("H")
+        numbers.frombytes(view[offset:offset + 2 * n_images])
+        offset += 2 * n_images
+        offset += -offset % 4
+        offsets = array("I")
+        offsets.frombytes(view[offset:offset + 4 * (n_images + 1)])
+        if sys.byteorder != "little":
+            numbers.byteswap()
+            offsets.byteswap()
+        self.images = {
+            str(image_num).zfill(2): (index_size + start, index_size + end)
+            for image_num, start, end in zip(numbers, offsets, offsets[1:])
+        }
+
+    def __len__(self) -> int:
+        return len(self.images)
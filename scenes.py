@@ -0,0 +1,962 @@
+"""Scene lookup structures for a single episode, and across episodes."""
+
+import csv
+import io
+import math
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import cached_property
+from typing import Iterable, Iterator, NamedTuple
+
+
+ENVIRONMENT = "environment"
+
+SPEAKER_MAP = {
+    "travis": "fjord",
+    "marisha": "beau",
+    "laura": "jester",
+    "taliesin": {"characters": ["mollymauk", "caduceus"], "episode_cutoff": 26},
+    "ashley": "yasha",
+    "sam": {"characters": ["nott", "veth"], "episode_cutoff": 97},
+    "liam": "caleb",
+}
+
+
+class Scene(NamedTuple):
+    scene_id: int
+    scene_name: str
+    speaker: str
+    character: str
+    start_time: float
+    end_time: float
+    mid_point: float
+
+
+def scene_name(scene_id: int) -> str:
+    return "scene_" + str(scene_id).zfill(3)
+
+
+def make_scene(
+    scene_id: int,
+    speaker: str,
+    character: str,
+    start_time: float,
+    end_time: float,
+) -> Scene:
+    start_time, end_time = float(start_time), float(end_time)
+    mid = (end_time - start_time) / 2
+    return Scene(
+        int(scene_id),
+        scene_name(scene_id),
+        speaker,
+        character,
+        start_time,
+        end_time,
+        start_time + mid,
+    )
+
+
+def episode_number(episode_name: str) -> int:
+    return int(episode_name.split("e")[1])
+
+
+def map_character(episode_num: int, character: str):
+    """The character a player's name stands for in an episode: the first of
+    a player's characters up to and including the episode cutoff, the
+    second after it."""
+    _char = character.lower()
+    if _char in SPEAKER_MAP:
+        _char = SPEAKER_MAP[_char]
+        if isinstance(_char, dict):
+            if episode_num <= _char["episode_cutoff"]:
+                _char = _char["characters"][0]
+            else:
+                _char = _char["characters"][1]
+        return _char
+    return character
+
+
+class SceneTable:
+    """Array-backed scene columns, a lightweight stand-in for a DataFrame.
+
+    Only what the app needs from the aligned scene CSVs is kept: scene ids
+    and times in typed arrays, and interned speaker and character strings.
+    """
+
+    __slots__ = ("scene_id", "speaker", "character", "start_time", "end_time")
+
+    def __init__(self):
+        self.scene_id = array("i")
+        self.speaker: list[str] = []
+        self.character: list[str] = []
+        self.start_time = array("d")
+        self.end_time = array("d")
+
+    @classmethod
+    def from_csv(cls, text: str, episode_name: str | None = None) -> "SceneTable":
+        table = cls()
+        for row in csv.DictReader(io.StringIO(text)):
+            if episode_name is not None and row["episode_name"] != episode_name:
+                continue
+            table.append(
+                int(row["scene_id"]),
+                row["speaker"],
+                row["character"],
+                float(row["start"]),
+                float(row["end"]),
+            )
+        return table
+
+    def __len__(self) -> int:
+        return len(self.scene_id)
+
+    def append(
+        self,
+        scene_id: int,
+        speaker: str,
+        character: str,
+        start_time: float,
+        end_time: float,
+    ):
+        self.scene_id.append(scene_id)
+        self.speaker.append(sys.intern(speaker))
+        self.character.append(sys.intern(character))
+        self.start_time.append(start_time)
+        self.end_time.append(end_time)
+
+    def filter(self, **equals) -> "SceneTable":
+        table = SceneTable()
+        columns = [(getattr(self, name), value) for name, value in equals.items()]
+        for i in range(len(self)):
+            if all(column[i] == value for column, value in columns):
+                table.append(*self.row(i))
+        return table
+
+    def row(self, i: int) -> tuple[int, str, str, float, float]:
+        return (
+            self.scene_id[i],
+            self.speaker[i],
+            self.character[i],
+            self.start_time[i],
+            self.end_time[i],
+        )
+
+    def scenes(self) -> Iterator[Scene]:
+        for i in range(len(self)):
+            yield make_scene(*self.row(i))
+
+
+def read_video_id_map(text: str) -> dict[str, str]:
+    return {
+        row["episode_name"]: row["youtube_id"]
+        for row in csv.DictReader(io.StringIO(text))
+    }
+
+
+class SceneStream:
+    """Parses aligned scene CSV rows into a SceneTable as bytes arrive.
+
+    Only complete lines are parsed; a partial last line is held until the
+    next chunk or ``close``. A read that starts partway into the file has to
+    be given the file's ``header`` line first.
+    """
+
+    def __init__(self, episode_name: str | None = None, header: bytes = b""):
+        self.table = SceneTable()
+        self.episode_name = episode_name
+        self._columns: dict[str, int] | None = None
+        self._pending = b""
+        if header:
+            self.feed(header)
+
+    def feed(self, chunk: bytes):
+        lines = (self._pending + chunk).split(b"\n")
+        self._pending = lines.pop()
+        self._parse(lines)
+
+    def close(self):
+        self._parse([self._pending])
+        self._pending = b""
+
+    def _parse(self, lines: list[bytes]):
+        rows = csv.reader(line.decode() for line in lines if line.strip())
+        if self._columns is None:
+            header = next(rows, None)
+            if header is None:
+                return
+            self._columns = {name: i for i, name in enumerate(header)}
+        columns = self._columns
+        episode, scene_id, speaker, character, start, end = (
+            columns["episode_name"],
+            columns["scene_id"],
+            columns["speaker"],
+            columns["character"],
+            columns["start"],
+            columns["end"],
+        )
+        for row in rows:
+            if self.episode_name is not None and row[episode] != self.episode_name:
+                continue
+            self.table.append(
+                int(row[scene_id]),
+                row[speaker],
+                row[character],
+                float(row[start]),
+                float(row[end]),
+            )
+
+
+# rows between the checkpoints of an episode's csv offset index
+SCENE_OFFSET_ROWS = 64
+
+
+def csv_offsets(data: bytes, every: int = SCENE_OFFSET_ROWS) -> list[tuple[float, int]]:
+    """(start time, byte offset) of every ``every``-th row of a scene CSV.
+
+    The first checkpoint is the first row, so its offset is also the length
+    of the header. Empty if the rows aren't in start time order, since the
+    offsets couldn't be searched by time.
+    """
+    header_end = data.index(b"\n") + 1
+    start = next(csv.reader([data[:header_end].decode()])).index("start")
+    offsets = []
+    row = 0
+    last_time = -math.inf
+    position = header_end
+    while position < len(data):
+        line_end = data.find(b"\n", position)
+        line_end = len(data) if line_end == -1 else line_end + 1
+        line = data[position:line_end]
+        if line.strip():
+            start_time = float(next(csv.reader([line.decode()]))[start])
+            if start_time < last_time:
+                return []
+            last_time = start_time
+            if row % every == 0:
+                offsets.append((start_time, position))
+            row += 1
+        position = line_end
+    return offsets
+
+
+# Compact per-episode bundle, written offline by tools/build_bundle.py.
+#
+# All fields are little-endian. After a 32 byte header come the fixed-width
+# columns: uint32 scene ids, float32 start/end/mid times, then uint16 codes
+# into the string table for speaker, character and scene name. The string
+# table is uint32 offsets followed by the utf-8 bytes; entry 0 is the
+# episode name.
+BUNDLE_MAGIC = b"CDSB"
+BUNDLE_VERSION = 1
+_BUNDLE_HEADER = struct.Struct("<4sHHIIfff4x")
+
+
+def encode_bundle(
+    episode_name: str,
+    table: SceneTable,
+    intro_end: float,
+    episode_break: tuple[float, float],
+) -> bytes:
+    strings = {episode_name: 0}
+
+    def code(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    scenes = list(table.scenes())
+    speakers = array("H", (code(s.speaker) for s in scenes))
+    characters = array("H", (code(s.character) for s in scenes))
+    names = array("H", (code(s.scene_name) for s in scenes))
+
+    header = _BUNDLE_HEADER.pack(
+        BUNDLE_MAGIC,
+        BUNDLE_VERSION,
+        0,
+        len(scenes),
+        len(strings),
+        intro_end,
+        *episode_break,
+    )
+    columns = [
+        array("I", (s.scene_id for s in scenes)),
+        array("f", (s.start_time for s in scenes)),
+        array("f", (s.end_time for s in scenes)),
+        array("f", (s.mid_point for s in scenes)),
+        speakers,
+        characters,
+        names,
+    ]
+    return _pack(header, columns, strings)
+
+
+def _pack(header: bytes, columns: list[array], strings: Iterable[str]) -> bytes:
+    """Header, little-endian columns padded to 4 bytes, then a string table."""
+    encoded = [value.encode() for value in strings]
+    offsets = array("I", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    if sys.byteorder != "little":
+        for column in [*columns, offsets]:
+            column.byteswap()
+
+    body = b"".join(column.tobytes() for column in columns)
+    body += b"\0" * (-len(body) % 4)
+    return b"".join([header, body, offsets.tobytes(), *encoded])
+
+
+class _Unpacker:
+    """Reads the columns and string table written by ``_pack``, in order."""
+
+    def __init__(self, view: memoryview, offset: int):
+        self.view = view
+        self.offset = offset
+
+    def column(self, fmt: str, n: int):
+        size = n * struct.calcsize(fmt)
+        data = self.view[self.offset:self.offset + size]
+        self.offset += size
+        if sys.byteorder == "little":
+            return data.cast(fmt)
+        swapped = array(fmt, data)
+        swapped.byteswap()
+        return swapped
+
+    def strings(self, n: int) -> list[str]:
+        self.offset += -self.offset % 4
+        offsets = self.column("I", n + 1)
+        data = self.view[self.offset:]
+        return [
+            sys.intern(str(data[start:end], "utf-8"))
+            for start, end in zip(offsets, offsets[1:])
+        ]
+
+
+class SceneBundle:
+    """Read-only view over an encoded episode bundle.
+
+    Columns are memoryviews cast straight over the fetched buffer, so the
+    only decoding work is the (small) string table.
+    """
+
+    def __init__(self, buffer: bytes | memoryview):
+        view = memoryview(buffer)
+        (
+            magic,
+            version,
+            _,
+            n_scenes,
+            n_strings,
+            self.intro_end,
+            break_start,
+            break_end,
+        ) = _BUNDLE_HEADER.unpack_from(view)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError("not a scene bundle")
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"unsupported scene bundle version {version}")
+        self.episode_break = (break_start, break_end)
+
+        unpacker = _Unpacker(view, _BUNDLE_HEADER.size)
+        self.scene_id = unpacker.column("I", n_scenes)
+        self.start_time = unpacker.column("f", n_scenes)
+        self.end_time = unpacker.column("f", n_scenes)
+        self.mid_point = unpacker.column("f", n_scenes)
+        self.speaker = unpacker.column("H", n_scenes)
+        self.character = unpacker.column("H", n_scenes)
+        self.scene_name = unpacker.column("H", n_scenes)
+        self.strings = unpacker.strings(n_strings)
+        self.episode_name = self.strings[0]
+
+    def __len__(self) -> int:
+        return len(self.scene_id)
+
+    def scenes(self) -> Iterator[Scene]:
+        strings = self.strings
+        for i in range(len(self)):
+            yield Scene(
+                self.scene_id[i],
+                strings[self.scene_name[i]],
+                strings[self.speaker[i]],
+                strings[self.character[i]],
+                self.start_time[i],
+                self.end_time[i],
+                self.mid_point[i],
+            )
+
+
+# Timelines are compiled by the scene worker and handed to the page encoded
+# the same way as bundles: a 24 byte header, then float32 event times,
+# uint32 scene ids and uint16 string codes for the image scene name, speaker
+# and character.
+TIMELINE_MAGIC = b"CDTL"
+TIMELINE_VERSION = 2
+_TIMELINE_HEADER = struct.Struct("<4sHHIId")
+
+
+class TimelineEvent(NamedTuple):
+    time: float
+    scene_id: int
+    # image scene, i.e. the scene resolved with the speaker and character
+    # filters that update_image applies
+    scene_name: str
+    speaker: str
+    character: str
+
+
+class _Partition:
+    """Scenes sorted by start time, with a sorted mid-point view."""
+
+    __slots__ = ("scenes", "starts", "max_ends", "mids", "by_mid", "environment")
+
+    def __init__(self, scenes: list[Scene]):
+        self.scenes = sorted(scenes, key=lambda s: (s.start_time, s.end_time))
+        self.starts = [s.start_time for s in self.scenes]
+
+        # running maximum of end times, so that a backwards scan for an
+        # overlapping scene can stop as soon as nothing earlier can reach t
+        self.max_ends = []
+        max_end = float("-inf")
+        for s in self.scenes:
+            max_end = max(max_end, s.end_time)
+            self.max_ends.append(max_end)
+
+        self.by_mid = sorted(self.scenes, key=lambda s: s.mid_point)
+        self.mids = [s.mid_point for s in self.by_mid]
+        self.environment = None
+
+    @property
+    def start_time(self) -> float:
+        return self.starts[0]
+
+    @property
+    def end_time(self) -> float:
+        return self.max_ends[-1]
+
+    def boundaries(self) -> list[float]:
+        """Times at which a lookup against this partition can change answer."""
+        times = [t for s in self.scenes for t in (s.start_time, s.end_time)]
+        times.extend((a + b) / 2 for a, b in zip(self.mids, self.mids[1:]))
+        return times
+
+    def scene_at(self, t: float) -> Scene | None:
+        # among the scenes covering t, prefer the one that started most recently
+        i = bisect_right(self.starts, t) - 1
+        while i >= 0 and self.max_ends[i] >= t:
+            scene = self.scenes[i]
+            if scene.end_time >= t:
+                return scene
+            i -= 1
+        return None
+
+    def closest(self, t: float) -> Scene:
+        i = bisect_left(self.mids, t)
+        if i == 0:
+            return self.by_mid[0]
+        if i == len(self.mids):
+            return self.by_mid[-1]
+        before, after = self.by_mid[i - 1], self.by_mid[i]
+        if t - before.mid_point <= after.mid_point - t:
+            return before
+        return after
+
+
+class SceneIndex:
+    """Per-episode interval index answering scene lookups in O(log n).
+
+    Scenes are partitioned by speaker, by character and by (speaker,
+    character) so that the filtered lookups done in ``update_image`` never
+    have to touch the rest of the episode.
+    """
+
+    def __init__(
+        self,
+        episode_name: str,
+        scenes: Iterable[Scene],
+        intro_end: float,
+        episode_break: tuple[float, float],
+    ):
+        self.episode_name = episode_name
+        self.episode_num = episode_number(episode_name)
+        self.intro_end = intro_end
+        self.episode_break = episode_break
+
+        groups: dict[tuple, list[Scene]] = {}
+        for scene in scenes:
+            for key in (
+                (None, None),
+                (scene.speaker, None),
+                (None, scene.character),
+                (scene.speaker, scene.character),
+            ):
+                groups.setdefault(key, []).append(scene)
+
+        self.partitions = {key: _Partition(group) for key, group in groups.items()}
+        # environment scenes within each filter, falling back to the episode's
+        # environment scenes when the filter excludes all of them
+        for (speaker, character), partition in self.partitions.items():
+            if character == ENVIRONMENT:
+                partition.environment = partition
+            else:
+                partition.environment = self.partitions.get(
+                    (speaker, ENVIRONMENT), self.partitions.get((None, ENVIRONMENT))
+                )
+
+    def __len__(self) -> int:
+        return len(self.partitions[(None, None)].scenes)
+
+    def __repr__(self) -> str:
+        full = self.partitions[(None, None)]
+        return (
+            f"SceneIndex(episode_name={self.episode_name!r}, scenes={len(self)}, "
+            f"start_time={full.start_time}, end_time={full.end_time})"
+        )
+
+    @property
+    def scenes(self) -> list[Scene]:
+        return self.partitions[(None, None)].scenes
+
+    def partition(
+        self,
+        speaker: str | None = None,
+        character: str | None = None,
+    ) -> _Partition:
+        if character:
+            character = map_character(self.episode_num, character)
+        key = (speaker or None, character or None)
+        # fall back to progressively looser filters if the combination has
+        # no scenes in this episode
+        for fallback in (key, (None, key[1]), (key[0], None), (None, None)):
+            if fallback in self.partitions:
+                return self.partitions[fallback]
+        raise KeyError(key)
+
+    def scene_at(self, t: float, **filters) -> Scene | None:
+        return self.partition(**filters).scene_at(t)
+
+    def closest_scene(self, t: float, **filters) -> Scene:
+        return self.partition(**filters).closest(t)
+
+    def closest_environment_scene(self, t: float, **filters) -> Scene:
+        partition = self.partition(**filters)
+        return (partition.environment or partition).closest(t)
+
+    def find_scene(
+        self,
+        current_time: float,
+        speaker: str | None = None,
+        character: str | None = None,
+    ) -> Scene:
+        partition = self.partition(speaker=speaker, character=character)
+        environment = partition.environment or partition
+
+        current_time = min(current_time, partition.end_time)
+        current_time = max(current_time, partition.start_time)
+
+        break_start, break_end = self.episode_break
+        if current_time <= self.intro_end:
+            return environment.closest(current_time)
+        elif break_start <= current_time <= break_end:
+            # during the mid-episode break, show an environment image from the intro
+            return environment.closest(0)
+
+        scene = partition.scene_at(current_time)
+        if scene is not None:
+            return scene
+
+        # otherwise find the closest scene to the timestamp
+        return partition.closest(current_time)
+
+    @cached_property
+    def timeline(self) -> "Timeline":
+        return Timeline.compile(self)
+
+
+class Timeline:
+    """Flat, ordered playback events for an episode.
+
+    ``find_scene`` is piecewise constant in time: it can only change answer
+    at a scene start or end, halfway between two neighbouring mid-points,
+    or at the intro and break edges. Evaluating it once per piece gives the
+    full sequence of (time, scene, image scene) events for the episode.
+
+    Events are stored as narrow columns and only built into
+    ``TimelineEvent`` tuples when indexed, so a loaded episode stays small.
+    """
+
+    def __init__(
+        self,
+        times,
+        scene_ids,
+        scene_names,
+        speakers,
+        characters,
+        strings: list[str],
+        end_time: float = 0.0,
+    ):
+        # float32 times, uint32 scene ids and uint16 codes into ``strings``,
+        # either arrays or memoryviews over a decoded buffer
+        self.times = times
+        self.scene_ids = scene_ids
+        self.scene_names = scene_names
+        self.speakers = speakers
+        self.characters = characters
+        self.strings = strings
+        self.episode_name = strings[0]
+        self.end_time = end_time
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, i: int) -> TimelineEvent:
+        strings = self.strings
+        return TimelineEvent(
+            self.times[i],
+            self.scene_ids[i],
+            strings[self.scene_names[i]],
+            strings[self.speakers[i]],
+            strings[self.characters[i]],
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Timeline(episode_name={self.episode_name!r}, events={len(self)}, "
+            f"end_time={self.end_time})"
+        )
+
+    def image_scenes(self) -> list[str]:
+        """Every scene an image is shown for, in order of first appearance."""
+        strings = self.strings
+        return [*dict.fromkeys(strings[code] for code in self.scene_names)]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns and the string table."""
+        columns = (
+            self.times, self.scene_ids, self.scene_names, self.speakers, self.characters
+        )
+        return sum(memoryview(column).nbytes for column in columns) + sum(
+            sys.getsizeof(value) for value in self.strings
+        )
+
+    @classmethod
+    def from_events(
+        cls,
+        events: list[TimelineEvent],
+        episode_name: str,
+        end_time: float,
+    ) -> "Timeline":
+        strings = {episode_name: 0}
+
+        def code(value: str) -> int:
+            return strings.setdefault(value, len(strings))
+
+        return cls(
+            array("f", (e.time for e in events)),
+            array("I", (e.scene_id for e in events)),
+            array("H", (code(e.scene_name) for e in events)),
+            array("H", (code(e.speaker) for e in events)),
+            array("H", (code(e.character) for e in events)),
+            [*strings],
+            end_time=end_time,
+        )
+
+    @classmethod
+    def compile(cls, index: SceneIndex) -> "Timeline":
+        boundaries = {index.intro_end, *index.episode_break}
+        for partition in index.partitions.values():
+            boundaries.update(partition.boundaries())
+        boundaries = sorted(boundaries)
+
+        # sample each piece at its midpoint, plus one sample before the
+        # first boundary and one after the last
+        samples = [boundaries[0] - 1]
+        samples.extend((a + b) / 2 for a, b in zip(boundaries, boundaries[1:]))
+        samples.append(boundaries[-1] + 1)
+        starts = [0.0, *boundaries]
+
+        events: list[TimelineEvent] = []
+        for start, sample in zip(starts, samples):
+            scene = index.find_scene(sample)
+            image_scene = index.find_scene(
+                sample, speaker=scene.speaker, character=scene.character
+            )
+            event = TimelineEvent(
+                float(max(start, 0.0)),
+                scene.scene_id,
+                image_scene.scene_name,
+                scene.speaker,
+                scene.character,
+            )
+            if events and events[-1][1:] == event[1:]:
+                continue
+            if events and events[-1].time == event.time:
+                events[-1] = event
+                continue
+            events.append(event)
+        return cls.from_events(
+            events,
+            episode_name=index.episode_name,
+            end_time=index.partitions[(None, None)].end_time,
+        )
+
+    def to_bytes(self) -> bytes:
+        """Encode as columns, for handing the timeline between threads."""
+        columns = [
+            array("f", self.times),
+            array("I", self.scene_ids),
+            array("H", self.scene_names),
+            array("H", self.speakers),
+            array("H", self.characters),
+        ]
+        header = _TIMELINE_HEADER.pack(
+            TIMELINE_MAGIC,
+            TIMELINE_VERSION,
+            0,
+            len(self),
+            len(self.strings),
+            self.end_time,
+        )
+        return _pack(header, columns, self.strings)
+
+    @classmethod
+    def from_bytes(cls, buffer: bytes | memoryview) -> "Timeline":
+        """Decode without copying: the columns are views over ``buffer``."""
+        view = memoryview(buffer)
+        magic, version, _, n_events, n_strings, end_time = (
+            _TIMELINE_HEADER.unpack_from(view)
+        )
+        if magic != TIMELINE_MAGIC:
+            raise ValueError("not an encoded timeline")
+        if version != TIMELINE_VERSION:
+            raise ValueError(f"unsupported timeline version {version}")
+
+        unpacker = _Unpacker(view, _TIMELINE_HEADER.size)
+        return cls(
+            unpacker.column("f", n_events),
+            unpacker.column("I", n_events),
+            unpacker.column("H", n_events),
+            unpacker.column("H", n_events),
+            unpacker.column("H", n_events),
+            unpacker.strings(n_strings),
+            end_time=end_time,
+        )
+
+    def position(self, t: float) -> int:
+        return max(bisect_right(self.times, t) - 1, 0)
+
+    def upcoming(self, position: int, n: int) -> list[TimelineEvent]:
+        return [self[i] for i in range(position + 1, min(position + 1 + n, len(self)))]
+
+
+class PlaybackCursor:
+    """Position in a timeline that advances with playback.
+
+    Normal playback only ever moves forward by a step or two between ticks,
+    so ``advance`` walks the timeline; anything else re-seeks with a bisect.
+    """
+
+    MAX_WALK = 4
+
+    def __init__(self, timeline: Timeline, t: float = 0.0):
+        self.timeline = timeline
+        self.position = timeline.position(t)
+
+    @property
+    def event(self) -> TimelineEvent:
+        return self.timeline[self.position]
+
+    @property
+    def next_time(self) -> float | None:
+        """Time of the next event, or None at the end of the episode."""
+        if self.position + 1 < len(self.timeline):
+            return self.timeline.times[self.position + 1]
+        return None
+
+    def seek(self, t: float) -> TimelineEvent:
+        self.position = self.timeline.position(t)
+        return self.event
+
+    def advance(self, t: float) -> TimelineEvent:
+        times = self.timeline.times
+        position = self.position
+        if t < times[position]:
+            return self.seek(t)
+        for _ in range(self.MAX_WALK):
+            if position + 1 < len(times) and times[position + 1] <= t:
+                position += 1
+            else:
+                self.position = position
+                return self.event
+        return self.seek(t)
+
+    def upcoming(self, n: int) -> list[TimelineEvent]:
+        return self.timeline.upcoming(self.position, n)
+
+
+# Cross-episode appearance index, written offline by
+# tools/build_appearances.py.
+#
+# After a 20 byte header come the uint32 offsets of each name's first
+# posting (plus a closing offset), the postings' float32 start times, then
+# uint16 codes for the names, and for each posting its episode and scene
+# name. A name's postings are ordered by episode, in catalog order, then by
+# time. The string table starts with the episode names in catalog order, so
+# an episode's code is also its position.
+APPEARANCES_MAGIC = b"CDAP"
+APPEARANCES_VERSION = 1
+_APPEARANCES_HEADER = struct.Struct("<4sHHIII")
+
+# a character's scenes closer together than this are one appearance
+APPEARANCE_GAP = 60.0
+
+
+class Appearance(NamedTuple):
+    episode_name: str
+    start_time: float
+    scene_name: str
+
+
+def encode_appearances(
+    episodes: Iterable[tuple[str, Iterable[Scene]]],
+    gap: float = APPEARANCE_GAP,
+) -> bytes:
+    """Index where every character and speaker appears.
+
+    ``episodes`` are (episode name, scenes) pairs in catalog order. Names are
+    resolved with ``map_character``, the same way the scene filters are, and
+    a name's scenes that are less than ``gap`` seconds apart count as a
+    single appearance, starting with the first of them.
+    """
+    episode_names = []
+    postings: dict[str, list[tuple[int, float, str]]] = {}
+    for episode_name, scenes in episodes:
+        episode = len(episode_names)
+        episode_names.append(episode_name)
+        episode_num = episode_number(episode_name)
+        last_end: dict[str, float] = {}
+        for scene in sorted(scenes, key=lambda scene: scene.start_time):
+            names = {
+                map_character(episode_num, scene.character),
+                map_character(episode_num, scene.speaker),
+            }
+            names.discard(ENVIRONMENT)
+            for name in names:
+                end = last_end.get(name, -math.inf)
+                if scene.start_time - end > gap:
+                    postings.setdefault(name, []).append(
+                        (episode, scene.start_time, scene.scene_name)
+                    )
+                last_end[name] = max(end, scene.end_time)
+
+    strings = {episode_name: i for i, episode_name in enumerate(episode_names)}
+
+    def code(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    names = sorted(postings)
+    offsets = array("I", [0])
+    times = array("f")
+    episode_codes = array("H")
+    scene_names = array("H")
+    for name in names:
+        for episode, start_time, scene_name in postings[name]:
+            times.append(start_time)
+            episode_codes.append(episode)
+            scene_names.append(code(scene_name))
+        offsets.append(len(times))
+
+    columns = [
+        offsets,
+        times,
+        array("H", (code(name) for name in names)),
+        episode_codes,
+        scene_names,
+    ]
+    header = _APPEARANCES_HEADER.pack(
+        APPEARANCES_MAGIC,
+        APPEARANCES_VERSION,
+        len(episode_names),
+        len(names),
+        len(times),
+        len(strings),
+    )
+    return _pack(header, columns, strings)
+
+
+class AppearanceIndex:
+    """Read-only view over an encoded appearance index.
+
+    Finding the next or previous appearance is a bisect over one name's
+    postings, so it never needs an episode's scenes to be loaded, and stays
+    cheap however many episodes are indexed. Names and episodes that aren't
+    in the index raise KeyError.
+    """
+
+    def __init__(self, buffer: bytes | memoryview):
+        view = memoryview(buffer)
+        magic, version, n_episodes, n_names, n_postings, n_strings = (
+            _APPEARANCES_HEADER.unpack_from(view)
+        )
+        if magic != APPEARANCES_MAGIC:
+            raise ValueError("not an appearance index")
+        if version != APPEARANCES_VERSION:
+            raise ValueError(f"unsupported appearance index version {version}")
+
+        unpacker = _Unpacker(view, _APPEARANCES_HEADER.size)
+        self.offsets = unpacker.column("I", n_names + 1)
+        self.times = unpacker.column("f", n_postings)
+        names = unpacker.column("H", n_names)
+        self.episodes = unpacker.column("H", n_postings)
+        self.scene_names = unpacker.column("H", n_postings)
+        self.strings = unpacker.strings(n_strings)
+        self.episode_names = self.strings[:n_episodes]
+        self._episode_codes = {
+            episode_name: i for i, episode_name in enumerate(self.episode_names)
+        }
+        self._names = {self.strings[name]: i for i, name in enumerate(names)}
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._names)
+
+    def count(self, name: str) -> int:
+        lo, hi = self._bounds(name)
+        return hi - lo
+
+    def _bounds(self, name: str) -> tuple[int, int]:
+        i = self._names[name]
+        return self.offsets[i], self.offsets[i + 1]
+
+    def _sort_key(self, i: int) -> tuple[int, float]:
+        return self.episodes[i], self.times[i]
+
+    def _posting(self, i: int) -> Appearance:
+        return Appearance(
+            self.strings[self.episodes[i]],
+            self.times[i],
+            self.strings[self.scene_names[i]],
+        )
+
+    def next(self, name: str, episode_name: str, t: float) -> Appearance | None:
+        """The first appearance of ``name`` after ``t`` in the episode, or in
+        a later one; None if there isn't one."""
+        lo, hi = self._bounds(name)
+        key = (self._episode_codes[episode_name], t)
+        i = bisect_right(range(hi), key, lo, hi, key=self._sort_key)
+        return self._posting(i) if i < hi else None
+
+    def previous(self, name: str, episode_name: str, t: float) -> Appearance | None:
+        """The last appearance of ``name`` before ``t`` in the episode, or in
+        an earlier one; None if there isn't one."""
+        lo, hi = self._bounds(name)
+        key = (self._episode_codes[episode_name], t)
+        i = bisect_left(range(hi), key, lo, hi, key=self._sort_key)
+        return self._posting(i - 1) if i > lo else None
@@ -0,0 +1,87 @@
+"""Timers driven by the player's state and the episode timeline."""
+
+import js
+from pyscript import ffi
+
+
+class Timeout:
+    """A single re-armable timeout.
+
+    Arming again replaces the pending timeout, and one proxy is created up
+    front and reused for every timeout.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.timeout_id = None
+        self._on_timeout = ffi.create_proxy(self._fire)
+
+    @property
+    def armed(self) -> bool:
+        return self.timeout_id is not None
+
+    def start(self, delay_ms: int):
+        self.cancel()
+        self.timeout_id = js.setTimeout(self._on_timeout, delay_ms)
+
+    def cancel(self):
+        if self.timeout_id is not None:
+            js.clearTimeout(self.timeout_id)
+            self.timeout_id = None
+
+    def _fire(self):
+        self.timeout_id = None
+        self.callback()
+
+
+class Interval:
+    """A repeating timer that can be stopped and restarted.
+
+    Like ``Timeout``, one proxy serves every start, and starting again
+    replaces the running interval rather than adding a second one.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.interval_id = None
+        self._on_interval = ffi.create_proxy(callback)
+
+    @property
+    def running(self) -> bool:
+        return self.interval_id is not None
+
+    def start(self, interval_ms: int):
+        self.cancel()
+        self.interval_id = js.setInterval(self._on_interval, interval_ms)
+
+    def cancel(self):
+        if self.interval_id is not None:
+            js.clearInterval(self.interval_id)
+            self.interval_id = None
+
+
+class PlaybackScheduler(Timeout):
+    """A timeout armed for the next moment playback needs attention.
+
+    Delays are given in video seconds and scaled by the playback rate, so
+    the callback lands on the boundary at any speed. Nothing is armed
+    while the player is paused, buffering or ended.
+    """
+
+    # don't busy-loop if a boundary is already due
+    MIN_DELAY_MS = 20
+
+    def arm(self, delay: float, playback_rate: float = 1.0):
+        delay_ms = int(delay / (playback_rate or 1.0) * 1000)
+        self.start(max(delay_ms, self.MIN_DELAY_MS))
+
+
+class Debouncer(Timeout):
+    """Runs the callback once triggers have been quiet for ``wait_ms``."""
+
+    def __init__(self, callback, wait_ms: int):
+        super().__init__(callback)
+        self.wait_ms = wait_ms
+
+    def trigger(self):
+        self.start(self.wait_ms)
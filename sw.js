@@ -0,0 +1,257 @@
+// Scene image cache. The page side is images.ImageStore.
+//
+// Requests for urls under the image root in the page's manifest are served
+// from the cache without a network round trip, and cached on the way
+// through otherwise. Hugging Face resolve/ urls redirect to short-lived CDN
+// urls, so entries are keyed by the url the page asked for. The cache is
+// held under a byte budget by evicting the least recently used images
+// first, never those of the episode playing or of episodes downloaded for
+// offline viewing. Those downloads are held under a share of the budget
+// between them: one that would go over it stops, until another is removed.
+
+const CACHE_NAME = "critdream-images";
+// never fetched, only used to keep the cache's bookkeeping next to it
+const STATE_URL = "https://critdream-images.invalid/state.json";
+// share of the origin's storage quota the images may take up
+const QUOTA_SHARE = 0.5;
+// share of the budget episodes downloaded for offline viewing may take up,
+// leaving the rest to the episode playing, which isn't evicted either
+const OFFLINE_SHARE = 0.75;
+const DOWNLOAD_CONCURRENCY = 4;
+// single images, and the packs of a scene's images (tools/build_image_packs.py)
+const IMAGE_URL = /\.(png|webp|avif|pack)$/;
+
+// manifest: the page's last published manifest
+// entries: url -> [bytes, last used (ms), episode name]
+// offline: episodes downloaded for offline viewing
+// sizes: episode name -> [width, format] its images were downloaded at, or
+//     null for the full-size pngs
+let statePromise = null;
+let saving = null;
+let dirty = false;
+
+function loadState() {
+    statePromise ??= (async () => {
+        const cache = await caches.open(CACHE_NAME);
+        const response = await cache.match(STATE_URL);
+        const state = response ? await response.json() : {};
+        return {manifest: null, entries: {}, offline: [], sizes: {}, ...state};
+    })();
+    return statePromise;
+}
+
+// writes are coalesced, so a burst of cache hits is a single write
+function saveState() {
+    dirty = true;
+    saving ??= (async () => {
+        const cache = await caches.open(CACHE_NAME);
+        while (dirty) {
+            dirty = false;
+            const state = await loadState();
+            await cache.put(STATE_URL, new Response(JSON.stringify(state)));
+        }
+        saving = null;
+    })();
+    return saving;
+}
+
+function episodeOf(manifest, url) {
+    // {episode}/{scene}_image_{n}.png, or variants/{episode}/... for resized
+    // ones and packs
+    const segments = url.slice(manifest.imageRoot.length).split("/");
+    return segments[0] === "variants" ? segments[1] : segments[0];
+}
+
+async function budget(manifest) {
+    let bytes = manifest.maxBytes;
+    if (self.navigator.storage?.estimate) {
+        const {quota} = await self.navigator.storage.estimate();
+        if (quota) {
+            bytes = Math.min(bytes, quota * QUOTA_SHARE);
+        }
+    }
+    return bytes;
+}
+
+// an image that would put the offline episodes over their share
+class OverBudget extends Error {}
+
+function offlineBytes(state) {
+    const offline = new Set(state.offline);
+    return Object.values(state.entries)
+        .filter(([, , episode]) => offline.has(episode))
+        .reduce((sum, [bytes]) => sum + bytes, 0);
+}
+
+async function evict(cache, state, maxBytes) {
+    const keep = new Set([state.manifest?.episode, ...state.offline]);
+    const entries = state.entries;
+    let total = Object.values(entries).reduce((sum, [bytes]) => sum + bytes, 0);
+    const byLastUse = Object.keys(entries).sort((a, b) => entries[a][1] - entries[b][1]);
+    const evicted = [];
+    for (const url of byLastUse) {
+        if (total <= maxBytes) {
+            break;
+        }
+        if (keep.has(entries[url][2])) {
+            continue;
+        }
+        total -= entries[url][0];
+        delete entries[url];
+        evicted.push(url);
+    }
+    await Promise.all(evicted.map((url) => cache.delete(url)));
+}
+
+async function store(cache, url, response, episode) {
+    const state = await loadState();
+    const body = await response.blob();
+    const copy = () => new Response(body, {status: response.status, headers: response.headers});
+    const maxBytes = await budget(state.manifest);
+    const offlineMax = maxBytes * OFFLINE_SHARE;
+    if (state.offline.includes(episode) && offlineBytes(state) + body.size > offlineMax) {
+        // evicting can't make room for it, so it isn't kept at all
+        throw new OverBudget(`offline episodes over ${offlineMax} bytes`);
+    }
+    const evicting = evict(cache, state, maxBytes - body.size);
+    // counted before it is written, so that concurrent downloads make room
+    // for each other
+    state.entries[url] = [body.size, Date.now(), episode];
+    await evicting;
+    try {
+        await cache.put(url, copy());
+    } catch (error) {
+        // over the browser's quota after all: make room and try once more
+        await evict(cache, state, maxBytes / 2);
+        try {
+            await cache.put(url, copy());
+        } catch (error) {
+            delete state.entries[url];
+            throw error;
+        }
+    }
+    await saveState();
+}
+
+async function respond(event) {
+    const state = await loadState();
+    const url = event.request.url;
+    const manifest = state.manifest;
+    if (!manifest || !url.startsWith(manifest.imageRoot)) {
+        return fetch(event.request);
+    }
+
+    const cache = await caches.open(CACHE_NAME);
+    const cached = await cache.match(url);
+    if (cached) {
+        if (state.entries[url]) {
+            state.entries[url][1] = Date.now();
+            event.waitUntil(saveState());
+        }
+        return cached;
+    }
+
+    const response = await fetch(event.request);
+    // opaque responses from no-cors requests are padded to megabytes
+    // against the quota, so only cors responses are kept
+    if (response.ok && response.type !== "opaque") {
+        event.waitUntil(
+            store(cache, url, response.clone(), episodeOf(manifest, url))
+                .catch((error) => console.log(`[sw] could not cache ${url}: ${error}`))
+        );
+    }
+    return response;
+}
+
+function reportOffline(client, state) {
+    client.postMessage({type: "offline", episodes: state.offline, sizes: state.sizes});
+}
+
+async function download(client, episode, urls, size) {
+    const state = await loadState();
+    const cache = await caches.open(CACHE_NAME);
+    if (!state.offline.includes(episode)) {
+        state.offline.push(episode);
+    }
+    state.sizes[episode] = size ?? null;
+
+    const queue = [...urls];
+    let done = 0;
+    let failed = 0;
+    let full = false;
+    const report = () => client.postMessage(
+        {type: "progress", episode, done, failed, total: urls.length, full}
+    );
+    const next = async () => {
+        while (queue.length) {
+            const url = queue.shift();
+            try {
+                if (await cache.match(url)) {
+                    // already cached while watching: now it belongs to the download
+                    state.entries[url] = [state.entries[url]?.[0] ?? 0, Date.now(), episode];
+                } else {
+                    const response = await fetch(url, {mode: "cors"});
+                    if (!response.ok) {
+                        throw new Error(`HTTP ${response.status}`);
+                    }
+                    await store(cache, url, response, episode);
+                }
+                done += 1;
+            } catch (error) {
+                failed += 1;
+                if (error instanceof OverBudget) {
+                    // the rest wouldn't fit either
+                    full = true;
+                    failed += queue.length;
+                    queue.length = 0;
+                }
+            }
+            report();
+        }
+    };
+    report();
+    await Promise.all(Array.from({length: DOWNLOAD_CONCURRENCY}, next));
+    await saveState();
+    reportOffline(client, state);
+}
+
+async function remove(client, episode) {
+    const state = await loadState();
+    state.offline = state.offline.filter((name) => name !== episode);
+    delete state.sizes[episode];
+    // the images stay cached, they just become evictable again, and go first
+    // if offline episodes were left over the budget
+    const cache = await caches.open(CACHE_NAME);
+    await evict(cache, state, await budget(state.manifest));
+    await saveState();
+    reportOffline(client, state);
+}
+
+async function publish(client, manifest) {
+    const state = await loadState();
+    state.manifest = manifest;
+    await saveState();
+    reportOffline(client, state);
+}
+
+self.addEventListener("install", () => self.skipWaiting());
+
+self.addEventListener("activate", (event) => event.waitUntil(self.clients.claim()));
+
+self.addEventListener("fetch", (event) => {
+    const request = event.request;
+    if (request.method === "GET" && IMAGE_URL.test(new URL(request.url).pathname)) {
+        event.respondWith(respond(event));
+    }
+});
+
+self.addEventListener("message", (event) => {
+    const message = event.data;
+    if (message.type === "manifest") {
+        event.waitUntil(publish(event.source, message.manifest));
+    } else if (message.type === "download") {
+        event.waitUntil(download(event.source, message.episode, message.urls, message.size));
+    } else if (message.type === "remove") {
+        event.waitUntil(remove(event.source, message.episode));
+    }
+});
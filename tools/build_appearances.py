@@ -0,0 +1,76 @@
+"""Build the cross-episode appearance index from aligned scene data.
+
+Reads each catalog episode's ``aligned_scenes_{episode_name}.bin`` bundle
+from the input directory, or its CSV if it has no bundle, and writes
+``appearances.bin`` next to them: for every character and speaker, where
+each of their appearances across the catalog starts. The app uses it to
+jump to a character's next or previous appearance without loading any
+episode's scenes. Episodes come from the ``catalog.json`` in the input
+directory (see tools/build_catalog.py), or the built-in catalog.
+
+    python tools/build_appearances.py path/to/aligned-scenes
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from episodes import BUILTIN_CATALOG, Catalog  # noqa: E402
+from scenes import (  # noqa: E402
+    APPEARANCE_GAP,
+    AppearanceIndex,
+    Scene,
+    SceneBundle,
+    SceneTable,
+    encode_appearances,
+)
+
+
+def episode_scenes(data_dir: Path, episode_name: str) -> list[Scene] | None:
+    bundle_path = data_dir / f"aligned_scenes_{episode_name}.bin"
+    if bundle_path.exists():
+        return list(SceneBundle(bundle_path.read_bytes()).scenes())
+    csv_path = data_dir / f"aligned_scenes_{episode_name}.csv"
+    if csv_path.exists():
+        return list(SceneTable.from_csv(csv_path.read_text(), episode_name).scenes())
+    return None
+
+
+def build_appearances(data_dir: Path, catalog: Catalog, gap: float) -> bytes:
+    episodes = []
+    for episode_name in catalog.names:
+        scenes = episode_scenes(data_dir, episode_name)
+        if scenes is None:
+            print(f"skipping {episode_name}: no scene data")
+            continue
+        episodes.append((episode_name, scenes))
+    return encode_appearances(episodes, gap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir", type=Path)
+    parser.add_argument("--gap", type=float, default=APPEARANCE_GAP,
+                        help="seconds between scenes that start a new appearance")
+    args = parser.parse_args()
+
+    catalog_path = args.data_dir / "catalog.json"
+    catalog = (
+        Catalog.from_json(catalog_path.read_text())
+        if catalog_path.exists() else BUILTIN_CATALOG
+    )
+
+    encoded = build_appearances(args.data_dir, catalog, args.gap)
+    output_path = args.data_dir / "appearances.bin"
+    output_path.write_bytes(encoded)
+    index = AppearanceIndex(encoded)
+    print(
+        f"{output_path}: {len(index)} appearances of {len(index.names)} names "
+        f"in {len(index.episode_names)} episodes, {len(encoded)} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
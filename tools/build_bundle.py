@@ -0,0 +1,64 @@
+"""Build compact scene bundles from aligned scene CSVs.
+
+Reads every ``aligned_scenes_{episode_name}.csv`` in the input directory and
+writes an ``aligned_scenes_{episode_name}.bin`` bundle next to it (or into
+``--output``), ready to be uploaded alongside the CSVs. Intro and break
+times come from the ``catalog.json`` in the input directory (see
+tools/build_catalog.py), or the built-in catalog if there isn't one.
+
+    python tools/build_bundle.py path/to/aligned-scenes
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from episodes import BUILTIN_CATALOG, Catalog  # noqa: E402
+from scenes import SceneTable, encode_bundle  # noqa: E402
+
+
+def build_bundle(csv_path: Path, output_dir: Path, catalog: Catalog) -> Path:
+    episode_name = csv_path.stem.removeprefix("aligned_scenes_")
+    table = SceneTable.from_csv(csv_path.read_text(), episode_name)
+    episode = catalog[episode_name]
+    bundle = encode_bundle(
+        episode_name,
+        table,
+        episode.intro_end,
+        episode.episode_break,
+    )
+    output_path = output_dir / f"aligned_scenes_{episode_name}.bin"
+    output_path.write_bytes(bundle)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_dir", type=Path)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    catalog_path = args.input_dir / "catalog.json"
+    catalog = (
+        Catalog.from_json(catalog_path.read_text())
+        if catalog_path.exists() else BUILTIN_CATALOG
+    )
+
+    output_dir = args.output or args.input_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for csv_path in sorted(args.input_dir.glob("aligned_scenes_*.csv")):
+        episode_name = csv_path.stem.removeprefix("aligned_scenes_")
+        if episode_name not in catalog:
+            print(f"skipping {csv_path.name}: no episode metadata")
+            continue
+        output_path = build_bundle(csv_path, output_dir, catalog)
+        print(
+            f"{output_path.name}: {csv_path.stat().st_size} -> "
+            f"{output_path.stat().st_size} bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Build the episode catalog published with the scene data.
+
+Lists every ``aligned_scenes_{episode_name}.csv`` in the input directory and
+writes ``catalog.json`` next to them, with each episode's campaign, dropdown
+label, intro end, mid-episode break and an offset index into its CSV. The app
+loads it at startup, so new episodes and campaigns don't need an app
+release, and uses the offsets to range-read the scenes around a deep link
+before the whole episode has loaded. Rebuild the catalog whenever the CSVs
+change.
+
+Times come from ``--times``, a CSV with ``episode_name``, ``intro_end``,
+``break_start`` and ``break_end`` columns, falling back to the built-in
+metadata in episodes.py. Episodes with neither are skipped.
+
+    python tools/build_catalog.py path/to/aligned-scenes --times episode_times.csv
+"""
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from episodes import (  # noqa: E402
+    BUILTIN_CATALOG,
+    CAMPAIGN_TITLES,
+    Catalog,
+    Episode,
+    episode_label,
+)
+from scenes import SCENE_OFFSET_ROWS, csv_offsets  # noqa: E402
+
+
+def read_times(path: Path) -> dict[str, tuple[float, tuple[float, float]]]:
+    with path.open() as f:
+        return {
+            row["episode_name"]: (
+                float(row["intro_end"]),
+                (float(row["break_start"]), float(row["break_end"])),
+            )
+            for row in csv.DictReader(f)
+        }
+
+
+def episode_key(episode_name: str) -> tuple[int, int]:
+    campaign, num = episode_name[1:].split("e")
+    return int(campaign), int(num)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir", type=Path)
+    parser.add_argument("--times", type=Path, default=None)
+    parser.add_argument(
+        "--campaign-title",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("CAMPAIGN", "TITLE"),
+        help="title shown for a campaign's group in the episode dropdown",
+    )
+    parser.add_argument("--offset-rows", type=int, default=SCENE_OFFSET_ROWS,
+                        help="csv rows between offset index checkpoints")
+    args = parser.parse_args()
+
+    times = read_times(args.times) if args.times else {}
+    titles = dict(CAMPAIGN_TITLES)
+    titles.update((int(campaign), title) for campaign, title in args.campaign_title)
+
+    names = sorted(
+        (
+            path.stem.removeprefix("aligned_scenes_")
+            for path in args.data_dir.glob("aligned_scenes_*.csv")
+        ),
+        key=episode_key,
+    )
+    episodes = []
+    for episode_name in names:
+        if episode_name in times:
+            intro_end, episode_break = times[episode_name]
+        elif episode_name in BUILTIN_CATALOG:
+            builtin = BUILTIN_CATALOG[episode_name]
+            intro_end, episode_break = builtin.intro_end, builtin.episode_break
+        else:
+            print(f"skipping {episode_name}: no intro or break times")
+            continue
+        csv_path = args.data_dir / f"aligned_scenes_{episode_name}.csv"
+        offsets = csv_offsets(csv_path.read_bytes(), args.offset_rows)
+        if not offsets:
+            print(f"{episode_name}: rows not in time order, no offset index")
+        episodes.append(Episode(
+            episode_name,
+            episode_key(episode_name)[0],
+            episode_label(episode_name),
+            intro_end,
+            episode_break,
+            tuple(offsets),
+        ))
+
+    catalog = Catalog(episodes, titles)
+    output_path = args.data_dir / "catalog.json"
+    output_path.write_text(catalog.to_json())
+    print(f"{output_path}: {len(catalog)} episodes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Pack each scene's image variants into a single file.
+
+Reads the output of tools/build_image_variants.py and, for every scene,
+width and format, writes ``{scene_name}_images_{width}.{format}.pack`` next
+to the variants: all of the scene's ``{scene_name}_image_{image_num}_{width}
+.{format}`` files in one container with an offset index (see packs.py).
+The app then fetches a scene's images in one request, instead of one per
+variation, and rotates between them without touching the network. The
+``manifest.json`` is updated to tell the app the packs are there; upload
+the directory as ``variants/`` as before. The individual variants are kept,
+for the first image of a scene that wasn't prefetched and for offline
+downloads.
+
+    python tools/build_image_packs.py path/to/variants
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from packs import encode_pack  # noqa: E402
+
+
+VARIANT_NAME = re.compile(r"(.+)_image_(\d+)_(\d+)\.(\w+)")
+
+
+def build_packs(episode_dir: Path) -> tuple[int, int]:
+    """Write the packs for one episode, returning how many and their size."""
+    groups = defaultdict(list)
+    for path in episode_dir.iterdir():
+        match = VARIANT_NAME.fullmatch(path.name)
+        if match is None:
+            continue
+        scene_name, image_num, width, fmt = match.groups()
+        groups[scene_name, width, fmt].append((int(image_num), path))
+
+    nbytes = 0
+    for (scene_name, width, fmt), images in groups.items():
+        pack = encode_pack(
+            (image_num, path.read_bytes()) for image_num, path in sorted(images)
+        )
+        (episode_dir / f"{scene_name}_images_{width}.{fmt}.pack").write_bytes(pack)
+        nbytes += len(pack)
+    return len(groups), nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("variants_dir", type=Path)
+    args = parser.parse_args()
+
+    manifest_path = args.variants_dir / "manifest.json"
+    if not manifest_path.exists():
+        raise SystemExit(f"no {manifest_path}, run tools/build_image_variants.py first")
+    manifest = json.loads(manifest_path.read_text())
+
+    pack_bytes = 0
+    for episode_name in manifest["episodes"]:
+        count, nbytes = build_packs(args.variants_dir / episode_name)
+        pack_bytes += nbytes
+        print(f"{episode_name}: {count} packs, {nbytes / 1e6:.1f} MB")
+
+    manifest["packs"] = True
+    manifest["pack_bytes"] = pack_bytes
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
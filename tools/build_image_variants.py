@@ -0,0 +1,117 @@
+"""Build resized, compressed variants of the scene images.
+
+Reads ``{episode_name}/{scene_name}_image_{image_num}.png`` files from the
+input directory and writes ``{scene_name}_image_{image_num}_{width}.{format}``
+next to them in the output directory, for every width and format, plus a
+one-pixel ``probe.{format}`` the app uses to check browser support and a
+``manifest.json`` describing what was built. Upload the output directory as
+``variants/`` in the scene image dataset.
+
+Requires Pillow; AVIF output needs a Pillow build with AVIF support (Pillow
+11.3+ or the pillow-avif-plugin package) and is skipped otherwise.
+
+    python tools/build_image_variants.py path/to/scene-images path/to/variants
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+try:
+    from PIL import Image, features
+except ImportError as exc:
+    raise SystemExit("this tool requires Pillow: pip install pillow") from exc
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+
+WIDTHS = [256, 512, 1024]
+# in order of preference, the app uses the first one the browser decodes
+FORMATS = ["avif", "webp"]
+QUALITY = {"avif": 50, "webp": 75}
+
+
+def supported_formats(formats: list[str]) -> list[str]:
+    supported = []
+    for fmt in formats:
+        if features.check(fmt):
+            supported.append(fmt)
+        else:
+            print(f"skipping {fmt}: not supported by this Pillow build")
+    return supported
+
+
+def build_variants(
+    source: Path,
+    output_dir: Path,
+    widths: list[int],
+    formats: list[str],
+) -> dict[tuple[str, int], int]:
+    sizes = {}
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize(
+                (width, height), Image.Resampling.LANCZOS
+            )
+            for fmt in formats:
+                path = output_dir / f"{source.stem}_{width}.{fmt}"
+                resized.save(path, fmt.upper(), quality=QUALITY[fmt])
+                sizes[fmt, width] = path.stat().st_size
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_dir", type=Path)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--widths", type=int, nargs="+", default=WIDTHS)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    args = parser.parse_args()
+
+    formats = supported_formats(args.formats)
+    if not formats:
+        raise SystemExit("no supported output formats")
+    widths = sorted(args.widths)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    source_bytes = 0
+    variant_bytes = {f"{fmt}_{width}": 0 for fmt in formats for width in widths}
+    episodes = []
+    for episode_dir in sorted(p for p in args.input_dir.iterdir() if p.is_dir()):
+        sources = sorted(episode_dir.glob("*_image_*.png"))
+        if not sources:
+            continue
+        episodes.append(episode_dir.name)
+        output_dir = args.output_dir / episode_dir.name
+        output_dir.mkdir(exist_ok=True)
+        for source in sources:
+            source_bytes += source.stat().st_size
+            sizes = build_variants(source, output_dir, widths, formats)
+            for (fmt, width), size in sizes.items():
+                variant_bytes[f"{fmt}_{width}"] += size
+        print(f"{episode_dir.name}: {len(sources)} images")
+
+    for fmt in formats:
+        Image.new("RGB", (1, 1)).save(args.output_dir / f"probe.{fmt}", fmt.upper())
+
+    manifest = {
+        "widths": widths,
+        "formats": formats,
+        "episodes": episodes,
+        "source_bytes": source_bytes,
+        "variant_bytes": variant_bytes,
+    }
+    (args.output_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    for name, size in variant_bytes.items():
+        ratio = source_bytes / size if size else 0
+        print(f"{name}: {size / 1e6:.1f} MB ({ratio:.1f}x smaller than png)")
+
+
+if __name__ == "__main__":
+    main()
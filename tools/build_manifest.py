@@ -0,0 +1,46 @@
+"""Write the data manifest used to version the browser's persistent cache.
+
+Hashes every data file in the directory (video id map, episode catalog,
+scene CSVs and bundles, appearance index) and writes ``manifest.json`` next
+to them. Upload it with the data so returning visitors only re-download
+files whose hash changed.
+
+    python tools/build_manifest.py path/to/aligned-scenes
+"""
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+
+PATTERNS = [
+    "video_id_map.csv",
+    "catalog.json",
+    "aligned_scenes_*.csv",
+    "aligned_scenes_*.bin",
+    "appearances.bin",
+]
+
+
+def build_manifest(data_dir: Path) -> dict:
+    files = {}
+    for pattern in PATTERNS:
+        for path in sorted(data_dir.glob(pattern)):
+            files[path.name] = hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    return {"files": files}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir", type=Path)
+    args = parser.parse_args()
+
+    manifest = build_manifest(args.data_dir)
+    output_path = args.data_dir / "manifest.json"
+    output_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    print(f"{output_path}: {len(manifest['files'])} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Scene data worker.
+
+Downloads and parses episode data and compiles playback timelines off the
+page's main thread, so the player and the crossfade keep running while an
+episode loads. Driven by ``loader.SceneWorker`` over postMessage; each
+timeline goes back as a single ArrayBuffer in the transfer list, so it
+changes hands without being copied.
+"""
+
+import asyncio
+
+import js
+from polyscript import xworker
+from pyscript import ffi
+
+import data
+
+
+data_cache = None
+
+
+def post(message: dict, transfer: list = ()):
+    xworker.postMessage(
+        ffi.to_js(message, dict_converter=js.Object.fromEntries),
+        ffi.to_js(list(transfer)),
+    )
+
+
+async def load_timeline(
+    episode_name: str, intro_end: float, episode_break: tuple[float, float]
+):
+    try:
+        index = await data.load_scene_index(
+            data_cache, episode_name, intro_end, episode_break
+        )
+        buffer = ffi.to_js(index.timeline.to_bytes()).buffer
+    except Exception as exc:
+        post({"type": "error", "episode_name": episode_name, "error": str(exc)})
+        return
+    post(
+        {
+            "type": "timeline",
+            "episode_name": episode_name,
+            "buffer": buffer,
+            "hits": data_cache.hits,
+            "misses": data_cache.misses,
+        },
+        transfer=[buffer],
+    )
+
+
+@ffi.create_proxy
+def on_message(event):
+    global data_cache
+
+    message = event.data
+    if message.type == "configure":
+        data.set_url_root(message.url_root)
+        data_cache = data.open_data_cache(message.app_version)
+    elif message.type == "load":
+        asyncio.ensure_future(load_timeline(
+            message.episode_name,
+            message.intro_end,
+            (message.break_start, message.break_end),
+        ))
+
+
+xworker.onmessage = on_message
+post({"type": "ready"})